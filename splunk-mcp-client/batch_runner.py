@@ -0,0 +1,137 @@
+import os
+import sys
+import json
+import math
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+from workflow_runner import WORKFLOW_TIMEOUT, execute_workflow, new_run_dir
+from planner import determine_task_sequence, resolve_time_range
+from plan_optimizer import optimize_if_enabled
+from metrics import flush_metrics
+
+load_dotenv()
+
+
+def load_batch(path: str) -> list:
+    """Batch items from a JSONL file: {"request": ...} with an optional "task_sequence" plan.
+
+    Optional keys: id, earliest, latest, index, max_count, output_format. Blank lines and
+    lines starting with # are skipped.
+    """
+    items = []
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            item = json.loads(line)
+            if not item.get('request') and not item.get('task_sequence'):
+                raise ValueError(f"{path}:{line_number}: item needs a request or a task_sequence")
+            item.setdefault('id', str(line_number))
+            items.append(item)
+    return items
+
+
+def percentile(values: list, fraction: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def run_item(item: dict, timeout: float) -> dict:
+    """Plan (unless a plan was given) and execute one batch item"""
+    started = time.time()
+    user_request = item.get('request', "")
+    record = {'id': item['id'], 'request': user_request}
+    try:
+        task_sequence, plan_report = optimize_if_enabled(item.get('task_sequence') or determine_task_sequence(user_request))
+        record['planning_seconds'] = round(time.time() - started, 3)
+        earliest, latest = resolve_time_range(user_request, item.get('earliest'), item.get('latest'))
+        run_dir = new_run_dir()
+        results = execute_workflow(
+            task_sequence, user_request, earliest, latest, item.get('index'),
+            item.get('max_count', 100), item.get('output_format', 'json'), timeout=timeout, run_dir=run_dir
+        )
+        record.update({
+            'task_sequence': task_sequence,
+            'plan_seconds_saved': plan_report['seconds_saved'] if plan_report else 0,
+            'earliest': earliest,
+            'latest': latest,
+            'run_dir': run_dir,
+            'success': bool(results) and all(result.get('success') for result in results),
+            'steps': [
+                {'task': result['task'], 'success': result.get('success', False), 'duration': result.get('duration')}
+                for result in results
+            ],
+            'results': results,
+        })
+    except Exception as e:
+        record.update({'success': False, 'error': str(e)})
+    record['total_seconds'] = round(time.time() - started, 3)
+    return record
+
+
+def run_batch(items: list, output_path: str, parallelism: int, timeout: float = WORKFLOW_TIMEOUT) -> dict:
+    """Run batch items with bounded parallelism, streaming one JSON line per finished item"""
+    latencies = []
+    succeeded = 0
+    started = time.time()
+
+    print(f"📦 Running {len(items)} workflows, {parallelism} at a time")
+    with open(output_path, 'w', encoding='utf-8') as output, ThreadPoolExecutor(max_workers=parallelism) as executor:
+        futures = {executor.submit(run_item, item, timeout): item for item in items}
+        for done, future in enumerate(as_completed(futures), 1):
+            record = future.result()
+            latencies.append(record['total_seconds'])
+            succeeded += record['success']
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+            status = "✅" if record['success'] else "❌"
+            print(f"{status} [{done}/{len(items)}] {record['id']} in {record['total_seconds']:.1f}s")
+
+    elapsed = time.time() - started
+    summary = {
+        'workflows': len(items),
+        'succeeded': succeeded,
+        'failed': len(items) - succeeded,
+        'parallelism': parallelism,
+        'wall_seconds': round(elapsed, 1),
+        'throughput_per_minute': round(len(items) / elapsed * 60, 2) if elapsed else 0.0,
+        'latency_p50_seconds': round(percentile(latencies, 0.50), 1),
+        'latency_p95_seconds': round(percentile(latencies, 0.95), 1),
+        'latency_max_seconds': round(max(latencies, default=0.0), 1),
+    }
+    with open(f"{output_path}.summary.json", 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=1)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run many workflows from a JSONL file of requests or plans")
+    parser.add_argument("input", help="JSONL file, one {\"request\": ...} or {\"task_sequence\": [...]} per line")
+    parser.add_argument("--output", help="results JSONL (default: <input>.results.jsonl)")
+    parser.add_argument("--parallel", type=int, default=int(os.getenv("BATCH_PARALLELISM", "4")),
+                        help="workflows running at once")
+    parser.add_argument("--timeout", type=float, default=WORKFLOW_TIMEOUT, help="per-workflow timeout in seconds")
+    args = parser.parse_args(argv)
+
+    output_path = args.output or f"{os.path.splitext(args.input)[0]}.results.jsonl"
+    summary = run_batch(load_batch(args.input), output_path, max(1, args.parallel), args.timeout)
+    flush_metrics()
+
+    print("📊 Batch summary:")
+    print(f"   - Workflows: {summary['succeeded']}/{summary['workflows']} succeeded in {summary['wall_seconds']}s")
+    print(f"   - Throughput: {summary['throughput_per_minute']} workflows/min at parallelism {summary['parallelism']}")
+    print(f"   - Latency: p50 {summary['latency_p50_seconds']}s, p95 {summary['latency_p95_seconds']}s, max {summary['latency_max_seconds']}s")
+    print(f"   - Results: {output_path}")
+    return 0 if not summary['failed'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
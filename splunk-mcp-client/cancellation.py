@@ -0,0 +1,103 @@
+import os
+import time
+import signal
+import subprocess
+from contextlib import contextmanager
+from typing import Optional
+
+CANCEL_FILE = "CANCEL"
+
+
+class WorkflowCancelled(BaseException):
+    """Raised when the user cancels a workflow.
+
+    Derives from BaseException like KeyboardInterrupt so agent frameworks that catch
+    Exception around tool calls can't swallow it.
+    """
+
+
+class StepDeadlineExceeded(BaseException):
+    """Raised in the main thread when the current step runs past its deadline"""
+
+
+_step_deadline: Optional[float] = None
+
+
+def time_remaining() -> Optional[float]:
+    """Seconds left before the current step's deadline, or None when no deadline is set"""
+    if _step_deadline is None:
+        return None
+    return max(_step_deadline - time.time(), 0.0)
+
+
+@contextmanager
+def step_deadline(seconds: Optional[float]):
+    """Bound the enclosed step: MCP calls read time_remaining() and SIGALRM interrupts the rest"""
+    global _step_deadline
+    if not seconds or seconds <= 0:
+        yield
+        return
+
+    use_alarm = hasattr(signal, "SIGALRM")
+    previous_handler = None
+    if use_alarm:
+        def on_alarm(signum, frame):
+            raise StepDeadlineExceeded(f"Step exceeded its {seconds:.0f}s deadline")
+        previous_handler = signal.signal(signal.SIGALRM, on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, seconds)
+
+    _step_deadline = time.time() + seconds
+    try:
+        yield
+    finally:
+        _step_deadline = None
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+
+
+def install_cancel_handler():
+    """Turn SIGTERM from the launcher into WorkflowCancelled so the current Crew unwinds"""
+    def on_terminate(signum, frame):
+        raise WorkflowCancelled("Workflow cancelled by user")
+    signal.signal(signal.SIGTERM, on_terminate)
+
+
+def allot_step_budget(remaining_budget: float, remaining_weights: list) -> float:
+    """Share what is left of the workflow budget among the remaining steps by weight"""
+    total = sum(remaining_weights)
+    if total <= 0 or remaining_budget <= 0:
+        return max(remaining_budget, 0.0)
+    return remaining_budget * remaining_weights[0] / total
+
+
+def request_cancel(run_dir: str):
+    """Ask the launcher watching run_dir to cancel the workflow"""
+    os.makedirs(run_dir, exist_ok=True)
+    with open(os.path.join(run_dir, CANCEL_FILE), 'w') as f:
+        f.write(str(time.time()))
+
+
+def cancel_requested(run_dir: str) -> bool:
+    return os.path.exists(os.path.join(run_dir, CANCEL_FILE))
+
+
+def terminate_process_tree(process: subprocess.Popen, grace_seconds: float = 5.0):
+    """SIGTERM the process group (crewFlow.py and its MCP servers), then SIGKILL what is left"""
+    if process.poll() is not None:
+        return
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except (ProcessLookupError, PermissionError, AttributeError):
+        process.terminate()
+    try:
+        process.wait(timeout=grace_seconds)
+    except subprocess.TimeoutExpired:
+        pass
+    try:
+        # Children such as MCP servers may outlive the leader, so kill the whole group
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError, AttributeError):
+        if process.poll() is None:
+            process.kill()
+    process.wait()
@@ -1,22 +1,309 @@
 import os
+import re
 import sys
+import csv
+import io
+import json
+import math
+import time
+import uuid
+import atexit
 import asyncio
+import inspect
+import threading
+import concurrent.futures
 from dotenv import load_dotenv
+from array import array
+from collections.abc import Mapping
 from contextlib import AsyncExitStack
 from typing import Optional
+from urllib.parse import urlparse
 
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
+from mcp.client.sse import sse_client
+try:
+    from mcp.client.streamable_http import streamable_http_client
+except ImportError:  # older mcp releases name it streamablehttp_client
+    from mcp.client.streamable_http import streamablehttp_client as streamable_http_client
+
+from metrics import MCP_CALL_ERRORS, MCP_CALL_SECONDS, MCP_SPAWN_SECONDS
 
 load_dotenv()
 
+# Search job states (mirrors Splunk's dispatchState values)
+JOB_QUEUED = "QUEUED"
+JOB_RUNNING = "RUNNING"
+JOB_DONE = "DONE"
+JOB_FAILED = "FAILED"
+JOB_CANCELLED = "CANCELLED"
+JOB_FINAL_STATES = (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+RESULT_LIST_KEYS = ('results', 'events', 'rows', 'data')
+REMOTE_TRANSPORTS = ('http', 'streamable-http', 'sse')
+NUMBER_PATTERN = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][-+]?\d+)?")
+# A text column is interned (stored as codes into one list of distinct values) unless most values are unique
+INTERN_MAX_DISTINCT_SHARE = 0.5
+INT64_RANGE = range(-2 ** 63, 2 ** 63)
+# Integers beyond this lose digits as floats
+FLOAT_EXACT_INT = 2 ** 53
+
+
+def _exact_int(value) -> Optional[int]:
+    """value as an int64 when that loses nothing, else None"""
+    if isinstance(value, str):
+        if any(c in value for c in '.eE') or str(int(value)) != value:
+            return None
+        value = int(value)
+    return value if isinstance(value, int) and value in INT64_RANGE else None
+
+
+def _exact_float(value) -> Optional[float]:
+    """value as a float when that loses nothing, else None"""
+    if isinstance(value, float):
+        return value
+    if isinstance(value, str) and any(c in value for c in '.eE'):
+        number = float(value)
+        return number if repr(number) == value else None
+    number = int(value)
+    return float(number) if abs(number) <= FLOAT_EXACT_INT else None
+
+
+def tool_result_text(response) -> str:
+    """Return the text payload of an MCP tool result"""
+    content = getattr(response, 'content', None)
+    if content is None:
+        return str(response)
+    return "\n".join(getattr(item, 'text', str(item)) for item in content)
+
+
+def parse_markdown_table(text: str) -> list:
+    """Parse a markdown table into a list of row dicts"""
+    lines = [line.strip() for line in text.split('\n') if line.strip().startswith('|')]
+    if len(lines) < 2:
+        return []
+    header = [col.strip() for col in lines[0].strip('|').split('|')]
+    records = []
+    for line in lines[1:]:
+        cells = [col.strip() for col in line.strip('|').split('|')]
+        if all(re.fullmatch(r':?-+:?', cell) for cell in cells if cell):
+            continue  # separator line
+        if len(cells) == len(header):
+            records.append(dict(zip(header, cells)))
+    return records
+
+
+def parse_result_records(payload) -> list:
+    """Best-effort extraction of result rows from a search tool payload (JSON, markdown or CSV)"""
+    if isinstance(payload, list):
+        return [row for row in payload if isinstance(row, dict)]
+
+    if isinstance(payload, dict):
+        for key in RESULT_LIST_KEYS:
+            if isinstance(payload.get(key), list):
+                return parse_result_records(payload[key])
+        if 'content' in payload:
+            return parse_result_records(payload['content'])
+        return []
+
+    if not isinstance(payload, str):
+        payload = tool_result_text(payload)
+
+    text = payload.strip()
+    if not text:
+        return []
+    if text[0] in '[{':
+        try:
+            return parse_result_records(json.loads(text))
+        except json.JSONDecodeError:
+            # Newline-delimited JSON (export streams one result per line)
+            rows = []
+            for line in text.split('\n'):
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                rows.append(row.get('result', row) if isinstance(row, dict) else row)
+            if rows:
+                return parse_result_records(rows)
+    if '|' in text and '---' in text:
+        return parse_markdown_table(text.replace('\\n', '\n'))
+    first_line = text.split('\n', 1)[0]
+    if ',' in first_line:
+        return list(csv.DictReader(io.StringIO(text)))
+    return []
+
+
+class ResultRow(Mapping):
+    """Read-only view of one row of a CompactResultSet; holds no field values itself"""
+    __slots__ = ('_results', '_index')
+
+    def __init__(self, results, index: int):
+        self._results = results
+        self._index = index
+
+    def __getitem__(self, field):
+        value = self._results._value(field, self._index)
+        if value is None:
+            raise KeyError(field)
+        return value
+
+    def __iter__(self):
+        return (field for field in self._results.fields if self._results._value(field, self._index) is not None)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"ResultRow({dict(self)!r})"
+
+
+class CompactResultSet:
+    """Search results stored column-wise instead of as one dict per event.
+
+    Numeric fields are typed arrays ('q' or 'd', NaN for missing), repetitive text fields such as
+    host or sourcetype are interned into a list of distinct values plus int32 codes (-1 for
+    missing), and only mostly-unique text such as _raw stays a plain list of strings.
+    Iteration yields ResultRow views; to_dataframe wraps the arrays without copying them.
+    """
+    __slots__ = ('fields', '_columns', '_length')
+
+    def __init__(self, fields: list, columns: dict, length: int):
+        self.fields = fields
+        self._columns = columns
+        self._length = length
+
+    @classmethod
+    def from_records(cls, records) -> "CompactResultSet":
+        records = records if isinstance(records, list) else list(records)
+        fields = list(dict.fromkeys(field for row in records for field in row))
+        return cls(fields, {field: cls._build_column([row.get(field) for row in records]) for field in fields}, len(records))
+
+    @classmethod
+    def from_payload(cls, payload) -> "CompactResultSet":
+        return cls.from_records(parse_result_records(payload))
+
+    @staticmethod
+    def _build_column(values: list) -> tuple:
+        # Type checks and conversions run once per distinct value rather than once per event.
+        # Keyed on the type too: True, 1 and 1.0 are equal as dict keys but are different values.
+        distinct = {}
+        try:
+            codes = array('i', [-1 if value is None else distinct.setdefault((type(value), value), len(distinct)) for value in values])
+        except TypeError:
+            # Multivalue fields arrive as lists, which are unhashable; they keep their Python objects
+            return ('object', values)
+        distinct = [value for _, value in distinct]
+
+        present = [value for value in distinct if value != ""]
+        if present and all(
+            (isinstance(value, (int, float)) and not isinstance(value, bool))
+            or (isinstance(value, str) and NUMBER_PATTERN.fullmatch(value))
+            for value in present
+        ):
+            # Numbers are only typed when every value converts exactly; '1' and '1.0' or 2**70 stay text
+            lookup = [_exact_int(value) for value in distinct] if len(present) == len(distinct) and -1 not in codes else [None]
+            if None not in lookup:
+                return ('int', array('q', [lookup[code] for code in codes]))
+            lookup = [math.nan if value == "" else _exact_float(value) for value in distinct]
+            if None not in lookup and len(set(number for number in lookup if not math.isnan(number))) == len(present):
+                return ('float', array('d', [math.nan if code < 0 else lookup[code] for code in codes]))
+
+        labels = [sys.intern(str(value)) for value in distinct]
+        # Categories must be unique, so values that only differ in type (1 and "1") stay plain text
+        if len(distinct) > INTERN_MAX_DISTINCT_SHARE * len(values) and len(values) > 1 or len(set(labels)) < len(labels):
+            return ('text', [None if value is None else str(value) for value in values])
+        return ('category', codes, labels)
+
+    def _value(self, field: str, index: int):
+        column = self._columns.get(field)
+        if column is None:
+            return None
+        kind, data = column[0], column[1]
+        if kind == 'category':
+            code = data[index]
+            return column[2][code] if code >= 0 else None
+        value = data[index]
+        if kind == 'float' and math.isnan(value):
+            return None
+        return value
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index: int) -> ResultRow:
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError(index)
+        return ResultRow(self, index)
+
+    def __iter__(self):
+        return (ResultRow(self, index) for index in range(self._length))
+
+    def column(self, field: str) -> list:
+        return [self._value(field, index) for index in range(self._length)]
+
+    def to_records(self, limit: Optional[int] = None) -> list:
+        return [dict(row) for row in (self[index] for index in range(min(self._length, limit or self._length)))]
+
+    def to_dataframe(self):
+        """DataFrame over the stored arrays: numeric columns and category codes are not copied"""
+        import numpy as np
+        import pandas as pd
+
+        data = {}
+        for field in self.fields:
+            kind, values = self._columns[field][0], self._columns[field][1]
+            if kind in ('int', 'float'):
+                data[field] = np.frombuffer(values, dtype=np.int64 if kind == 'int' else np.float64)
+            elif kind == 'category':
+                data[field] = pd.Categorical.from_codes(np.frombuffer(values, dtype=np.int32), categories=self._columns[field][2])
+            else:
+                data[field] = pd.Series(values, dtype=object)
+        return pd.DataFrame(data, columns=self.fields, copy=False)
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the columns, including the distinct strings"""
+        total = sys.getsizeof(self._columns)
+        for column in self._columns.values():
+            kind, values = column[0], column[1]
+            if kind in ('int', 'float', 'category'):
+                total += values.itemsize * len(values)
+            if kind == 'category':
+                total += sys.getsizeof(column[2]) + sum(sys.getsizeof(value) for value in column[2])
+            elif kind in ('text', 'object'):
+                total += sys.getsizeof(values) + sum(sys.getsizeof(value) for value in values if value is not None)
+        return total
+
+    def bytes_per_event(self) -> float:
+        return self.nbytes() / self._length if self._length else 0.0
+
+
+def uses_remote_server() -> bool:
+    """True when MCP_TRANSPORT points clients at a running server instead of spawning one"""
+    return os.getenv("MCP_TRANSPORT", "stdio").lower() in REMOTE_TRANSPORTS
+
+
 class MCPClient:
-    def __init__(self, server_script_path: Optional[str] = None):
+    def __init__(self, server_script_path: Optional[str] = None, max_concurrent_jobs: Optional[int] = None,
+                 transport: Optional[str] = None, server_url: Optional[str] = None):
         self.exit_stack = AsyncExitStack()
         self.session: Optional[ClientSession] = None
         self.server_script_path = server_script_path or os.getenv("SPLUNK_MCP_PATH", "python/server.py")
+        # stdio spawns a server per client; http (streamable HTTP) and sse connect to MCP_SERVER_URL
+        self.transport = (transport or os.getenv("MCP_TRANSPORT", "stdio")).lower()
+        self.server_url = server_url or os.getenv("MCP_SERVER_URL", "http://localhost:8050")
+        self.max_concurrent_jobs = max_concurrent_jobs or int(os.getenv("MAX_CONCURRENT_JOBS", "4"))
+        self.jobs = {}
+        self._job_slots: Optional[asyncio.Semaphore] = None
 
     async def connect(self):
+        if self.transport in REMOTE_TRANSPORTS:
+            await self._connect_remote()
+            return
+        if self.transport != "stdio":
+            raise ValueError(f"Unknown MCP_TRANSPORT '{self.transport}'; use stdio, http or sse")
         if not self.server_script_path.endswith('.py'):
             raise ValueError("Only .py server scripts are supported for now.")
 
@@ -52,15 +339,44 @@ class MCPClient:
             env=env_vars
         )
 
-        stdio_transport = await self.exit_stack.enter_async_context(stdio_client(server_params))
-        self.session = await self.exit_stack.enter_async_context(ClientSession(*stdio_transport))
-        await self.session.initialize()
+        with MCP_SPAWN_SECONDS.time(transport="stdio"):
+            stdio_transport = await self.exit_stack.enter_async_context(stdio_client(server_params))
+            self.session = await self.exit_stack.enter_async_context(ClientSession(*stdio_transport))
+            await self.session.initialize()
+
+    async def _connect_remote(self):
+        """Open a session to an already-running server; Splunk credentials live on that server"""
+        url = self.server_url.rstrip('/')
+        if urlparse(url).path in ("", "/"):
+            url += "/sse" if self.transport == "sse" else "/mcp"
+        with MCP_SPAWN_SECONDS.time(transport=self.transport):
+            if self.transport == "sse":
+                streams = await self.exit_stack.enter_async_context(sse_client(url))
+            else:
+                streams = await self.exit_stack.enter_async_context(streamable_http_client(url))
+            # Older streamable HTTP clients also yield a session-id getter
+            self.session = await self.exit_stack.enter_async_context(ClientSession(streams[0], streams[1]))
+            await self.session.initialize()
+
+    async def call_tool(self, name: str, arguments: dict, **kwargs):
+        """session.call_tool with per-tool latency and error metrics"""
+        start = time.perf_counter()
+        try:
+            response = await self.session.call_tool(name, arguments, **kwargs)
+        except BaseException:
+            MCP_CALL_ERRORS.inc(tool=name)
+            raise
+        finally:
+            MCP_CALL_SECONDS.observe(time.perf_counter() - start, tool=name)
+        if getattr(response, 'isError', False):
+            MCP_CALL_ERRORS.inc(tool=name)
+        return response
 
     async def validate_spl(self, query: str):
-        return await self.session.call_tool("validate_spl", {"query": query})
+        return await self.call_tool("validate_spl", {"query": query})
 
     async def search_oneshot(self, query: str, earliest_time: str = "-24h", latest_time: str = "now"):
-        return await self.session.call_tool("search_oneshot", {
+        return await self.call_tool("search_oneshot", {
             "query": query,
             "earliest_time": earliest_time,
             "latest_time": latest_time,
@@ -68,10 +384,10 @@ class MCPClient:
         })
 
     async def get_indexes(self):
-        return await self.session.call_tool("get_indexes", {})
+        return await self.call_tool("get_indexes", {})
 
     async def run_saved_search(self, search_name: str):
-        return await self.session.call_tool("run_saved_search", {
+        return await self.call_tool("run_saved_search", {
             "search_name": search_name,
             "trigger_actions": False
         })
@@ -88,17 +404,237 @@ class MCPClient:
             payload["risk_tolerance"] = risk_tolerance
         if sanitize_output is not None:
             payload["sanitize_output"] = sanitize_output
-        return await self.session.call_tool("search_export", payload)
+        return await self.call_tool("search_export", payload)
 
     async def get_saved_searches(self):
-        return await self.session.call_tool("get_saved_searches", {})
+        return await self.call_tool("get_saved_searches", {})
 
     async def get_config(self):
-        return await self.session.call_tool("get_config", {})
+        return await self.call_tool("get_config", {})
+
+    # --- Search job lifecycle ---
+    # The MCP server only exposes blocking search tools, so a job wraps one of them in a
+    # background task on this session. Progress comes from MCP progress notifications when
+    # the server sends them, otherwise it is estimated from elapsed time.
+
+    async def dispatch_search(self, query: str, earliest_time: str = "-24h", latest_time: str = "now", max_count: int = 100, output_format: str = "json") -> str:
+        """Start a search without waiting for it and return its job id"""
+        sid = uuid.uuid4().hex[:12]
+        job = {
+            'sid': sid,
+            'query': query,
+            'earliest_time': earliest_time,
+            'latest_time': latest_time,
+            'state': JOB_QUEUED,
+            'progress': 0.0,
+            'progress_reported': False,
+            'dispatched_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'result_count': 0,
+            'error': None,
+            'response': None,
+            'records': [],
+        }
+        self.jobs[sid] = job
+        job['task'] = asyncio.create_task(
+            self._run_search_job(job, query, earliest_time, latest_time, max_count, output_format)
+        )
+        return sid
+
+    async def _run_search_job(self, job, query, earliest_time, latest_time, max_count, output_format):
+        if self._job_slots is None:
+            self._job_slots = asyncio.Semaphore(self.max_concurrent_jobs)
+
+        async def on_progress(progress, total=None, message=None):
+            job['progress_reported'] = True
+            if total:
+                job['progress'] = min(progress / total, 0.99)
+
+        try:
+            async with self._job_slots:
+                job['state'] = JOB_RUNNING
+                job['started_at'] = time.time()
+                payload = {
+                    "query": query,
+                    "earliest_time": earliest_time,
+                    "latest_time": latest_time,
+                    "max_count": max_count,
+                    "output_format": output_format,
+                }
+                if 'progress_callback' in inspect.signature(self.session.call_tool).parameters:
+                    response = await self.call_tool("search_export", payload, progress_callback=on_progress)
+                else:
+                    response = await self.call_tool("search_export", payload)
+
+            job['response'] = response
+            if getattr(response, 'isError', False):
+                job['state'] = JOB_FAILED
+                job['error'] = tool_result_text(response)
+            else:
+                job['records'] = parse_result_records(tool_result_text(response))
+                job['result_count'] = len(job['records'])
+                job['progress'] = 1.0
+                job['state'] = JOB_DONE
+        except asyncio.CancelledError:
+            job['state'] = JOB_CANCELLED
+            raise
+        except Exception as e:
+            job['state'] = JOB_FAILED
+            job['error'] = str(e)
+        finally:
+            job['finished_at'] = time.time()
+
+    def _get_job(self, sid: str):
+        if sid not in self.jobs:
+            raise KeyError(f"Unknown search job: {sid}")
+        return self.jobs[sid]
+
+    def get_job_status(self, sid: str) -> dict:
+        """Return state, progress and timings for a dispatched search"""
+        job = self._get_job(sid)
+        now = time.time()
+        progress = job['progress']
+        estimated = False
+        if job['state'] == JOB_RUNNING and not job['progress_reported']:
+            # Asymptotic estimate so long searches keep moving without ever claiming completion
+            expected = float(os.getenv("JOB_EXPECTED_SECONDS", "30"))
+            progress = min(1 - math.exp(-(now - job['started_at']) / expected), 0.95)
+            estimated = True
+        return {
+            'sid': sid,
+            'query': job['query'],
+            'earliest_time': job['earliest_time'],
+            'latest_time': job['latest_time'],
+            'state': job['state'],
+            'is_done': job['state'] in JOB_FINAL_STATES,
+            'progress': progress,
+            'progress_estimated': estimated,
+            'dispatched_at': job['dispatched_at'],
+            'elapsed': (job['finished_at'] or now) - job['dispatched_at'],
+            'result_count': job['result_count'],
+            'error': job['error'],
+        }
+
+    def get_job_results(self, sid: str, offset: int = 0, count: int = 100) -> dict:
+        """Return one page of a finished job's results"""
+        job = self._get_job(sid)
+        if job['state'] != JOB_DONE:
+            raise RuntimeError(f"Search job {sid} is {job['state']}, results are not available")
+        return {
+            'sid': sid,
+            'offset': offset,
+            'count': count,
+            'total': job['result_count'],
+            'results': job['records'][offset:offset + count],
+        }
+
+    async def wait_for_job(self, sid: str, timeout: Optional[float] = None) -> dict:
+        job = self._get_job(sid)
+        await asyncio.wait([job['task']], timeout=timeout)
+        return self.get_job_status(sid)
+
+    async def cancel_job(self, sid: str) -> dict:
+        """Cancel a queued or running search"""
+        job = self._get_job(sid)
+        if job['state'] not in JOB_FINAL_STATES:
+            job['task'].cancel()
+            try:
+                await job['task']
+            except asyncio.CancelledError:
+                pass
+        return self.get_job_status(sid)
+
+    def forget_job(self, sid: str):
+        """Drop a finished job and its retained results"""
+        job = self._get_job(sid)
+        if job['state'] in JOB_FINAL_STATES:
+            del self.jobs[sid]
 
     async def close(self):
+        for job in self.jobs.values():
+            if job['state'] not in JOB_FINAL_STATES:
+                job['task'].cancel()
         await self.exit_stack.aclose()
 
+class SharedMCPSession:
+    """One MCPClient session per process, kept open on a background event loop.
+
+    With a remote server, tools, workers and UI callers submit their calls here instead of
+    connecting per call; concurrent calls are multiplexed over the session as separate
+    MCP requests.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.client: Optional[MCPClient] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._holder = None
+        self._connect_lock = threading.Lock()
+        threading.Thread(target=self.loop.run_forever, name="mcp-shared-session", daemon=True).start()
+
+    async def _hold(self, ready):
+        # The session's transport must be opened and closed by the same task, so one task owns it
+        client = MCPClient()
+        self._stop = asyncio.Event()
+        try:
+            await client.connect()
+            self.client = client
+            ready.set_result(None)
+            await self._stop.wait()
+        except BaseException as e:
+            if not ready.done():
+                ready.set_exception(e)
+        finally:
+            self.client = None
+            await client.close()
+
+    def _ensure_connected(self, timeout: Optional[float]):
+        with self._connect_lock:
+            if self.client is not None and not self._holder.done():
+                return
+            ready = concurrent.futures.Future()
+            self._holder = asyncio.run_coroutine_threadsafe(self._hold(ready), self.loop)
+            ready.result(timeout)
+
+    def run(self, call, timeout: Optional[float] = None):
+        """Run `await call(client)` on the shared session from any thread and return its result"""
+        self._ensure_connected(timeout)
+        future = asyncio.run_coroutine_threadsafe(call(self.client), self.loop)
+        try:
+            return future.result(timeout)
+        except BaseException as e:
+            # Timeouts, step deadlines and cancels abandon only this request, not the session
+            future.cancel()
+            if isinstance(e, (ConnectionError, EOFError)) or type(e).__name__ in ("ClosedResourceError", "BrokenResourceError"):
+                self.close()
+            raise
+
+    def close(self, timeout: float = 5.0):
+        """Close the session; the next call reconnects"""
+        with self._connect_lock:
+            holder = self._holder
+            if holder is None or holder.done():
+                return
+            self.loop.call_soon_threadsafe(self._stop.set)
+            try:
+                holder.result(timeout)
+            except Exception as e:
+                print(f"⚠️ Could not close shared MCP session: {e}")
+
+
+_shared_session = None
+_shared_session_lock = threading.Lock()
+
+
+def get_shared_session() -> SharedMCPSession:
+    global _shared_session
+    with _shared_session_lock:
+        if _shared_session is None:
+            _shared_session = SharedMCPSession()
+            atexit.register(_shared_session.close)
+        return _shared_session
+
 # Example usage (for testing only)
 async def main():
     client = MCPClient()
@@ -112,5 +648,48 @@ async def main():
     finally:
         await client.close()
 
+def benchmark_result_sets(events: int = 100000):
+    """Memory per event of a parsed result as dicts, as an object-dtype DataFrame and as a CompactResultSet"""
+    import random
+    import tracemalloc
+    import pandas as pd
+
+    hosts = [f"web-{i:02d}.example.com" for i in range(50)]
+    payload = json.dumps({'results': [{
+        '_time': f"2024-05-01T{i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}.000+00:00",
+        'host': random.choice(hosts),
+        'source': "/var/log/nginx/access.log",
+        'sourcetype': "access_combined",
+        'status': str(random.choice([200, 200, 200, 301, 404, 500])),
+        'bytes': str(random.randint(200, 90000)),
+        'clientip': f"10.0.{random.randint(0, 3)}.{random.randint(1, 254)}",
+        '_raw': f'10.0.0.{i % 255} - - [01/May/2024] "GET /item/{i} HTTP/1.1" 200 {i % 9000}',
+    } for i in range(events)]})
+
+    def measure(build):
+        # Timed without tracing, which would slow the build several times over
+        started = time.perf_counter()
+        build()
+        elapsed = time.perf_counter() - started
+        tracemalloc.start()
+        result = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return result, size, elapsed
+
+    # Each representation is built from the payload and measured once the parsed dicts are gone
+    _, dict_bytes, dict_seconds = measure(lambda: parse_result_records(payload))
+    _, frame_bytes, frame_seconds = measure(lambda: pd.DataFrame.from_records(parse_result_records(payload)))
+    compact, compact_bytes, compact_seconds = measure(lambda: CompactResultSet.from_payload(payload))
+    print(f"📏 {events} events, {len(payload) / events:.0f} bytes/event as JSON")
+    print(f"   - list of dicts:      {dict_bytes / events:6.0f} bytes/event ({dict_seconds:.2f}s)")
+    print(f"   - DataFrame (object): {frame_bytes / events:6.0f} bytes/event ({frame_seconds:.2f}s)")
+    print(f"   - CompactResultSet:   {compact_bytes / events:6.0f} bytes/event ({compact_seconds:.2f}s, "
+          f"{compact.bytes_per_event():.0f} by nbytes())")
+
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    if len(sys.argv) > 1 and sys.argv[1] == "--benchmark":
+        # python client.py --benchmark [events]
+        benchmark_result_sets(int(sys.argv[2]) if len(sys.argv) > 2 else 100000)
+    else:
+        asyncio.run(main())
\ No newline at end of file
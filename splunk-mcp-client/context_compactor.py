@@ -0,0 +1,100 @@
+import os
+import re
+import json
+
+from client import parse_result_records
+
+# Rough chars-per-token ratio for Gemini-style tokenizers on log data
+CHARS_PER_TOKEN = 4
+JSON_BLOCK_PATTERN = re.compile(r'\{.*\}|\[.*\]', re.DOTALL)
+
+COMPACTION_STATS = {
+    'calls': 0,
+    'original_tokens': 0,
+    'compacted_tokens': 0,
+}
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def extract_records(output: str) -> list:
+    """Find result rows anywhere in a task output (agent answers wrap the tool payload in prose)"""
+    records = parse_result_records(output)
+    if records:
+        return records
+    json_match = JSON_BLOCK_PATTERN.search(output)
+    if json_match:
+        records = parse_result_records(json_match.group(0))
+    return records
+
+
+def _truncate_to_tokens(text: str, tokens: int) -> str:
+    max_chars = max(tokens, 0) * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    return text[:max(max_chars - 20, 0)] + "\n...[truncated]"
+
+
+def compact_context(previous_output: str, extracted_spl: str = "", extracted_search_name: str = "", token_budget=None, sample_rows=None):
+    """Reduce a previous task output to what a dependent step needs, within a token budget.
+
+    Returns the context text to embed in the next prompt and the token accounting for it.
+    """
+    token_budget = int(os.getenv("CONTEXT_TOKEN_BUDGET", "800")) if token_budget is None else token_budget
+    sample_rows = int(os.getenv("CONTEXT_SAMPLE_ROWS", "5")) if sample_rows is None else sample_rows
+    original_tokens = estimate_tokens(previous_output)
+
+    if token_budget <= 0 or original_tokens <= token_budget:
+        context = f"Previous task output:\n{previous_output}\n\n"
+        return context, _record(original_tokens, original_tokens)
+
+    lines = ["Previous task context (compacted):"]
+    if extracted_spl:
+        lines.append(f"- SPL: {extracted_spl}")
+    if extracted_search_name:
+        lines.append(f"- Search name: {extracted_search_name}")
+
+    records = extract_records(previous_output)
+    if records:
+        columns = list(dict.fromkeys(key for row in records for key in row))
+        lines.append(f"- Row count: {len(records)}")
+        lines.append(f"- Fields: {', '.join(columns)}")
+        header = "\n".join(lines)
+        sample_lines = []
+        used = estimate_tokens(header) + estimate_tokens("- Sample rows:")
+        for row in records[:sample_rows]:
+            row_text = "  " + json.dumps(row, default=str)
+            row_tokens = estimate_tokens(row_text) + 1
+            if used + row_tokens > token_budget:
+                break
+            sample_lines.append(row_text)
+            used += row_tokens
+        if sample_lines:
+            lines.append(f"- Sample rows (top {len(sample_lines)}):")
+            lines.extend(sample_lines)
+        context = "\n".join(lines)
+    else:
+        # No tabular payload: keep the head of the output within whatever budget is left
+        header = "\n".join(lines + ["- Output excerpt:"])
+        excerpt = _truncate_to_tokens(previous_output, token_budget - estimate_tokens(header))
+        context = f"{header}\n{excerpt}"
+
+    context = _truncate_to_tokens(context, token_budget) + "\n\n"
+    return context, _record(original_tokens, estimate_tokens(context))
+
+
+def _record(original_tokens: int, compacted_tokens: int) -> dict:
+    COMPACTION_STATS['calls'] += 1
+    COMPACTION_STATS['original_tokens'] += original_tokens
+    COMPACTION_STATS['compacted_tokens'] += compacted_tokens
+    return {
+        'original_tokens': original_tokens,
+        'compacted_tokens': compacted_tokens,
+        'saved_tokens': original_tokens - compacted_tokens,
+    }
+
+
+def tokens_saved() -> int:
+    return COMPACTION_STATS['original_tokens'] - COMPACTION_STATS['compacted_tokens']
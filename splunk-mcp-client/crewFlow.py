@@ -1,25 +1,122 @@
-from crewai import Agent, Task, Crew, Process, LLM
+from crewai import Agent, Task, Crew, Process
 from dotenv import load_dotenv
 import asyncio
-from client import MCPClient 
+from client import JOB_DONE, MCPClient, get_shared_session, tool_result_text, uses_remote_server
+from context_compactor import compact_context, tokens_saved
+from result_digest import digest_tool_response
 import os
 from crewai.tools import BaseTool 
 from typing import Type
 from pydantic import BaseModel, Field
 import sys
+import re
+import time
+from intent_engine import match_intent, is_high_confidence
+from spl_cache import SPLSimilarityIndex
+from incremental_search import IncrementalSearchState
+from result_store import LocalQueryError, is_local_filter, query_stored_results
+from splunk_catalog import SplunkCatalog
+from spl_rewriter import estimate_cost, rewrite_spl
+from search_jobs import SearchJobManager
+from metrics import LLM_TOKENS, flush_metrics
+from llm_gateway import get_gateway, llm_caller
+from profiling import profile_run
+from result_channel import get_run_dir
+from prefetch import load_prefetched
+from progressive import preview_rows, with_preview
+import atexit
+from cancellation import (
+    StepDeadlineExceeded, WorkflowCancelled, allot_step_budget, install_cancel_handler, step_deadline, time_remaining
+)
 load_dotenv()
 
-gemini_llm= LLM(
-    model="gemini/gemini-1.5-flash", 
-    provider="google",              
-    api_key=os.getenv("GOOGLE_API_KEY"),
-    temperature=0.7,
-    verbose=True
-)
+# Agents share the gateway's LLM, so their requests are rate limited, retried and measured
+gemini_llm = get_gateway().llm(temperature=0.7, verbose=True)
 
 class ValidateSPLInput(BaseModel):
     query: str = Field(..., description="The SPL query to validate")
 
+# Queries the Splunk search tools ran without error in this process; only these feed the SPL cache
+successful_queries = set()
+
+_spl_cache = None
+
+def get_spl_cache():
+    global _spl_cache
+    if _spl_cache is None:
+        _spl_cache = SPLSimilarityIndex()
+    return _spl_cache
+
+_incremental_state = None
+
+def get_incremental_state():
+    """Watermark store for sliding-window searches, or None when incremental mode is off"""
+    global _incremental_state
+    if os.getenv("INCREMENTAL_SEARCH", "0") != "1":
+        return None
+    if _incremental_state is None:
+        _incremental_state = IncrementalSearchState()
+    return _incremental_state
+
+_catalog = None
+
+def get_catalog():
+    """Catalog persisted by the UI's background refresher (or a cron run of splunk_catalog.py)"""
+    global _catalog
+    if _catalog is None:
+        _catalog = SplunkCatalog()
+    return _catalog
+
+_job_manager = None
+
+def get_job_manager():
+    """Background search jobs for long workflow searches; connects on first use"""
+    global _job_manager
+    if _job_manager is None:
+        _job_manager = SearchJobManager().start()
+        atexit.register(_job_manager.shutdown)
+    return _job_manager
+
+def prepare_query(query, earliest_time, latest_time):
+    """Run the cost-aware rewriter between SPL generation and execution"""
+    if os.getenv("SPL_REWRITE", "1") != "1":
+        return query, earliest_time, latest_time
+    rewrite = rewrite_spl(query, earliest_time, latest_time, get_catalog().data)
+    if rewrite['rules']:
+        print(f"🛠️ SPL rewrite [{', '.join(rewrite['rules'])}]: est. cost {rewrite['cost_before']:,.0f} -> {rewrite['cost_after']:,.0f}")
+        print(f"   {query}\n   -> {rewrite['query']} ({rewrite['earliest_time']} to {rewrite['latest_time']})")
+    else:
+        print(f"🛠️ SPL est. cost {rewrite['cost_before']:,.0f} (no rewrite applied)")
+    for warning in rewrite['warnings']:
+        print(f"⚠️ {warning}")
+    return rewrite['query'], rewrite['earliest_time'], rewrite['latest_time']
+
+def run_client_call(call):
+    """Run one MCP call, bounded by the current step deadline.
+
+    With MCP_TRANSPORT=http or sse every call in the process shares one session to the
+    long-running server. Over stdio each call gets a fresh client; on timeout or cancellation
+    the pending call_tool is cancelled and the client is closed, which shuts down the MCP
+    server it spawned.
+    """
+    if uses_remote_server():
+        return get_shared_session().run(call, timeout=time_remaining())
+
+    async def with_client():
+        client = MCPClient()
+        try:
+            await client.connect()
+            return await call(client)
+        finally:
+            await client.close()
+
+    return asyncio.get_event_loop().run_until_complete(
+        asyncio.wait_for(with_client(), timeout=time_remaining())
+    )
+
+# search_oneshot returns at most this many rows, so exports standing in for it ask for the same
+ONESHOT_MAX_COUNT = 100
+
 # --- SearchOneshotInput and SearchOneshotTool ---
 class SearchOneshotInput(BaseModel):
     query: str
@@ -33,16 +130,30 @@ class SearchOneshotTool(BaseTool):
 
     def _run(self, query: str, earliest_time: str = "-24h", latest_time: str = "now") -> str:
         print(f"DEBUG (tool input): QUERY={query} EARLIEST={earliest_time} LATEST={latest_time}")
-        client = MCPClient()
-        return asyncio.get_event_loop().run_until_complete(
-            self._async_search(client, query, earliest_time, latest_time)
-        )
-
-    async def _async_search(self, client, query: str, earliest_time: str = "-24h", latest_time: str = "now") -> str:
-        await client.connect()
-        response = await client.search_oneshot(query, earliest_time, latest_time)
-        await client.close()
-        return str(response)
+        executed, earliest_time, latest_time = prepare_query(query, earliest_time, latest_time)
+        return run_client_call(lambda client: self._async_search(client, executed, earliest_time, latest_time, source_query=query))
+
+    async def _async_search(self, client, query: str, earliest_time: str = "-24h", latest_time: str = "now", source_query: str = None) -> str:
+        incremental = get_incremental_state()
+        plan = incremental.plan(query, earliest_time, latest_time) if incremental else None
+        if plan:
+            # Oneshot has no row limit argument, and per-bucket partials need plan['max_count'] rows
+            response = await client.search_export(
+                plan['fetch_query'], plan['earliest_time'], latest_time, plan['max_count'] or ONESHOT_MAX_COUNT, "json"
+            )
+        else:
+            response = await with_preview(
+                "search_oneshot", query,
+                lambda: client.search_oneshot(query, earliest_time, latest_time),
+                lambda bounded, rows: client.search_oneshot(bounded, earliest_time, latest_time)
+            )
+        if getattr(response, 'isError', False):
+            return digest_tool_response("search_oneshot", response)
+        # Remember the SPL as generated; the rewrite is reapplied whenever it runs again
+        successful_queries.add((source_query or query).strip())
+        if plan:
+            return digest_tool_response("search_oneshot", incremental.merge(plan, tool_result_text(response), ONESHOT_MAX_COUNT))
+        return digest_tool_response("search_oneshot", response)
 
 # --- GetIndexesTool ---
 class GetIndexesInput(BaseModel):
@@ -54,13 +165,14 @@ class GetIndexesTool(BaseTool):
     args_schema: Type[BaseModel] = GetIndexesInput
 
     def _run(self) -> str:
-        client = MCPClient()
-        return asyncio.get_event_loop().run_until_complete(self._async_get_indexes(client))
+        prefetched = load_prefetched("get_indexes")
+        if prefetched is not None:
+            print("🔮 Using get_indexes prefetched while the workflow was planned")
+            return prefetched
+        return run_client_call(lambda client: self._async_get_indexes(client))
 
     async def _async_get_indexes(self, client) -> str:
-        await client.connect()
         response = await client.get_indexes()
-        await client.close()
         return str(response)
 
 # --- RunSavedSearchTool ---
@@ -73,14 +185,11 @@ class RunSavedSearchTool(BaseTool):
     args_schema: Type[BaseModel] = RunSavedSearchInput
 
     def _run(self, search_name: str) -> str:
-        client = MCPClient()
-        return asyncio.get_event_loop().run_until_complete(self._async_run_search(client, search_name))
+        return run_client_call(lambda client: self._async_run_search(client, search_name))
 
     async def _async_run_search(self, client, search_name: str) -> str:
-        await client.connect()
         response = await client.run_saved_search(search_name)
-        await client.close()
-        return str(response)
+        return digest_tool_response("run_saved_search", response)
 
 # --- SearchExportTool ---
 class SearchExportInput(BaseModel):
@@ -96,16 +205,28 @@ class SearchExportTool(BaseTool):
     args_schema: Type[BaseModel] = SearchExportInput
 
     def _run(self, query: str, earliest_time: str = "-24h", latest_time: str = "now", max_count: int = 100, output_format: str = "json") -> str:
-        client = MCPClient()
-        return asyncio.get_event_loop().run_until_complete(
-            self._async_export(client, query, earliest_time, latest_time, max_count, output_format)
-        )
+        query, earliest_time, latest_time = prepare_query(query, earliest_time, latest_time)
+        return run_client_call(lambda client: self._async_export(client, query, earliest_time, latest_time, max_count, output_format))
 
     async def _async_export(self, client, query: str, earliest_time: str, latest_time: str, max_count: int, output_format: str) -> str:
-        await client.connect()
-        response = await client.search_export(query, earliest_time, latest_time, max_count, output_format)
-        await client.close()
-        return str(response)
+        incremental = get_incremental_state()
+        # Merged results are rebuilt as JSON rows, so only JSON exports can be refreshed incrementally
+        plan = incremental.plan(query, earliest_time, latest_time) if incremental and output_format == "json" else None
+        if not plan:
+            full_export = lambda: client.search_export(query, earliest_time, latest_time, max_count, output_format)
+            if max_count <= preview_rows():
+                response = await full_export()
+            else:
+                # The preview is always JSON so it can be shown as a table whatever the export format
+                response = await with_preview(
+                    "search_export", query, full_export,
+                    lambda bounded, rows: client.search_export(bounded, earliest_time, latest_time, rows, "json")
+                )
+            return digest_tool_response("search_export", response)
+        response = await client.search_export(plan['fetch_query'], plan['earliest_time'], latest_time, plan['max_count'] or max_count, output_format)
+        if getattr(response, 'isError', False):
+            return digest_tool_response("search_export", response)
+        return digest_tool_response("search_export", incremental.merge(plan, tool_result_text(response), max_count))
 
 class GetSavedSearchesInput(BaseModel):
     pass
@@ -116,13 +237,10 @@ class GetSavedSearchesTool(BaseTool):
     args_schema: Type[BaseModel] = GetSavedSearchesInput
 
     def _run(self) -> str:
-        client = MCPClient()
-        return asyncio.get_event_loop().run_until_complete(self._async_get_saved_searches(client))
+        return run_client_call(lambda client: self._async_get_saved_searches(client))
 
     async def _async_get_saved_searches(self, client) -> str:
-        await client.connect()
         response = await client.get_saved_searches()
-        await client.close()
         return str(response)
 
 class ValidateSPLTool(BaseTool):
@@ -131,13 +249,10 @@ class ValidateSPLTool(BaseTool):
     args_schema: Type[BaseModel] = ValidateSPLInput
 
     def _run(self, query: str) -> str:
-        client = MCPClient()
-        return asyncio.get_event_loop().run_until_complete(self._async_validate(client, query))
+        return run_client_call(lambda client: self._async_validate(client, query))
 
     async def _async_validate(self, client, query: str) -> str:
-        await client.connect()
         response = await client.validate_spl(query)
-        await client.close()
         return str(response)
 
 
@@ -150,15 +265,35 @@ class GetConfigTool(BaseTool):
     args_schema: Type[BaseModel] = GetConfigInput
 
     def _run(self) -> str:
-        client = MCPClient()
-        return asyncio.get_event_loop().run_until_complete(self._async_get_config(client))
+        prefetched = load_prefetched("get_config")
+        if prefetched is not None:
+            print("🔮 Using get_config prefetched while the workflow was planned")
+            return prefetched
+        return run_client_call(lambda client: self._async_get_config(client))
 
     async def _async_get_config(self, client) -> str:
-        await client.connect()
         response = await client.get_config()
-        await client.close()
         return str(response)
     
+class QueryLocalResultsInput(BaseModel):
+    pipeline: str = Field(..., description="SPL refinement such as '| search status=404 | stats count by host | sort -count | head 5'")
+    table: str = Field("latest", description="Stored result table to refine, 'latest' for the most recent")
+
+class QueryLocalResultsTool(BaseTool):
+    name: str = "Query Local Results"
+    description: str = (
+        "Refines search results already fetched in this or the previous workflow without querying Splunk. "
+        "Supports search/where filters, stats (count, sum, avg, min, max, dc) by, top, rare, timechart, sort, head, fields."
+    )
+    args_schema: Type[BaseModel] = QueryLocalResultsInput
+
+    def _run(self, pipeline: str, table: str = "latest") -> str:
+        try:
+            result = query_stored_results(pipeline, [os.getenv("RUN_DIR"), os.getenv("PREVIOUS_RUN_DIR")], table)
+        except LocalQueryError as e:
+            return f"Error: {e}"
+        return digest_tool_response("query_results", result.to_json(orient='records', date_format='iso'))
+
 validate_spl_tool = ValidateSPLTool()
 search_oneshot_tool = SearchOneshotTool()
 get_indexes_tool = GetIndexesTool()
@@ -166,6 +301,7 @@ run_saved_search_tool = RunSavedSearchTool()
 search_export_tool = SearchExportTool()
 get_saved_searches_tool = GetSavedSearchesTool()
 get_config_tool = GetConfigTool()
+query_local_results_tool = QueryLocalResultsTool()
 
 splunk_agent = Agent(
     role="Splunk Security Analyst and SPL Expert",
@@ -196,7 +332,9 @@ splunk_agent = Agent(
     llm=gemini_llm,
 )
 
-def create_spl_query_agent():
+def create_spl_query_agent(export=False):
+    # A search folded with its export runs once through the Search Export tool
+    search_tool = search_export_tool if export else search_oneshot_tool
     return Agent(
         role="SPL Query Specialist",
         goal="Convert natural language to optimized SPL queries",
@@ -221,7 +359,7 @@ QUERY REQUIREMENTS :
 """,
         verbose=True,
         llm=gemini_llm,
-        tools=[search_oneshot_tool, get_indexes_tool]
+        tools=[search_tool, get_indexes_tool]
     )
 
 def create_search_execution_agent():
@@ -282,6 +420,17 @@ def create_configuration_agent():
         tools=[get_config_tool, get_indexes_tool]
     )
 
+def create_result_analysis_agent():
+    return Agent(
+        role="Result Analysis Specialist",
+        goal="Answer follow-up questions from results that were already fetched",
+        backstory="""Expert in slicing search results with SPL reporting commands.
+        Refines stored results locally (filters, grouping, top values, time buckets) instead of running new searches.""",
+        verbose=True,
+        llm=gemini_llm,
+        tools=[query_local_results_tool]
+    )
+
 # Agent selection function
 def get_specialized_agent(task_name: str):
     """Return the appropriate specialized agent for each task type"""
@@ -292,15 +441,14 @@ def get_specialized_agent(task_name: str):
         'get_saved_searches': create_saved_search_agent(),
         'validate_spl': create_validation_agent(),
         'get_indexes': create_configuration_agent(),
-        'get_config': create_configuration_agent()
+        'get_config': create_configuration_agent(),
+        'query_results': create_result_analysis_agent()
     }
     
     return agent_mapping.get(task_name, create_spl_query_agent())  # Default fallback
 
-def create_task_from_info_with_context(task_info, task_index, previous_outputs):
-    """Enhanced version that properly handles context from previous tasks"""
-    task_name = task_info['task']
-    description = task_info['description']
+def build_task_inputs(task_info, previous_outputs):
+    """Collect the context and resolved parameters a task needs from previous tasks and the environment"""
     depends_on = task_info.get('depends_on')
     
     # Build context from previous tasks
@@ -310,20 +458,45 @@ def create_task_from_info_with_context(task_info, task_index, previous_outputs):
     
     if depends_on is not None and depends_on in previous_outputs:
         previous_output = previous_outputs[depends_on]
-        context = f"Previous task output:\n{previous_output}\n\n"
         
         # Extract useful information from previous output
         extracted_spl = extract_spl_from_output(previous_output)
         extracted_search_name = extract_search_name_from_output(previous_output)
         
         print(f"🔍 Extracted from previous task: SPL='{extracted_spl[:50]}...', Name='{extracted_search_name}'")
+        
+        # Pass only what the dependent step needs instead of the full previous output
+        context, compaction = compact_context(previous_output, extracted_spl, extracted_search_name)
+        if compaction['saved_tokens'] > 0:
+            print(f"🗜️ Context compacted: {compaction['original_tokens']} -> {compaction['compacted_tokens']} tokens (saved {compaction['saved_tokens']})")
     
     # Get environment variables
-    user_request = os.getenv("USER_REQUEST", "")
-    earliest = os.getenv("EARLIEST", "-24h")
-    latest = os.getenv("LATEST", "now")
-    max_count = int(os.getenv("MAX_COUNT", "100"))
-    output_format = os.getenv("OUTPUT_FORMAT", "json")
+    return {
+        'context': context,
+        'extracted_spl': extracted_spl,
+        'extracted_search_name': extracted_search_name,
+        'user_request': os.getenv("USER_REQUEST", ""),
+        'earliest': os.getenv("EARLIEST", "-24h"),
+        'latest': os.getenv("LATEST", "now"),
+        'max_count': int(os.getenv("MAX_COUNT", "100")),
+        'output_format': os.getenv("OUTPUT_FORMAT", "json"),
+    }
+
+def create_task_from_info_with_context(task_info, task_index, previous_outputs, inputs=None):
+    """Enhanced version that properly handles context from previous tasks"""
+    task_name = task_info['task']
+    description = task_info['description']
+    
+    if inputs is None:
+        inputs = build_task_inputs(task_info, previous_outputs)
+    context = inputs['context']
+    extracted_spl = inputs['extracted_spl']
+    extracted_search_name = inputs['extracted_search_name']
+    user_request = inputs['user_request']
+    earliest = inputs['earliest']
+    latest = inputs['latest']
+    max_count = inputs['max_count']
+    output_format = inputs['output_format']
     
     if task_name == "validate_spl":
         # Extract SPL from user request for validation
@@ -343,9 +516,31 @@ Execute the tool and return the validation results.
         )
     
     elif task_name == "search_oneshot":
+        catalog_context = get_catalog().slice_for(user_request) if os.getenv("CATALOG", "1") == "1" else ""
+        if catalog_context:
+            catalog_context += "\n\n"
+        if task_info.get('export'):
+            return Task(
+                description=f"""
+{context}{catalog_context}You must use the Search Export tool to execute and export this search request: "{user_request}"
+
+Convert the user request to SPL and use the Search Export tool with:
+- query: [your converted SPL query]
+- earliest_time: {earliest}
+- latest_time: {latest}
+- max_count: {max_count}
+- output_format: {output_format}
+
+IMPORTANT: After using the tool, prefix your SPL query in the response with "GENERATED_SPL: " followed by the exact query you used.
+
+Execute the tool and return the exported results with the SPL prefix.
+""",
+                expected_output="Exported search results from the Search Export tool with GENERATED_SPL prefix",
+                agent=create_spl_query_agent(export=True)
+            )
         return Task(
             description=f"""
-{context}You must use the Search Oneshot tool to execute this search request: "{user_request}"
+{context}{catalog_context}You must use the Search Oneshot tool to execute this search request: "{user_request}"
 
 Convert the user request to SPL and use the Search Oneshot tool with:
 - query: [your converted SPL query]
@@ -435,6 +630,21 @@ Execute the tool and return the configuration.
             agent=get_specialized_agent(task_name)
         )
     
+    elif task_name == "query_results":
+        return Task(
+            description=f"""
+{context}You must use the Query Local Results tool to answer this follow-up request from results that were already fetched: "{user_request}"
+
+Write an SPL refinement pipeline for the request (for example "| stats count by host | sort -count | head 5") and use the Query Local Results tool with:
+- pipeline: [your refinement pipeline]
+- table: latest
+
+Do not run a new Splunk search. Execute the tool and return the refined results.
+""",
+            expected_output="Refined results from the Query Local Results tool",
+            agent=get_specialized_agent(task_name)
+        )
+    
     # Default fallback
     return Task(
         description=f"{context}{description} - Use the appropriate tool to complete this task.",
@@ -442,9 +652,25 @@ Execute the tool and return the configuration.
         agent=get_specialized_agent(task_name)
     )
 
+# Precompiled patterns for pulling SPL and search names out of outputs and requests
+SPL_IN_OUTPUT_PATTERN = re.compile(r'index=\w+[^|\n]*(?:\|[^|\n]*)*')
+SEARCH_NAME_OUTPUT_PATTERNS = [
+    re.compile(r"saved as ['\"]([^'\"]+)['\"]", re.IGNORECASE),
+    re.compile(r"search ['\"]([^'\"]+)['\"].*saved", re.IGNORECASE),
+    re.compile(r"name ['\"]([^'\"]+)['\"]", re.IGNORECASE)
+]
+SEARCH_NAME_REQUEST_PATTERNS = [
+    re.compile(r"save.*?(?:as|it as)\s*['\"]([^'\"]+)['\"]", re.IGNORECASE),
+    re.compile(r"name.*?['\"]([^'\"]+)['\"]", re.IGNORECASE),
+    re.compile(r"call.*?['\"]([^'\"]+)['\"]", re.IGNORECASE)
+]
+SAVED_SEARCH_REQUEST_PATTERNS = [
+    re.compile(r"run.*?['\"]([^'\"]+)['\"]", re.IGNORECASE),
+    re.compile(r"execute.*?['\"]([^'\"]+)['\"]", re.IGNORECASE)
+]
+
 def extract_spl_from_output(output):
     """Extract SPL query from task output"""
-    import re
     
     # Look for GENERATED_SPL: prefix
     if 'GENERATED_SPL:' in output:
@@ -454,7 +680,7 @@ def extract_spl_from_output(output):
         return spl_line
     
     # Look for index= patterns
-    spl_match = re.search(r'index=\w+[^|\n]*(?:\|[^|\n]*)*', output)
+    spl_match = SPL_IN_OUTPUT_PATTERN.search(output)
     if spl_match:
         return spl_match.group(0).strip()
     
@@ -462,16 +688,8 @@ def extract_spl_from_output(output):
 
 def extract_search_name_from_output(output):
     """Extract search name from task output"""
-    import re
-    
-    patterns = [
-        r"saved as ['\"]([^'\"]+)['\"]",
-        r"search ['\"]([^'\"]+)['\"].*saved",
-        r"name ['\"]([^'\"]+)['\"]"
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, output, re.IGNORECASE)
+    for pattern in SEARCH_NAME_OUTPUT_PATTERNS:
+        match = pattern.search(output)
         if match:
             return match.group(1)
     
@@ -479,56 +697,12 @@ def extract_search_name_from_output(output):
 
 def extract_spl_from_request(user_request):
     """Extract SPL components from natural language request"""
-    import re
-    
-    # Common patterns for Splunk searches
-    request_lower = user_request.lower()
-    
-    # Build SPL based on request patterns
-    spl_parts = []
-    
-    # Index detection
-    index_match = re.search(r'from (\w+) index|index (\w+)', request_lower)
-    if index_match:
-        index_name = index_match.group(1) or index_match.group(2)
-        spl_parts.append(f"index={index_name}")
-    else:
-        spl_parts.append("index=*")
-    
-    # Field extraction for "top X field" patterns
-    top_match = re.search(r'top (\d+) (\w+)', request_lower)
-    if top_match:
-        count = top_match.group(1)
-        field = top_match.group(2)
-        spl_parts.append(f"| top {count} {field}")
-    
-    # Search terms
-    if 'failed login' in request_lower or 'login fail' in request_lower:
-        spl_parts.append('action=failure OR result=fail OR success=false')
-    elif 'error' in request_lower:
-        spl_parts.append('error OR ERROR')
-    elif 'network traffic' in request_lower:
-        spl_parts.append('src_ip=* dest_ip=*')
-    
-    # Time range
-    if 'all time' in request_lower:
-        # This will be handled by earliest/latest parameters
-        pass
-    
-    return ' '.join(spl_parts) if spl_parts else "index=* | head 10"
+    return match_intent(user_request, os.getenv("FORCE_INDEX") or None)['spl']
 
 def extract_search_name_from_request(user_request):
     """Extract search name from user request"""
-    import re
-    
-    patterns = [
-        r"save.*?(?:as|it as)\s*['\"]([^'\"]+)['\"]",
-        r"name.*?['\"]([^'\"]+)['\"]",
-        r"call.*?['\"]([^'\"]+)['\"]"
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, user_request, re.IGNORECASE)
+    for pattern in SEARCH_NAME_REQUEST_PATTERNS:
+        match = pattern.search(user_request)
         if match:
             return match.group(1)
     
@@ -536,34 +710,265 @@ def extract_search_name_from_request(user_request):
 
 def extract_saved_search_name_from_request(user_request):
     """Extract saved search name to run from user request"""
-    import re
-    
-    patterns = [
-        r"run.*?['\"]([^'\"]+)['\"]",
-        r"execute.*?['\"]([^'\"]+)['\"]"
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, user_request, re.IGNORECASE)
+    for pattern in SAVED_SEARCH_REQUEST_PATTERNS:
+        match = pattern.search(user_request)
         if match:
             return match.group(1)
     
     return "default_search"
 
+# Tools the fast path may call without an agent, keyed by task name
+DIRECT_TOOLS = {
+    'search_oneshot': search_oneshot_tool,
+    'get_indexes': get_indexes_tool,
+    'get_config': get_config_tool,
+    'get_saved_searches': get_saved_searches_tool,
+    'validate_spl': validate_spl_tool,
+    'search_export': search_export_tool,
+    'query_results': query_local_results_tool,
+    'run_saved_search': run_saved_search_tool,
+}
+
+def resolve_direct_params(task_name, inputs):
+    """Return tool parameters when a task is fully specified and needs no LLM reasoning, else None"""
+    if os.getenv("DIRECT_EXECUTION", "1") != "1" or task_name not in DIRECT_TOOLS:
+        return None
+    
+    if task_name in ('get_indexes', 'get_config', 'get_saved_searches'):
+        return {}
+    
+    if task_name == "search_oneshot":
+        # Reuse SPL that already ran for a near-identical request; cached SPL names its own
+        # index, so a forced index always goes through the intent engine instead
+        if os.getenv("SPL_CACHE", "1") == "1" and inputs['user_request'] and not os.getenv("FORCE_INDEX"):
+            cached = get_spl_cache().lookup(inputs['user_request'])
+            if cached:
+                print(f"♻️ Reusing proven SPL from similar request '{cached['request']}' (similarity {cached['score']:.2f})")
+                return {
+                    'query': cached['spl'],
+                    'earliest_time': inputs['earliest'],
+                    'latest_time': inputs['latest'],
+                }
+        
+        # Only skip SPL generation when the intent engine is confident about the whole query
+        intent = match_intent(inputs['user_request'], os.getenv("FORCE_INDEX") or None)
+        print(f"🎯 Intent '{intent['intent']}' matched with confidence {intent['confidence']:.2f}")
+        if not is_high_confidence(intent):
+            return None
+        return {
+            'query': intent['spl'],
+            'earliest_time': inputs['earliest'],
+            'latest_time': inputs['latest'],
+        }
+    
+    if task_name == "validate_spl":
+        return {'query': extract_spl_from_request(inputs['user_request']) or "index=* | head 10"}
+    
+    if task_name == "search_export":
+        return {
+            'query': inputs['extracted_spl'] or extract_spl_from_request(inputs['user_request']) or "index=* | head 10",
+            'earliest_time': inputs['earliest'],
+            'latest_time': inputs['latest'],
+            'max_count': inputs['max_count'],
+            'output_format': inputs['output_format'],
+        }
+    
+    if task_name == "query_results":
+        # The stored rows are already scoped to an index, so the filters and command carry over as-is
+        intent = match_intent(inputs['user_request'], needs_index=False)
+        print(f"🎯 Intent '{intent['intent']}' matched with confidence {intent['confidence']:.2f}")
+        if not intent['components'] or not is_high_confidence(intent):
+            return None
+        filters = " ".join(intent['filters'])
+        if filters and not is_local_filter(filters):
+            return None
+        pipeline = ([f"search {filters}"] if filters else []) + ([intent['command'].lstrip('| ')] if intent['command'] else [])
+        return {'pipeline': " | ".join(pipeline)}
+    
+    if task_name == "run_saved_search":
+        search_name = inputs['extracted_search_name'] or extract_saved_search_name_from_request(inputs['user_request'])
+        # Without a concrete name the agent has to look one up in the saved search list
+        if search_name and search_name != "default_search":
+            return {'search_name': search_name}
+    
+    return None
+
+def execute_task_directly(task_name, params):
+    """Call the MCP tool for a task without spinning up an Agent and Crew"""
+    tool_output = DIRECT_TOOLS[task_name]._run(**params)
+    if task_name in ("search_oneshot", "search_export"):
+        return f"GENERATED_SPL: {params['query']}\n{tool_output}"
+    return tool_output
+
+def record_proven_spl(user_request, task_output):
+    """Remember the request -> SPL mapping when the generated query ran without error"""
+    spl = extract_spl_from_output(task_output)
+    # SPL built for a forced index doesn't answer the request as worded
+    if os.getenv("SPL_CACHE", "1") != "1" or os.getenv("FORCE_INDEX") or not user_request or spl not in successful_queries:
+        return
+    try:
+        get_spl_cache().record(user_request, spl)
+        print("💾 Cached proven SPL for similar future requests")
+    except Exception as e:
+        print(f"⚠️ Could not update SPL cache: {e}")
+
+def record_crew_usage(crew, caller):
+    """Add the tokens a Crew reports (UsageMetrics or a plain dict, depending on the CrewAI version)"""
+    usage = getattr(crew, 'usage_metrics', None)
+    if usage is None:
+        return
+    if not isinstance(usage, dict):
+        usage = usage.model_dump() if hasattr(usage, 'model_dump') else vars(usage)
+    LLM_TOKENS.inc(usage.get('prompt_tokens') or 0, caller=caller, kind="prompt")
+    LLM_TOKENS.inc(usage.get('completion_tokens') or 0, caller=caller, kind="completion")
+
+def execute_step(task_info, i, context_data, inputs, direct_params):
+    """Run one step, directly through its tool or with a single-task Crew, and return its output"""
+    if direct_params is not None:
+        print(f"⚡ Direct execution of task {i+1}: {task_info['task']} (no agent needed)")
+        if task_info.get('export'):
+            # Folded search + export: the generated SPL runs once, straight into the export
+            task_output = execute_task_directly("search_export", {
+                **direct_params, 'max_count': inputs['max_count'], 'output_format': inputs['output_format']
+            })
+        else:
+            task_output = execute_task_directly(task_info['task'], direct_params)
+        print(task_output)
+        return task_output
+    
+    # Create task with proper context
+    task = create_task_from_info_with_context(task_info, i, context_data, inputs)
+    
+    # Create a mini-crew for this single task
+    single_task_crew = Crew(
+        agents=[task.agent],
+        tasks=[task],
+        process=Process.sequential,
+        verbose=True
+    )
+    
+    print(f"🚀 Starting execution of task {i+1}: {task_info['task']}")
+    
+    # Execute the single task
+    caller = f"agent:{task_info['task']}"
+    with llm_caller(caller):
+        result = single_task_crew.kickoff()
+    record_crew_usage(single_task_crew, caller)
+    
+    # Store the result for future dependent tasks
+    if hasattr(result, 'raw'):
+        return result.raw
+    elif hasattr(result, 'tasks_output') and result.tasks_output:
+        return str(result.tasks_output[0])
+    return str(result)
+
+def background_search_params(task_info, inputs, direct_params):
+    """Export arguments when a direct search step is big enough to run as a background job, else None.
+
+    A job lets the steps that don't depend on the search run while it does. Searches estimated
+    to scan at least SEARCH_JOB_MIN_COST events, or exports of at least SEARCH_JOB_MIN_ROWS rows,
+    qualify. Incremental refreshes keep the tool path, which merges them with cached partials.
+    """
+    if os.getenv("SEARCH_JOBS", "1") != "1" or direct_params is None or get_incremental_state():
+        return None
+    if task_info['task'] not in ('search_oneshot', 'search_export'):
+        return None
+    export = task_info['task'] == 'search_export' or task_info.get('export')
+    max_count = inputs['max_count'] if export else ONESHOT_MAX_COUNT
+    cost = estimate_cost(direct_params['query'], direct_params['earliest_time'], direct_params['latest_time'], get_catalog().data)
+    if cost < float(os.getenv("SEARCH_JOB_MIN_COST", "5000000")) and max_count < int(os.getenv("SEARCH_JOB_MIN_ROWS", "10000")):
+        return None
+    return {
+        'query': direct_params['query'],
+        'earliest_time': direct_params['earliest_time'],
+        'latest_time': direct_params['latest_time'],
+        'max_count': max_count,
+        'output_format': inputs['output_format'] if export else "json",
+        'tool': "search_export" if export else "search_oneshot",
+        'cost': cost,
+    }
+
+def dispatch_search_job(params):
+    """Start a step's search as a background job and return its job id"""
+    query, earliest_time, latest_time = prepare_query(params['query'], params['earliest_time'], params['latest_time'])
+    return get_job_manager().submit(query, earliest_time, latest_time, params['max_count'], params['output_format'])
+
+def collect_search_job(sid, params, timeout):
+    """Wait for a step's background search and return the step output"""
+    manager = get_job_manager()
+    status = manager.wait(sid, timeout)
+    if not status['is_done']:
+        manager.cancel(sid)
+        raise StepDeadlineExceeded(f"Background search {sid} did not finish within its step deadline")
+    response = manager.response(sid)
+    manager.forget(sid)
+    if status['state'] != JOB_DONE:
+        raise RuntimeError(f"Background search {sid} {status['state']}: {status['error']}")
+    if not getattr(response, 'isError', False):
+        successful_queries.add(params['query'].strip())
+    return f"GENERATED_SPL: {params['query']}\n{digest_tool_response(params['tool'], response)}"
+
+# Relative share of the workflow budget each step type gets; agent steps need the most time
+STEP_BUDGET_WEIGHTS = {
+    'search_oneshot': 3,
+    'search_export': 2,
+    'run_saved_search': 2,
+}
+
 def run_task_sequence(task_sequence):
     """Execute sequence with proper task chaining and dependency management"""
     
     print(f"🔗 Starting task sequence with {len(task_sequence)} tasks")
     
+    # Each step gets a deadline carved out of what is left of the workflow budget
+    workflow_deadline = time.time() + float(os.getenv("WORKFLOW_BUDGET_SECONDS", "585"))
+    step_weights = [STEP_BUDGET_WEIGHTS.get(task_info['task'], 1) for task_info in task_sequence]
+    
     # Execute tasks in dependency order
     completed_tasks = {}
+    # Steps whose search runs as a background job: index -> (job id, params, inputs, started, deadline)
+    background = {}
+    
+    def finish_step(i, task_info, inputs, step_start, task_output, printed):
+        completed_tasks[i] = task_output
+        if task_info['task'] == 'search_oneshot':
+            record_proven_spl(inputs['user_request'], task_output)
+        print(f"✅ Task {i+1} completed successfully")
+        # Direct steps already printed their full output; only agent output needs the preview
+        if not printed:
+            print(f"📤 Output preview: {task_output[:2000]}...")
+        print(f"⏱️ TASK_DURATION: {time.time() - step_start:.2f}s")
+    
+    def fail_step(i, step_start, step_budget, e):
+        error_msg = f"Task {i+1} failed: {str(e)}"
+        if isinstance(e, (StepDeadlineExceeded, asyncio.TimeoutError)):
+            error_msg = f"Task {i+1} failed: timeout after its {step_budget:.0f}s step deadline"
+        completed_tasks[i] = error_msg
+        print(f"❌ {error_msg}")
+        print(f"⏱️ TASK_DURATION: {time.time() - step_start:.2f}s")
+    
+    def collect(i):
+        # The UI joins blocks with the same STEP_INDEX, so the result lands on the dispatched step
+        sid, params, inputs, step_start, deadline = background.pop(i)
+        print(f"\n📬 Collecting background search for task {i+1}: {sid}")
+        print(f"STEP_INDEX: {i}")
+        try:
+            task_output = collect_search_job(sid, params, max(deadline - time.time(), 0.0))
+            print(task_output)
+            finish_step(i, task_sequence[i], inputs, step_start, task_output, printed=True)
+        except (Exception, StepDeadlineExceeded) as e:
+            fail_step(i, step_start, deadline - step_start, e)
+        print("-----END TASK-----")
     
     for i, task_info in enumerate(task_sequence):
-        print(f"\n🚀 Executing task {i+1}/{len(task_sequence)}: {task_info['task']}")
-        
         # Check if this task depends on another
         depends_on = task_info.get('depends_on')
         context_data = {}
+        if depends_on in background:
+            collect(depends_on)
+        
+        print(f"\n🚀 Executing task {i+1}/{len(task_sequence)}: {task_info['task']}")
+        print(f"STEP_INDEX: {i}")
         
         if depends_on is not None:
             if depends_on not in completed_tasks:
@@ -575,49 +980,44 @@ def run_task_sequence(task_sequence):
             context_data[depends_on] = dependency_output
             print(f"📥 Using output from task {depends_on+1} as context")
         
-        # Create task with proper context
-        task = create_task_from_info_with_context(task_info, i, context_data)
-        
-        # Create a mini-crew for this single task
-        agent = get_specialized_agent(task_info['task'])
-        single_task_crew = Crew(
-            agents=[agent],
-            tasks=[task],
-            process=Process.sequential,
-            verbose=True
-        )
+        inputs = build_task_inputs(task_info, context_data)
+        direct_params = resolve_direct_params(task_info['task'], inputs)
         
+        step_start = time.time()
+        step_budget = allot_step_budget(workflow_deadline - step_start, step_weights[i:])
+        print(f"⏳ Step deadline: {step_budget:.0f}s")
         try:
-            print(f"🚀 Starting execution of task {i+1}: {task_info['task']}")
-            
-            # Execute the single task
-            result = single_task_crew.kickoff()
-            
-            # Store the result for future dependent tasks
-            if hasattr(result, 'raw'):
-                task_output = result.raw
-            elif hasattr(result, 'tasks_output') and result.tasks_output:
-                task_output = str(result.tasks_output[0])
-            else:
-                task_output = str(result)
-            
-            completed_tasks[i] = task_output
-            print(f"✅ Task {i+1} completed successfully")
-            print(f"📤 Output preview: {task_output[:2000]}...")
+            if step_budget <= 0:
+                raise StepDeadlineExceeded("Workflow budget exhausted before this step started")
+            job_params = background_search_params(task_info, inputs, direct_params)
+            if job_params:
+                with step_deadline(step_budget):
+                    sid = dispatch_search_job(job_params)
+                background[i] = (sid, job_params, inputs, step_start, step_start + step_budget)
+                print(f"⏳ Search est. {job_params['cost']:,.0f} events; running as background job {sid} while later steps proceed")
+                print("-----END TASK-----")
+                continue
+            with step_deadline(step_budget):
+                task_output = execute_step(task_info, i, context_data, inputs, direct_params)
+            finish_step(i, task_info, inputs, step_start, task_output, printed=direct_params is not None)
             
             # Print delimiter for streamlit parsing
             print("-----END TASK-----")
             
-        except Exception as e:
-            error_msg = f"Task {i+1} failed: {str(e)}"
-            completed_tasks[i] = error_msg
-            print(f"❌ {error_msg}")
+        except (Exception, StepDeadlineExceeded) as e:
+            fail_step(i, step_start, step_budget, e)
             print("-----END TASK-----")
     
+    for i in sorted(background):
+        collect(i)
+    
+    print(f"🗜️ CONTEXT_TOKENS_SAVED: {tokens_saved()}")
+    
     # Return summary of all completed tasks
     return {
         'completed_tasks': len(completed_tasks),
         'total_tasks': len(task_sequence),
+        'context_tokens_saved': tokens_saved(),
         'outputs': completed_tasks
     }
 
@@ -642,10 +1042,23 @@ if __name__ == "__main__":
         # Execute task sequence
         import json
         task_sequence = json.loads(task_sequence_env)
-        result = run_task_sequence(task_sequence)
+        install_cancel_handler()
+        atexit.register(flush_metrics)
+        try:
+            # PROFILE_WORKFLOW=1 saves cProfile and tracemalloc artifacts next to the run
+            with profile_run(get_run_dir()):
+                result = run_task_sequence(task_sequence)
+        except WorkflowCancelled:
+            print("⛔ Workflow cancelled")
+            print("-----END TASK-----")
+            sys.exit(130)
         print(result)
+    elif len(sys.argv) >= 3 and sys.argv[1] == "--batch":
+        # Many workflows from a JSONL file: python crewFlow.py --batch requests.jsonl [--parallel N]
+        from batch_runner import main as run_batch_cli
+        sys.exit(run_batch_cli(sys.argv[2:]))
     elif len(sys.argv) >= 2:
         # Single task (backward compatibility)
         run(sys.argv[1])
     else:
-        print("Usage: python crewFlow.py <task_name> OR set TASK_SEQUENCE environment variable")
+        print("Usage: python crewFlow.py <task_name> OR python crewFlow.py --batch <file.jsonl> OR set TASK_SEQUENCE environment variable")
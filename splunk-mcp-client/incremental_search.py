@@ -0,0 +1,264 @@
+import os
+import re
+import json
+import time
+import hashlib
+from typing import Optional
+
+import pandas as pd
+
+from client import parse_result_records
+from metrics import CACHE_REQUESTS
+
+DEFAULT_STATE_DIR = os.path.join(".splunk_assistant", "incremental")
+TIME_FIELD = "_time"
+
+RELATIVE_TIME_PATTERN = re.compile(r"^-(\d+)(s|sec|secs|m|min|mins|h|hr|hrs|d|day|days|w|week|weeks)$")
+UNIT_SECONDS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+# Event-wise commands: running them over disjoint time slices and concatenating gives the same rows
+STREAMING_COMMANDS = frozenset(['search', 'where', 'eval', 'rex', 'fields', 'rename', 'regex', 'spath', 'table', 'bin', 'bucket'])
+STATS_PATTERN = re.compile(r"^stats\s+(?P<aggs>.+?)(?:\s+by\s+(?P<by>[\w\s,.]+))?$", re.IGNORECASE)
+AGG_PATTERN = re.compile(r"(?P<fn>count|sum)(?:\((?P<field>[^)]*)\))?(?:\s+as\s+(?P<alias>\w+))?", re.IGNORECASE)
+TOP_PATTERN = re.compile(r"^(?P<cmd>top|rare)(?:\s+limit=(?P<limit>\d+))?\s+(?P<field>[\w.]+)$", re.IGNORECASE)
+SORT_PATTERN = re.compile(r"^sort\s+(?:(?P<limit>\d+)\s+)?(?P<sign>[-+])?\s*(?P<field>[\w()]+)$", re.IGNORECASE)
+HEAD_PATTERN = re.compile(r"^head(?:\s+(?:limit=)?(?P<limit>\d+))?$", re.IGNORECASE)
+
+
+def canonical_spl(query: str) -> str:
+    return " ".join(query.split())
+
+
+def parse_relative_window(earliest_time: str, latest_time: str) -> Optional[int]:
+    """Window length in seconds for '-24h'..'now' style ranges; None when the range can't slide"""
+    if (latest_time or "now").strip().lower() != "now":
+        return None
+    match = RELATIVE_TIME_PATTERN.match((earliest_time or "").strip().lower())
+    if not match:
+        return None  # absolute and snapped (-1d@d) ranges don't move with the clock
+    return int(match.group(1)) * UNIT_SECONDS[match.group(2)[0]]
+
+
+def classify_spl(query: str) -> Optional[dict]:
+    """Decide how results of a query can be refreshed incrementally.
+
+    Returns {'mode': 'events'} for purely streaming searches, an 'aggregate' spec for searches
+    ending in count/sum stats (or top/rare) whose partial results can be summed, or None.
+    """
+    segments = [segment.strip() for segment in canonical_spl(query).split('|')]
+    base = segments[0]
+    commands = [segment for segment in segments[1:] if segment]
+
+    streaming = 0
+    while streaming < len(commands) and commands[streaming].split()[0].lower() in STREAMING_COMMANDS:
+        streaming += 1
+    if streaming == len(commands):
+        return {'mode': 'events'}
+
+    prefix = " | ".join([base] + commands[:streaming])
+    reducer, post = commands[streaming], commands[streaming + 1:]
+
+    top = TOP_PATTERN.match(reducer)
+    if top:
+        ascending = top.group('cmd').lower() == 'rare'
+        return {
+            'mode': 'aggregate',
+            'prefix': prefix,
+            'aggs': [{'fn': 'count', 'field': None, 'column': 'count'}],
+            'by': [top.group('field')],
+            'post': [{'op': 'sort', 'field': 'count', 'ascending': ascending},
+                     {'op': 'head', 'limit': int(top.group('limit') or 10)}],
+            'percent': True,
+        } if not post else None
+
+    stats = STATS_PATTERN.match(reducer)
+    if not stats:
+        return None
+    aggs = []
+    for agg in AGG_PATTERN.finditer(stats.group('aggs')):
+        fn, field = agg.group('fn').lower(), agg.group('field')
+        default_column = f"{fn}({field})" if field else fn
+        aggs.append({'fn': fn, 'field': field, 'column': agg.group('alias') or default_column})
+    # Anything besides count/sum (dc, avg, values...) can't be merged by summing partials
+    if not aggs or AGG_PATTERN.sub("", stats.group('aggs')).strip(" ,"):
+        return None
+
+    post_ops = []
+    for command in post:
+        sort, head = SORT_PATTERN.match(command), HEAD_PATTERN.match(command)
+        if sort:
+            post_ops.append({'op': 'sort', 'field': sort.group('field'), 'ascending': sort.group('sign') != '-'})
+            if sort.group('limit'):
+                post_ops.append({'op': 'head', 'limit': int(sort.group('limit'))})
+        elif head:
+            post_ops.append({'op': 'head', 'limit': int(head.group('limit') or 10)})
+        else:
+            return None
+
+    by = [field.strip() for field in re.split(r"[\s,]+", stats.group('by') or "") if field.strip()]
+    return {'mode': 'aggregate', 'prefix': prefix, 'aggs': aggs, 'by': by, 'post': post_ops, 'percent': False}
+
+
+def to_epoch(values: pd.Series) -> pd.Series:
+    """Parse Splunk _time values (ISO strings or epoch seconds) to float epoch seconds"""
+    numeric = pd.to_numeric(values, errors='coerce')
+    if numeric.notna().all():
+        return numeric.astype(float)
+    parsed = pd.to_datetime(values, errors='coerce', utc=True)
+    epoch = (parsed - pd.Timestamp(0, tz='UTC')).dt.total_seconds()
+    return epoch.fillna(numeric)
+
+
+class IncrementalSearchState:
+    """Per-query watermark and retained results for sliding-window searches.
+
+    A repeated '-24h'..'now' search only fetches events since the last watermark (minus a small
+    lag for late-indexed events). Event rows are merged and expired locally. Count/sum
+    aggregations are fetched as per-bucket partials and summed locally, so the window can slide
+    without refetching it.
+    """
+
+    def __init__(self, state_dir: Optional[str] = None, bucket_seconds: Optional[int] = None, lag_seconds: Optional[int] = None, max_rows: Optional[int] = None):
+        self.state_dir = state_dir or os.getenv("INCREMENTAL_STATE_DIR", DEFAULT_STATE_DIR)
+        self.bucket_seconds = bucket_seconds or int(os.getenv("INCREMENTAL_BUCKET_SECONDS", "60"))
+        self.lag_seconds = lag_seconds if lag_seconds is not None else int(os.getenv("INCREMENTAL_LAG_SECONDS", "60"))
+        self.max_rows = max_rows or int(os.getenv("INCREMENTAL_MAX_ROWS", "50000"))
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.state_dir, f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.json")
+
+    def _load(self, key: str) -> Optional[dict]:
+        try:
+            with open(self._path(key)) as f:
+                state = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        return state if state.get('key') == key else None
+
+    def _save(self, state: dict):
+        os.makedirs(self.state_dir, exist_ok=True)
+        path = self._path(state['key'])
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, default=str)
+        os.replace(tmp_path, path)
+
+    def plan(self, query: str, earliest_time: str, latest_time: str, now: Optional[float] = None) -> Optional[dict]:
+        """Work out what to actually fetch, or None when the query must run as-is"""
+        window = parse_relative_window(earliest_time, latest_time)
+        spec = classify_spl(query)
+        if window is None or spec is None:
+            return None
+
+        now = now or time.time()
+        key = canonical_spl(query)
+        spec_key = f"{key}\n{window}"
+        fetch_query = key
+        if spec['mode'] == 'aggregate':
+            by_clause = ", ".join([TIME_FIELD] + spec['by'])
+            aggs = ", ".join(
+                f"{agg['fn']}({agg['field']}) as \"{agg['column']}\"" if agg['field'] else f"count as \"{agg['column']}\""
+                for agg in spec['aggs']
+            )
+            fetch_query = f"{spec['prefix']} | bin {TIME_FIELD} span={self.bucket_seconds}s | stats {aggs} by {by_clause}"
+
+        window_start = now - window
+        state = self._load(spec_key)
+        cutoff = None
+        if state and state.get('watermark') and state['watermark'] - self.lag_seconds > window_start:
+            cutoff = state['watermark'] - self.lag_seconds
+            if spec['mode'] == 'aggregate':
+                cutoff -= cutoff % self.bucket_seconds  # refetch the whole bucket the cutoff falls in
+        CACHE_REQUESTS.inc(cache="incremental", result="hit" if cutoff is not None else "miss")
+
+        return {
+            'key': spec_key,
+            'query': query,
+            'spec': spec,
+            'fetch_query': fetch_query,
+            'earliest_time': f"{cutoff:.0f}" if cutoff is not None else earliest_time,
+            'latest_time': latest_time,
+            # Per-bucket partials outnumber the final rows, so they need a higher fetch limit
+            'max_count': self.max_rows if spec['mode'] == 'aggregate' else None,
+            'window_start': window_start,
+            'cutoff': cutoff,
+            'state': state,
+        }
+
+    def merge(self, plan: dict, payload, max_count: Optional[int] = None) -> str:
+        """Fold a fetched delta into the retained rows and return the full-window result as JSON"""
+        delta = parse_result_records(payload)
+        retained = plan['state']['rows'] if plan['cutoff'] is not None else []
+        if plan['spec']['mode'] == 'events' and max_count and len(delta) >= max_count:
+            # The delta hit the row limit, so older rows between it and the watermark are missing
+            retained = []
+
+        rows = pd.DataFrame.from_records(retained + delta)
+        kept = len(rows)
+        if not rows.empty and TIME_FIELD in rows.columns:
+            times = to_epoch(rows[TIME_FIELD])
+            is_retained = pd.Series([True] * len(retained) + [False] * len(delta), index=rows.index)
+            # Retained rows at or after the cutoff were fetched again in this delta
+            superseded = is_retained & (times >= plan['cutoff']) if plan['cutoff'] is not None else False
+            expired = times < plan['window_start']
+            if plan['spec']['mode'] == 'aggregate':
+                expired = times + self.bucket_seconds <= plan['window_start']
+            rows = rows[~(superseded | expired)]
+            rows = rows.assign(_epoch=times[rows.index]).sort_values('_epoch', ascending=False).drop(columns='_epoch')
+            rows = rows.head(self.max_rows)
+            watermark = float(times.max()) if times.notna().any() else None
+        else:
+            watermark = None
+
+        stored = rows.where(rows.notna(), None).to_dict('records') if not rows.empty else []
+        previous = plan['state']['watermark'] if plan['state'] and plan['cutoff'] is not None else None
+        self._save({
+            'key': plan['key'],
+            'watermark': max(filter(None, [watermark, previous]), default=None),
+            'updated_at': time.time(),
+            'rows': stored,
+        })
+
+        if plan['spec']['mode'] == 'aggregate':
+            result_rows = self._combine_partials(rows, plan['spec'])
+        else:
+            result_rows = stored[:max_count] if max_count else stored
+
+        print(f"🔁 Incremental refresh: {len(delta)} new rows, {len(stored)} retained "
+              f"({kept - len(stored)} expired or superseded)")
+        return json.dumps({
+            'query': plan['query'],
+            'incremental': {
+                'mode': plan['spec']['mode'],
+                'delta_rows': len(delta),
+                'retained_rows': len(stored),
+                'fetched_since': plan['earliest_time'],
+            },
+            'results': result_rows,
+        }, default=str)
+
+    @staticmethod
+    def _combine_partials(rows: pd.DataFrame, spec: dict) -> list:
+        """Sum per-bucket partial aggregates into the final stats/top rows"""
+        columns = [agg['column'] for agg in spec['aggs']]
+        if rows.empty:
+            return [] if spec['by'] else [{column: 0 for column in columns}]
+
+        values = rows.reindex(columns=columns).apply(pd.to_numeric, errors='coerce').fillna(0)
+        if spec['by']:
+            keys = rows.reindex(columns=spec['by']).fillna("")
+            combined = pd.concat([keys, values], axis=1).groupby(spec['by'], sort=False, as_index=False)[columns].sum()
+        else:
+            combined = values.sum().to_frame().T
+
+        if spec['percent']:
+            combined['percent'] = (combined['count'] / combined['count'].sum() * 100).round(6)
+        for op in spec['post']:
+            if op['op'] == 'sort' and op['field'] in combined.columns:
+                combined = combined.sort_values(op['field'], ascending=op['ascending'], kind='stable')
+            elif op['op'] == 'head':
+                combined = combined.head(op['limit'])
+        # Whole-number sums go back as ints like Splunk prints them
+        for column in columns:
+            if (combined[column] % 1 == 0).all():
+                combined[column] = combined[column].astype('int64')
+        return combined.to_dict('records')
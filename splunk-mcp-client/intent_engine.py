@@ -0,0 +1,327 @@
+import os
+import re
+import time
+from typing import Optional
+
+# Natural-language field names mapped to the usual Splunk CIM field
+FIELD_ALIASES = {
+    'host': 'host', 'hosts': 'host', 'server': 'host', 'servers': 'host',
+    'user': 'user', 'users': 'user', 'username': 'user', 'usernames': 'user', 'account': 'user', 'accounts': 'user',
+    'ip': 'src_ip', 'ips': 'src_ip', 'source ip': 'src_ip', 'source ips': 'src_ip', 'src_ip': 'src_ip', 'clientip': 'clientip',
+    'destination ip': 'dest_ip', 'destination ips': 'dest_ip', 'dest_ip': 'dest_ip',
+    'port': 'dest_port', 'ports': 'dest_port', 'destination port': 'dest_port', 'destination ports': 'dest_port',
+    'sourcetype': 'sourcetype', 'sourcetypes': 'sourcetype', 'source': 'source', 'sources': 'source',
+    'user agent': 'http_user_agent', 'user agents': 'http_user_agent', 'useragent': 'http_user_agent',
+    'status': 'status', 'status code': 'status', 'status codes': 'status',
+    'mac': 'mac', 'mac address': 'mac', 'mac addresses': 'mac',
+    'uri': 'uri', 'uris': 'uri', 'url': 'url', 'urls': 'url',
+    'protocol': 'protocol', 'protocols': 'protocol', 'action': 'action', 'actions': 'action',
+    'process': 'process', 'processes': 'process', 'event code': 'EventCode', 'event codes': 'EventCode',
+}
+
+# Multi-word aliases first so "source ips" wins over "source"
+_ALIAS_ALTERNATION = "|".join(re.escape(alias) for alias in sorted(FIELD_ALIASES, key=len, reverse=True))
+FIELD = rf"(?P<field>{_ALIAS_ALTERNATION}|[a-z_][\w.]*)"
+
+INDEX_PATTERN = re.compile(
+    r"\bindex\s*=\s*(?P<a>[\w*-]+)|\b(?:from|in)\s+(?:the\s+)?(?P<b>[\w-]+)\s+index\b|\bindex\s+(?P<c>[\w-]+)"
+)
+# "sourcetype=x" or a quoted name; a bare "by sourcetype in ..." names the field, not a value
+SOURCETYPE_PATTERN = re.compile(r"\bsourcetype\s*=\s*[\"']?(?P<sourcetype>[\w:*-]+)|\bsourcetype\s+[\"'](?P<quoted>[\w:*-]+)[\"']")
+BY_FIELD_PATTERN = re.compile(rf"\b(?:by|per)\s+{FIELD}")
+SPAN_UNITS = {'minute': 'm', 'minutes': 'm', 'min': 'm', 'mins': 'm', 'hour': 'h', 'hours': 'h', 'day': 'd', 'days': 'd'}
+TIME_PHRASE_PATTERN = re.compile(
+    r"\b(?:(?:in|over|for|during)\s+)?(?:the\s+)?(?:last|past|previous)\s+(?:\d+\s+)?(?:minutes?|mins?|hours?|days?|weeks?|months?)\b"
+    r"|\b(?:today|yesterday|(?:this|last)\s+(?:week|month))\b"
+)
+SPAN_PATTERN = re.compile(r"\b(?:per|every|each|by)\s+(?:(?P<num>\d+)\s*)?(?P<unit>minutes?|mins?|hours?|days?)\b|\b(?P<adverb>hourly|daily)\b")
+
+# Filters add search terms before the first pipe; commands add the reporting pipeline.
+# Each rule carries the confidence that its template captures what the phrase means.
+INTENT_RULES = [
+    {
+        'intent': 'failed_auth',
+        'kind': 'filter',
+        'pattern': re.compile(
+            r"\b(?:failed|failing|unsuccessful|bad)\s+(?:log\s*-?ins?|logons?|sign[- ]?ins?|auth\w*|passwords?)\b"
+            r"|\b(?:log\s*-?in|logon|auth\w*)\s+fail(?:ure|ures|ed|s)?\b|\bbrute[- ]?force\b"
+        ),
+        'template': "(action=failure OR result=fail OR success=false)",
+        'confidence': 0.9,
+    },
+    {
+        'intent': 'errors',
+        'kind': 'filter',
+        'pattern': re.compile(r"\berrors?\b|\bexceptions?\b|\bfailures?\b"),
+        'template': "(error OR exception OR fail*)",
+        'confidence': 0.8,
+    },
+    {
+        'intent': 'network_traffic',
+        'kind': 'filter',
+        'pattern': re.compile(r"\bnetwork\s+(?:traffic|connections?|flows?)\b"),
+        'template': "src_ip=* dest_ip=*",
+        'confidence': 0.8,
+    },
+    {
+        'intent': 'http_status',
+        'kind': 'filter',
+        'pattern': re.compile(r"\b(?:status(?:\s+code)?|http)\s+(?P<status>[1-5]\d\d)\b|\b(?P<status_class>[45])xx\b"
+                              r"|\b(?P<status_first>[1-5]\d\d)\s+(?:status|errors?|responses?)\b"),
+        'template': "status={status}",
+        'confidence': 0.85,
+    },
+    {
+        'intent': 'top_n_by_field',
+        'kind': 'command',
+        'pattern': re.compile(rf"\b(?:top|most\s+common|most\s+frequent)\s+(?:(?P<n>\d+)\s+)?{FIELD}"),
+        'template': "| top limit={n} {field}",
+        'confidence': 0.9,
+    },
+    {
+        'intent': 'rare_by_field',
+        'kind': 'command',
+        'pattern': re.compile(rf"\b(?:rare|rarest|least\s+common|least\s+frequent)\s+(?:(?P<n>\d+)\s+)?{FIELD}"),
+        'template': "| rare limit={n} {field}",
+        'confidence': 0.85,
+    },
+    {
+        'intent': 'distinct_count',
+        'kind': 'command',
+        'pattern': re.compile(rf"\b(?:how\s+many\s+)?(?:unique|distinct)\s+{FIELD}"),
+        'template': "| stats dc({field}) as distinct_{field_alias}",
+        'confidence': 0.85,
+    },
+    {
+        'intent': 'timechart',
+        'kind': 'command',
+        'pattern': re.compile(r"\btimechart\b|\bover\s+time\b|\btrend(?:s|ing)?\b|\bhistogram\b"
+                              r"|\b(?:per|every|each)\s+(?:\d+\s*)?(?:minutes?|mins?|hours?|days?)\b|\bhourly\b|\bdaily\b"),
+        'template': "| timechart span={span} count{by_clause}",
+        'confidence': 0.85,
+    },
+    {
+        'intent': 'count_by_field',
+        'kind': 'command',
+        'pattern': re.compile(rf"\b(?:count|counts|number|volume|how\s+many)\b.*?\b(?:by|per)\s+{FIELD}"
+                              rf"|\b(?:group(?:ed)?|break\s*down|split)\s+(?:\w+\s+)?by\s+{FIELD.replace('field', 'field2')}"),
+        'template': "| stats count by {field} | sort - count",
+        'confidence': 0.9,
+    },
+    {
+        'intent': 'total_count',
+        'kind': 'command',
+        'pattern': re.compile(r"\b(?:how\s+many|count\s+(?:of|the)|number\s+of|total)\b"),
+        'template': "| stats count",
+        'confidence': 0.75,
+    },
+]
+
+COMMAND_RULES = [rule for rule in INTENT_RULES if rule['kind'] == 'command']
+FILTER_RULES = [rule for rule in INTENT_RULES if rule['kind'] == 'filter']
+
+# Request phrases that map to non-search tools, used by fallback planning
+TASK_PATTERNS = {
+    'get_saved_searches': re.compile(r"\b(?:show|list|display|get)\b.*\bsaved\s+searche?s?\b"),
+    'run_saved_search': re.compile(r"\b(?:run|execute)\b.*\bsaved\s+search\b|\b(?:run|execute)\s+['\"]"),
+    'get_indexes': re.compile(r"\b(?:show|list|display|get)\s+(?:me\s+)?(?:all\s+)?(?:the\s+)?(?:available\s+)?index(?:es)?\b(?!\s*=)|\bindexes\b"),
+    'get_config': re.compile(r"\b(?:config(?:uration)?|settings)\b"),
+    'validate_spl': re.compile(r"\bvalidate\b|\bis\s+(?:this|my)\s+(?:spl|query)\s+safe\b"),
+    'search_export': re.compile(r"\bexport\b|\bdownload\b|\bto\s+(?:csv|json|xml)\b"),
+    'save_search': re.compile(r"\b(?:save|store|keep)\b"),
+    # Follow-ups about results already on screen, answered from the local result store
+    'query_results': re.compile(r"\b(?:that|those|these|the\s+(?:previous|last))\s+(?:results?|data|events|rows|search)\b"
+                               r"|^\s*(?:now|then|and)\s+(?:group|split|break|filter|sort|only|show|just|count|top)\b"
+                               r"|^\s*(?:only|just)\s+(?:show|keep|the)\b"),
+    'search': re.compile(r"\b(?:find|search|show|get|top|list|count|how\s+many)\b"),
+}
+
+# Words that carry no search meaning of their own, so leaving them unmatched costs nothing
+FILLER_WORDS = frozenset("""
+a all an and any are at be can did do events event find for from get give happened has have i in index indexes is it
+just last list logs log me my of on only or our please records results search see show splunk that the there these
+this those to want was were what which with data export download csv json xml save
+""".split())
+
+# Each additional matched component adds a little confidence; an unknown index costs some
+COMPONENT_BONUS = 0.03
+UNKNOWN_INDEX_PENALTY = 0.1
+UNKNOWN_FIELD_PENALTY = 0.15
+# Every word no rule accounts for is meaning the template may have dropped
+UNCONSUMED_WORD_PENALTY = 0.05
+MAX_UNCONSUMED_PENALTY = 0.3
+
+
+def _resolve_field(raw: Optional[str]):
+    """Map a spoken field name to a Splunk field; the flag says whether it was a known alias"""
+    if not raw:
+        return None, False
+    raw = raw.strip()
+    if raw in FIELD_ALIASES:
+        return FIELD_ALIASES[raw], True
+    singular = _singular(raw)
+    return FIELD_ALIASES.get(singular, singular), singular in FIELD_ALIASES
+
+
+def _singular(word: str) -> str:
+    """countries -> country, addresses -> address, hosts -> host; class and status stay as they are"""
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith(('sses', 'xes', 'ches', 'shes')):
+        return word[:-2]
+    if word.endswith(('ss', 'us', 'is')) or len(word) <= 3 or not word.endswith('s'):
+        return word
+    return word[:-1]
+
+
+def _unconsumed_words(request_lower: str, spans: list) -> list:
+    """Words outside every matched span that aren't filler"""
+    return [
+        word.group() for word in re.finditer(r"[\w.*:-]+", request_lower)
+        if word.group() not in FILLER_WORDS
+        and not any(start <= word.start() and word.end() <= end for start, end in spans)
+    ]
+
+
+def intent_threshold() -> float:
+    return float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.8"))
+
+
+def _span(request_lower: str) -> str:
+    match = SPAN_PATTERN.search(request_lower)
+    if not match:
+        return "1h"
+    if match.group('adverb'):
+        return "1h" if match.group('adverb') == 'hourly' else "1d"
+    return f"{match.group('num') or 1}{SPAN_UNITS[match.group('unit')]}"
+
+
+def match_intent(user_request: str, index_override: Optional[str] = None, needs_index: bool = True) -> dict:
+    """Map a natural-language request to parameterised SPL with a confidence score.
+
+    needs_index=False is for refining stored results, which are already scoped to an index.
+    """
+    request_lower = user_request.lower()
+
+    index_match = INDEX_PATTERN.search(request_lower)
+    index_name = index_override or (index_match and (index_match.group('a') or index_match.group('b') or index_match.group('c')))
+    base = [f"index={index_name}" if index_name else "index=*"]
+    # Character ranges of the request some rule accounted for
+    spans = [match.span() for match in TIME_PHRASE_PATTERN.finditer(request_lower)]
+    if index_match:
+        spans.append(index_match.span())
+    sourcetype_match = SOURCETYPE_PATTERN.search(request_lower)
+    sourcetype = sourcetype_match and (sourcetype_match.group('sourcetype') or sourcetype_match.group('quoted'))
+    if sourcetype and sourcetype not in FILLER_WORDS:
+        base.append(f"sourcetype={sourcetype}")
+        spans.append(sourcetype_match.span())
+
+    intents = []
+    confidences = []
+    field_penalty = 0.0
+
+    # Filters: failed_auth is a more specific "errors", so don't stack both
+    for rule in FILTER_RULES:
+        match = rule['pattern'].search(request_lower)
+        if not match:
+            continue
+        if rule['intent'] == 'errors' and 'failed_auth' in intents:
+            continue
+        if rule['intent'] == 'http_status':
+            status = match.group('status') or match.group('status_first') or f"{match.group('status_class')}*"
+            base.append(rule['template'].format(status=status))
+        else:
+            base.append(rule['template'])
+        intents.append(rule['intent'])
+        confidences.append(rule['confidence'])
+        spans.append(match.span())
+
+    command = ""
+    for rule in COMMAND_RULES:
+        match = rule['pattern'].search(request_lower)
+        if not match:
+            continue
+        groups = match.groupdict()
+        field, known = _resolve_field(groups.get('field') or groups.get('field2'))
+        spans.append(match.span())
+        if rule['intent'] == 'timechart':
+            by_match = BY_FIELD_PATTERN.search(request_lower)
+            by_field, by_known = _resolve_field(by_match.group('field')) if by_match else (None, True)
+            # "per hour" is a span, not a split-by field
+            if by_field and by_field.rstrip('s') in SPAN_UNITS:
+                by_field, by_known = None, True
+            if by_match:
+                spans.append(by_match.span())
+            spans.extend(span.span() for span in SPAN_PATTERN.finditer(request_lower))
+            command = rule['template'].format(span=_span(request_lower), by_clause=f" by {by_field}" if by_field else "")
+            known = by_known
+        else:
+            command = rule['template'].format(
+                n=groups.get('n') or 10, field=field, field_alias=(field or "").replace('.', '_')
+            )
+        if not known:
+            field_penalty = UNKNOWN_FIELD_PENALTY
+        intents.append(rule['intent'])
+        confidences.append(rule['confidence'])
+        break
+
+    if not confidences:
+        return {
+            'intent': 'raw_events',
+            'spl': f"{' '.join(base)} | head 10",
+            'confidence': 0.3,
+            'components': [],
+            'filters': base[1:],
+            'command': "",
+        }
+
+    confidence = max(confidences) + COMPONENT_BONUS * (len(confidences) - 1) - field_penalty
+    unconsumed = _unconsumed_words(request_lower, spans)
+    confidence -= min(UNCONSUMED_WORD_PENALTY * len(unconsumed), MAX_UNCONSUMED_PENALTY)
+    if not index_name and needs_index:
+        # Searching every index is rarely what was asked for, so never skip the LLM for it
+        confidence = min(confidence - UNKNOWN_INDEX_PENALTY, intent_threshold() - 0.05)
+    spl = " ".join(base) + (f" {command}" if command else "")
+    return {
+        'intent': "+".join(intents),
+        'spl': spl,
+        'confidence': round(max(0.0, min(confidence, 0.99)), 2),
+        'components': intents,
+        'filters': base[1:],
+        'command': command,
+    }
+
+
+def is_high_confidence(match: dict) -> bool:
+    return match['confidence'] >= intent_threshold()
+
+
+SAMPLE_REQUESTS = [
+    "Find top 10 MAC addresses from botsv3",
+    "Search for failed logins in the main index",
+    "Show me network traffic",
+    "count errors by host in index=main",
+    "timechart of errors per 5 minutes from web index",
+    "how many unique users logged in from the security index",
+    "top 5 source ips with failed logins in index auth",
+    "list 404 status codes in web index grouped by uri",
+    "rare user agents in index=web",
+    "what happened yesterday",
+]
+
+
+if __name__ == "__main__":
+    # Benchmark: match throughput over the sample requests
+    import sys
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    for request in SAMPLE_REQUESTS:
+        result = match_intent(request)
+        print(f"{result['confidence']:.2f}  {result['intent']:<28} {result['spl']}")
+
+    start = time.perf_counter()
+    for i in range(iterations):
+        match_intent(SAMPLE_REQUESTS[i % len(SAMPLE_REQUESTS)])
+    elapsed = time.perf_counter() - start
+    print(f"\n⚡ {iterations} matches in {elapsed:.3f}s -> {iterations / elapsed:,.0f} matches/s "
+          f"({elapsed / iterations * 1e6:.1f} µs/match)")
@@ -0,0 +1,304 @@
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import sqlite3
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Optional
+
+from crewai import LLM
+from dotenv import load_dotenv
+
+from context_compactor import estimate_tokens
+from metrics import CACHE_REQUESTS, LLM_CALL_SECONDS, LLM_TOKENS
+
+try:
+    import fcntl
+except ImportError:  # Windows: the rate limit is then per process
+    fcntl = None
+
+load_dotenv()
+
+DEFAULT_MODEL = "gemini/gemini-2.0-flash"
+DEFAULT_BUCKET_PATH = os.path.join(".splunk_assistant", "llm_bucket.json")
+DEFAULT_CACHE_PATH = os.path.join(".splunk_assistant", "llm_cache.db")
+DEFAULT_REPLAY_PATH = os.path.join(".splunk_assistant", "llm_replay.jsonl")
+# Quota, overload and network errors are worth retrying; bad requests and auth errors are not
+RETRYABLE_PATTERN = re.compile(
+    r"429|rate.?limit|quota|resource.?exhausted|503|overloaded|unavailable|timed? ?out|connection", re.IGNORECASE
+)
+
+# Parts of a prompt that differ between runs of the same workflow, masked before replay matching
+VOLATILE_PROMPT_PATTERNS = [
+    (re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:?\d{2})?"), "<time>"),
+    (re.compile(r"\b1[5-9]\d{8}(?:\.\d+)?\b"), "<epoch>"),
+    (re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b", re.IGNORECASE), "<uuid>"),
+    (re.compile(r"\b\d{8}-\d{6}-[0-9a-f]{8}\b"), "<run>"),
+    (re.compile(r"(?:\\[nrt]|\s)+"), " "),
+]
+
+_current_caller = contextvars.ContextVar("llm_caller", default="unknown")
+
+
+@contextmanager
+def llm_caller(name: str):
+    """Attribute LLM calls made inside the block (e.g. by a Crew) to a call site"""
+    token = _current_caller.set(name)
+    try:
+        yield
+    finally:
+        _current_caller.reset(token)
+
+
+class TokenBucket:
+    """Requests-per-minute limit shared by every process through a locked state file.
+
+    Streamlit, queue workers and each crewFlow.py run all draw from the same Gemini quota,
+    so a per-process limiter would still let concurrent workflows burst past it.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int, path: str):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.path = path
+        self._lock = threading.Lock()
+        state_dir = os.path.dirname(path)
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+
+    def _take(self) -> float:
+        """Take a token if one is available; otherwise return how long to wait for the next"""
+        with self._lock, open(f"{self.path}.lock", 'a') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.path) as f:
+                        state = json.load(f)
+                except (OSError, json.JSONDecodeError):
+                    state = {'tokens': self.burst, 'updated': time.time()}
+                now = time.time()
+                tokens = min(self.burst, state['tokens'] + (now - state['updated']) * self.rate)
+                wait = 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+                if not wait:
+                    tokens -= 1
+                with open(self.path, 'w') as f:
+                    json.dump({'tokens': tokens, 'updated': now}, f)
+                return wait
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def acquire(self) -> float:
+        """Block until a request may be sent and return the time spent waiting"""
+        waited = 0.0
+        while True:
+            wait = self._take()
+            if not wait:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+
+class ResponseCache:
+    """Exact-match prompt -> response cache; only replies the caller accepted are stored"""
+
+    def __init__(self, path: str, ttl_seconds: float):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        cache_dir = os.path.dirname(path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def key(model: str, temperature: float, prompt: str) -> str:
+        return hashlib.sha256(json.dumps([model, temperature, prompt]).encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM responses WHERE key = ? AND created_at > ?", (key, time.time() - self.ttl_seconds)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: str, response: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at) VALUES (?, ?, ?)", (key, response, time.time())
+            )
+            self._conn.commit()
+
+
+class ReplayLog:
+    """Recorded LLM responses, so workflows can be re-run (e.g. under load) without the model.
+
+    LLM_REPLAY=record appends every response with its caller, normalised prompt key and latency
+    to a JSONL file. LLM_REPLAY=replay serves a response recorded for the same caller and prompt
+    (timestamps, epochs, UUIDs, run ids and whitespace masked), after sleeping the recorded
+    latency times LLM_REPLAY_LATENCY_SCALE. A prompt that was never recorded raises rather than
+    getting some other prompt's answer.
+    """
+
+    def __init__(self, path: str, latency_scale: float = 1.0):
+        self.path = path
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        recorded = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        recorded.setdefault((entry['caller'], entry['prompt_key']), []).append(entry)
+        # Several recordings of one prompt are served in turn
+        self._turns = {key: itertools.cycle(entries) for key, entries in recorded.items()}
+
+    @staticmethod
+    def prompt_key(prompt) -> str:
+        text = json.dumps(prompt, default=str, sort_keys=True)
+        for pattern, placeholder in VOLATILE_PROMPT_PATTERNS:
+            text = pattern.sub(placeholder, text)
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def record(self, caller: str, prompt, response, seconds: float):
+        line = json.dumps({'caller': caller, 'prompt_key': self.prompt_key(prompt), 'response': response, 'seconds': round(seconds, 3)}, default=str)
+        with self._lock:
+            log_dir = os.path.dirname(self.path)
+            if log_dir:
+                os.makedirs(log_dir, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
+
+    def replay(self, caller: str, prompt):
+        key = self.prompt_key(prompt)
+        with self._lock:
+            turns = self._turns.get((caller, key))
+            if turns is None:
+                raise RuntimeError(
+                    f"No recorded LLM response for {caller} with this prompt (key {key[:12]}) in {self.path}; "
+                    "record the workflow again with LLM_REPLAY=record"
+                )
+            entry = next(turns)
+        time.sleep(entry['seconds'] * self.latency_scale)
+        return entry['response']
+
+
+class GatewayLLM(LLM):
+    """CrewAI LLM whose requests go through the gateway's rate limit, retries and metrics"""
+
+    def call(self, messages, *args, **kwargs):
+        return get_gateway().send(lambda: LLM.call(self, messages, *args, **kwargs), prompt=messages)
+
+
+class LLMGateway:
+    """Single entry point for every LLM call: the planner, time extraction and CrewAI agents.
+
+    LLM objects are shared per (model, temperature), so litellm keeps reusing the HTTP client
+    it caches per provider instead of each call site holding its own.
+    """
+
+    def __init__(self):
+        self.model = os.getenv("LLM_MODEL", DEFAULT_MODEL)
+        self.max_retries = int(os.getenv("LLM_MAX_RETRIES", "4"))
+        self.backoff_seconds = float(os.getenv("LLM_BACKOFF_SECONDS", "1.0"))
+        self.bucket = TokenBucket(
+            float(os.getenv("LLM_RATE_PER_MINUTE", "60")),
+            int(os.getenv("LLM_BURST", "10")),
+            os.getenv("LLM_BUCKET_PATH", DEFAULT_BUCKET_PATH),
+        )
+        self.cache = None
+        if os.getenv("LLM_CACHE", "1") == "1":
+            self.cache = ResponseCache(
+                os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH), float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+            )
+        self.replay_mode = os.getenv("LLM_REPLAY", "off")
+        self.replay_log = None
+        if self.replay_mode in ("record", "replay"):
+            self.replay_log = ReplayLog(
+                os.getenv("LLM_REPLAY_PATH", DEFAULT_REPLAY_PATH), float(os.getenv("LLM_REPLAY_LATENCY_SCALE", "1.0"))
+            )
+        self._llms = {}
+        self._lock = threading.Lock()
+
+    def llm(self, temperature: float = 0.3, **kwargs) -> GatewayLLM:
+        """Shared LLM object for this temperature, usable as a CrewAI agent's llm"""
+        with self._lock:
+            if temperature not in self._llms:
+                self._llms[temperature] = GatewayLLM(
+                    model=self.model,
+                    provider="google",
+                    api_key=os.getenv("GOOGLE_API_KEY"),
+                    temperature=temperature,
+                    **kwargs
+                )
+            return self._llms[temperature]
+
+    def send(self, request, prompt=None):
+        """Run one LLM request under the rate limit, retrying transient failures with backoff"""
+        caller = _current_caller.get()
+        if self.replay_mode == "replay":
+            with LLM_CALL_SECONDS.time(caller=caller):
+                return self.replay_log.replay(caller, prompt)
+        for attempt in range(self.max_retries + 1):
+            waited = self.bucket.acquire()
+            if waited > 1:
+                print(f"🚦 LLM rate limit: {caller} waited {waited:.1f}s")
+            try:
+                started = time.perf_counter()
+                with LLM_CALL_SECONDS.time(caller=caller):
+                    response = request()
+                if self.replay_log is not None:
+                    self.replay_log.record(caller, prompt, response, time.perf_counter() - started)
+                return response
+            except Exception as e:
+                if attempt == self.max_retries or not RETRYABLE_PATTERN.search(f"{type(e).__name__} {e}"):
+                    raise
+                delay = min(self.backoff_seconds * 2 ** attempt, 30) * random.uniform(0.5, 1.5)
+                print(f"⚠️ LLM call for {caller} failed ({e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def call(self, prompt: str, caller: str, temperature: float = 0.3, validate=None) -> str:
+        """Text completion for a prompt.
+
+        With validate, replies it accepts are cached and repeats of the prompt are served locally;
+        a reply the caller can't use is never stored, so the next attempt asks the model again.
+        """
+        key = self.cache and validate and ResponseCache.key(self.model, temperature, prompt)
+        if key:
+            cached = self.cache.get(key)
+            CACHE_REQUESTS.inc(cache="llm", result="hit" if cached is not None else "miss")
+            if cached is not None:
+                return cached
+
+        with llm_caller(caller):
+            result = self.llm(temperature).call(prompt)
+        # LLM.call returns text only, so token counts are estimated the same way context compaction does
+        LLM_TOKENS.inc(estimate_tokens(prompt), caller=caller, kind="prompt")
+        LLM_TOKENS.inc(estimate_tokens(result), caller=caller, kind="completion")
+        if key and result and validate(result):
+            self.cache.put(key, result)
+        return result
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> LLMGateway:
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+        return _gateway
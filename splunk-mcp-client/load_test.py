@@ -0,0 +1,277 @@
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import itertools
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from batch_runner import load_batch, percentile, run_item
+from workflow_runner import WORKFLOW_TIMEOUT
+
+try:
+    import psutil
+except ImportError:  # optional: falls back to reading /proc (Linux only)
+    psutil = None
+
+load_dotenv()
+
+CLIENT_DIR = os.path.dirname(os.path.abspath(__file__))
+MOCK_SERVER_SCRIPT = os.path.join(CLIENT_DIR, "mock_mcp_server.py")
+DEFAULT_REQUESTS = [
+    {'id': "failed-logins", 'request': "Show failed logins in the main index"},
+    {'id': "errors-by-host", 'request': "Count errors by host in the main index over the last 4 hours"},
+    {'id': "indexes-then-search", 'request': "List all indexes, then search for errors in the main index"},
+    {'id': "export", 'request': "Search for 404 responses in main and export them to CSV"},
+]
+
+
+class ProcessTreeSampler:
+    """CPU time, RSS and process count of this process and every process it started.
+
+    CPU time includes children that already exited (their time is folded into their parent's
+    children counters), so short-lived crewFlow.py runs and stdio MCP servers are counted too.
+    """
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _tree(self) -> list:
+        """(cpu_seconds, rss_bytes) for the root process and each live descendant"""
+        if psutil is not None:
+            root = psutil.Process()
+            usage = []
+            for process in [root] + root.children(recursive=True):
+                try:
+                    times = process.cpu_times()
+                    usage.append((times.user + times.system + times.children_user + times.children_system, process.memory_info().rss))
+                except psutil.Error:
+                    continue
+            return usage
+
+        ticks, page_size = os.sysconf('SC_CLK_TCK'), os.sysconf('SC_PAGE_SIZE')
+        stats, children = {}, {}
+        for pid in filter(str.isdigit, os.listdir('/proc')):
+            try:
+                with open(f"/proc/{pid}/stat") as f:
+                    fields = f.read().rsplit(')', 1)[1].split()
+            except OSError:
+                continue
+            stats[int(pid)] = (sum(int(value) for value in fields[11:15]) / ticks, int(fields[21]) * page_size)
+            children.setdefault(int(fields[1]), []).append(int(pid))
+        usage, pending = [], [os.getpid()]
+        while pending:
+            pid = pending.pop()
+            if pid in stats:
+                usage.append(stats[pid])
+            pending.extend(children.get(pid, []))
+        return usage
+
+    def sample(self) -> dict:
+        usage = self._tree()
+        return {
+            'time': time.time(),
+            'cpu_seconds': sum(cpu for cpu, _ in usage),
+            'rss_bytes': sum(rss for _, rss in usage),
+            'processes': len(usage),
+        }
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.samples.append(self.sample())
+
+    def start(self):
+        self.samples = [self.sample()]
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="load-test-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> dict:
+        self._stop.set()
+        self._thread.join()
+        self.samples.append(self.sample())
+        first, last = self.samples[0], self.samples[-1]
+        elapsed = max(last['time'] - first['time'], 1e-9)
+        # Busiest interval between consecutive samples, as a share of one core
+        peak_cpu = max(
+            (100 * (b['cpu_seconds'] - a['cpu_seconds']) / max(b['time'] - a['time'], 1e-9) for a, b in zip(self.samples, self.samples[1:])),
+            default=0.0
+        )
+        return {
+            'cpu_percent_avg': round(100 * (last['cpu_seconds'] - first['cpu_seconds']) / elapsed, 1),
+            'cpu_percent_peak': round(peak_cpu, 1),
+            'rss_mb_peak': round(max(sample['rss_bytes'] for sample in self.samples) / 2 ** 20, 1),
+            'processes_peak': max(sample['processes'] for sample in self.samples),
+        }
+
+
+def wait_for_port(host: str, port: int, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Mock MCP server did not start listening on {host}:{port}")
+
+
+def start_mock_server(transport: str, port: int):
+    """Point the workflow stack at mock_mcp_server.py; returns the server process for HTTP transports"""
+    if transport == "stdio":
+        # Every MCP client spawns its own mock server, as it would spawn the Splunk one
+        os.environ["MCP_TRANSPORT"] = "stdio"
+        os.environ["SPLUNK_MCP_PATH"] = MOCK_SERVER_SCRIPT
+        return None
+    os.environ["MCP_TRANSPORT"] = "http" if transport == "streamable-http" else "sse"
+    os.environ["MCP_SERVER_URL"] = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, MOCK_SERVER_SCRIPT, "--transport", transport, "--port", str(port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, cwd=CLIENT_DIR
+    )
+    wait_for_port("127.0.0.1", port)
+    return server
+
+
+def first_error(record: dict):
+    """Why a session failed: the planning/launch error, the first failed step's stderr, or the run's stderr log"""
+    if record.get('error'):
+        return record['error']
+    error = next((result['stderr'].strip() for result in record.get('results', []) if not result.get('success') and result.get('stderr')), None)
+    stderr_path = os.path.join(record.get('run_dir') or "", "stderr.log")
+    if not error and not record['success'] and os.path.exists(stderr_path):
+        with open(stderr_path, encoding='utf-8', errors='replace') as f:
+            error = f.read().strip() or "workflow produced no output"
+    return error
+
+
+def run_level(items: list, concurrency: int, sessions: int, timeout: float) -> dict:
+    """Run `sessions` simulated users, `concurrency` at a time, each planning and executing one workflow"""
+    workload = list(itertools.islice(itertools.cycle(items), sessions))
+    sampler = ProcessTreeSampler().start()
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        records = list(executor.map(lambda item: run_item(item, timeout), workload))
+    elapsed = time.time() - started
+    resources = sampler.stop()
+
+    latencies = [record['total_seconds'] for record in records]
+    planning = [record['planning_seconds'] for record in records if 'planning_seconds' in record]
+    succeeded = sum(1 for record in records if record['success'])
+    return {
+        'concurrency': concurrency,
+        'sessions': sessions,
+        'succeeded': succeeded,
+        'failed': sessions - succeeded,
+        'wall_seconds': round(elapsed, 1),
+        'throughput_per_minute': round(sessions / elapsed * 60, 2) if elapsed else 0.0,
+        'latency_p50_seconds': round(percentile(latencies, 0.50), 2),
+        'latency_p95_seconds': round(percentile(latencies, 0.95), 2),
+        'latency_max_seconds': round(max(latencies, default=0.0), 2),
+        'planning_p95_seconds': round(percentile(planning, 0.95), 2),
+        **resources,
+        'errors': sorted({error.splitlines()[-1][:200] for error in map(first_error, records) if error}),
+    }
+
+
+def compare_to_baseline(levels: list, baseline: list, tolerance: float) -> list:
+    """Levels whose p95 latency rose or throughput fell by more than `tolerance` against a previous report"""
+    previous = {level['concurrency']: level for level in baseline}
+    regressions = []
+    for level in levels:
+        before = previous.get(level['concurrency'])
+        if not before:
+            continue
+        if level['latency_p95_seconds'] > before['latency_p95_seconds'] * (1 + tolerance):
+            regressions.append(f"concurrency {level['concurrency']}: p95 {before['latency_p95_seconds']}s -> {level['latency_p95_seconds']}s")
+        if level['throughput_per_minute'] < before['throughput_per_minute'] * (1 - tolerance):
+            regressions.append(f"concurrency {level['concurrency']}: throughput {before['throughput_per_minute']} -> {level['throughput_per_minute']}/min")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Simulate concurrent users planning and running workflows against replayed LLM responses and a mock MCP server"
+    )
+    parser.add_argument("--requests", help="JSONL of requests or plans, as for the batch runner (default: a built-in set)")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="comma-separated concurrent session counts to sweep")
+    parser.add_argument("--sessions", type=int, help="sessions per level (default: 2x the level's concurrency)")
+    parser.add_argument("--transport", choices=["streamable-http", "sse", "stdio"], default="streamable-http",
+                        help="how workflows reach the mock MCP server")
+    parser.add_argument("--port", type=int, default=8765, help="mock MCP server port for HTTP transports")
+    parser.add_argument("--mcp-latency", type=float, default=0.5, help="mock MCP per-call latency in seconds")
+    parser.add_argument("--mcp-jitter", type=float, default=0.2, help="mock MCP per-call latency jitter in seconds")
+    parser.add_argument("--live-llm", action="store_true", help="call the real model instead of replaying recorded responses")
+    parser.add_argument("--timeout", type=float, default=WORKFLOW_TIMEOUT, help="per-workflow timeout in seconds")
+    parser.add_argument("--output", default="load_test_report.json", help="where to write the report")
+    parser.add_argument("--baseline", help="previous report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95/throughput change against the baseline")
+    args = parser.parse_args(argv)
+
+    items = load_batch(args.requests) if args.requests else DEFAULT_REQUESTS
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+
+    # Workflow subprocesses inherit these through the environment
+    os.environ["MOCK_MCP_LATENCY"] = str(args.mcp_latency)
+    os.environ["MOCK_MCP_JITTER"] = str(args.mcp_jitter)
+    if not args.live_llm:
+        replay_path = os.getenv("LLM_REPLAY_PATH", os.path.join(".splunk_assistant", "llm_replay.jsonl"))
+        if not os.path.exists(replay_path):
+            print(f"❌ No recorded LLM responses at {replay_path}; run some workflows with LLM_REPLAY=record first")
+            return 2
+        os.environ["LLM_REPLAY"] = "replay"
+        # Recorded planner answers would otherwise be served from the response cache, skipping replay latency
+        os.environ["LLM_CACHE"] = "0"
+
+    server = start_mock_server(args.transport, args.port)
+    report = {
+        'transport': args.transport,
+        'mcp_latency_seconds': args.mcp_latency,
+        'mcp_jitter_seconds': args.mcp_jitter,
+        'llm': "live" if args.live_llm else "replay",
+        'requests': len(items),
+        'levels': [],
+    }
+    try:
+        for concurrency in levels:
+            sessions = args.sessions or 2 * concurrency
+            print(f"🏋️ {sessions} sessions at concurrency {concurrency}")
+            level = run_level(items, concurrency, sessions, args.timeout)
+            report['levels'].append(level)
+            print(f"   {level['succeeded']}/{sessions} ok, {level['throughput_per_minute']}/min, "
+                  f"p95 {level['latency_p95_seconds']}s, CPU avg {level['cpu_percent_avg']}%, "
+                  f"RSS peak {level['rss_mb_peak']} MB, {level['processes_peak']} processes")
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=10)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            report['regressions'] = compare_to_baseline(report['levels'], json.load(f)['levels'], args.tolerance)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=1)
+
+    print("📊 Load test:")
+    print(f"   {'users':>5} {'ok':>7} {'per min':>8} {'p50 s':>7} {'p95 s':>7} {'CPU avg%':>9} {'CPU peak%':>10} {'RSS MB':>8} {'procs':>6}")
+    for level in report['levels']:
+        print(f"   {level['concurrency']:>5} {level['succeeded']:>3}/{level['sessions']:<3} {level['throughput_per_minute']:>8} "
+              f"{level['latency_p50_seconds']:>7} {level['latency_p95_seconds']:>7} {level['cpu_percent_avg']:>9} "
+              f"{level['cpu_percent_peak']:>10} {level['rss_mb_peak']:>8} {level['processes_peak']:>6}")
+    print(f"   Report: {args.output}")
+    for regression in report.get('regressions', []):
+        print(f"⚠️ Regression: {regression}")
+    return 1 if report.get('regressions') else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: the shared store is then best-effort
+    fcntl = None
+
+DEFAULT_SHARED_PATH = os.path.join(".splunk_assistant", "metrics.json")
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _label_key(labels: dict) -> str:
+    return json.dumps(sorted(labels.items()))
+
+
+def _format_labels(key: str, extra: Optional[dict] = None) -> str:
+    pairs = json.loads(key) + sorted((extra or {}).items())
+    if not pairs:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, registry=None):
+        self.name = name
+        self.documentation = documentation
+        self._values = {}
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {key: (list(value) if isinstance(value, list) else value) for key, value in self._values.items()}
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    """Point-in-time value; collect() is called at scrape time when given"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, collect=None, registry=None):
+        super().__init__(name, documentation, registry)
+        self.collect = collect
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def snapshot(self) -> dict:
+        if self.collect:
+            try:
+                for labels, value in self.collect():
+                    self.set(value, **labels)
+            except Exception as e:
+                print(f"⚠️ Could not collect {self.name}: {e}")
+        return super().snapshot()
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets=LATENCY_BUCKETS, registry=None):
+        super().__init__(name, documentation, registry)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            # Per-bucket (non-cumulative) counts, then sum and count, so snapshots merge by addition
+            series = self._values.setdefault(key, [0.0] * (len(self.buckets) + 3))
+            position = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+            series[position] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+class Registry:
+    """Process-local metrics plus totals flushed by other processes into a shared JSON store.
+
+    crewFlow.py runs and queue workers are short-lived or numerous, so they add their counters
+    and histograms to the shared store on exit; whichever process exports (HTTP or textfile)
+    renders its own live values on top of those totals.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric: Metric):
+        self.metrics[metric.name] = metric
+
+    @property
+    def shared_path(self) -> str:
+        return os.getenv("METRICS_SHARED_PATH", DEFAULT_SHARED_PATH)
+
+    @contextmanager
+    def _locked_store(self):
+        store_dir = os.path.dirname(self.shared_path)
+        if store_dir:
+            os.makedirs(store_dir, exist_ok=True)
+        with open(f"{self.shared_path}.lock", 'a') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read_store(self) -> dict:
+        try:
+            with open(self.shared_path) as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def flush(self):
+        """Add this process's counters and histograms to the shared store and reset them"""
+        if os.getenv("METRICS", "1") != "1":
+            return
+        with self._locked_store():
+            store = self._read_store()
+            for metric in self.metrics.values():
+                if metric.kind == "gauge":
+                    continue
+                totals = store.setdefault(metric.name, {})
+                for key, value in metric.snapshot().items():
+                    if isinstance(value, list):
+                        previous = totals.get(key) or [0.0] * len(value)
+                        totals[key] = [a + b for a, b in zip(previous, value)]
+                    else:
+                        totals[key] = totals.get(key, 0.0) + value
+                metric.reset()
+            tmp_path = f"{self.shared_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(store, f)
+            os.replace(tmp_path, self.shared_path)
+
+    def render(self) -> str:
+        """Prometheus text exposition of shared totals plus live local values"""
+        store = self._read_store()
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            series = dict(store.get(name, {})) if metric.kind != "gauge" else {}
+            for key, value in metric.snapshot().items():
+                if isinstance(value, list):
+                    previous = series.get(key) or [0.0] * len(value)
+                    series[key] = [a + b for a, b in zip(previous, value)]
+                elif metric.kind == "gauge":
+                    series[key] = value
+                else:
+                    series[key] = series.get(key, 0.0) + value
+
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for key, value in sorted(series.items()):
+                if metric.kind != "histogram":
+                    lines.append(f"{name}{_format_labels(key)} {value:g}")
+                    continue
+                cumulative = 0.0
+                for bound, count in zip(metric.buckets, value):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(key, {'le': f'{bound:g}'})} {cumulative:g}")
+                lines.append(f"{name}_bucket{_format_labels(key, {'le': '+Inf'})} {value[-1]:g}")
+                lines.append(f"{name}_sum{_format_labels(key)} {value[-2]:g}")
+                lines.append(f"{name}_count{_format_labels(key)} {value[-1]:g}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str):
+        """Atomically write the exposition for node_exporter's textfile collector"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+
+REGISTRY = Registry()
+
+MCP_CALL_SECONDS = Histogram("splunk_assistant_mcp_call_seconds", "MCP tool call latency by tool")
+MCP_CALL_ERRORS = Counter("splunk_assistant_mcp_call_errors_total", "MCP tool calls that raised or returned isError, by tool")
+MCP_SPAWN_SECONDS = Histogram("splunk_assistant_mcp_server_spawn_seconds", "Time to start and initialize an MCP server session")
+LLM_CALL_SECONDS = Histogram("splunk_assistant_llm_call_seconds", "LLM call latency by call site")
+LLM_TOKENS = Counter("splunk_assistant_llm_tokens_total", "LLM tokens by call site and kind (prompt/completion)")
+CACHE_REQUESTS = Counter("splunk_assistant_cache_requests_total", "Cache lookups by cache and result (hit/miss)")
+WORKFLOW_TASKS = Counter("splunk_assistant_workflow_tasks_total", "Workflow steps by task and outcome as judged by detect_task_success")
+TASK_SECONDS = Histogram("splunk_assistant_task_seconds", "Workflow step duration by task")
+QUEUE_DEPTH = Gauge("splunk_assistant_workflow_queue_jobs", "Shared workflow queue jobs by state")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != "/metrics":
+            self.send_error(404)
+            return
+        flush_metrics()
+        body = REGISTRY.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes every few seconds would flood the console
+
+
+def start_metrics_exporter(port: Optional[int] = None, textfile: Optional[str] = None, interval: float = 15.0):
+    """Serve /metrics on METRICS_PORT and/or refresh METRICS_TEXTFILE periodically"""
+    port = port if port is not None else int(os.getenv("METRICS_PORT", "0"))
+    textfile = textfile or os.getenv("METRICS_TEXTFILE")
+    server = None
+    if port:
+        host = os.getenv("METRICS_HOST", "127.0.0.1")
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        print(f"📈 Metrics on http://{host}:{port}/metrics")
+    if textfile:
+        def write_loop():
+            while True:
+                try:
+                    flush_metrics()
+                    REGISTRY.write_textfile(textfile)
+                except OSError as e:
+                    print(f"⚠️ Could not write metrics textfile: {e}")
+                time.sleep(interval)
+        threading.Thread(target=write_loop, name="metrics-textfile", daemon=True).start()
+    return server
+
+
+def flush_metrics():
+    try:
+        REGISTRY.flush()
+    except OSError as e:
+        print(f"⚠️ Could not flush metrics: {e}")
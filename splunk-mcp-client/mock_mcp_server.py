@@ -0,0 +1,149 @@
+import os
+import re
+import io
+import csv
+import sys
+import json
+import random
+import asyncio
+import argparse
+import hashlib
+
+try:
+    from mcp.server.fastmcp import FastMCP as MCPServer  # mcp 1.x
+except ImportError:
+    from mcp.server.mcpserver import MCPServer  # mcp 2.x
+
+# Stand-in for splunk-mcp-server2 with the same tool names and arguments, serving synthetic
+# events. Used to exercise the client, workers and UI without a Splunk instance, over stdio
+# (SPLUNK_MCP_PATH=mock_mcp_server.py) or HTTP (python mock_mcp_server.py --transport streamable-http).
+
+INDEXES = {"main": ["access_combined", "syslog"], "botsv3": ["stream:http", "WinEventLog:Security"], "_internal": ["splunkd"]}
+HOSTS = [f"web-{i:02d}" for i in range(8)]
+SAVED_SEARCHES = [
+    {"name": "Triage - Failed Logins", "app": "search", "search": "index=main action=failure | stats count by user"},
+    {"name": "Triage - 5xx Errors", "app": "search", "search": "index=main status>=500 | stats count by host"},
+    {"name": "Triage - New Admins", "app": "security", "search": "index=botsv3 EventCode=4732 | table _time user"},
+    {"name": "Daily License Usage", "app": "monitoring", "search": "index=_internal source=*license_usage.log | stats sum(b)"},
+]
+HEAD_PATTERN = re.compile(r"\|\s*head\s+(\d+)")
+
+server = MCPServer("mock-splunk")
+
+
+async def simulate_latency():
+    latency = float(os.getenv("MOCK_MCP_LATENCY", "0"))
+    jitter = float(os.getenv("MOCK_MCP_JITTER", "0"))
+    if latency or jitter:
+        await asyncio.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+
+
+def synthetic_events(query: str, count: int) -> list:
+    """Deterministic events for a query, so repeated searches return the same rows"""
+    head = HEAD_PATTERN.search(query)
+    if head:
+        count = min(count, int(head.group(1)))
+    rng = random.Random(hashlib.sha256(query.encode('utf-8')).hexdigest())
+    return [
+        {
+            "_time": f"2024-05-01T{i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}.000+00:00",
+            "host": rng.choice(HOSTS),
+            "sourcetype": "access_combined",
+            "status": str(rng.choice([200, 200, 200, 301, 404, 500])),
+            "bytes": str(rng.randint(200, 90000)),
+            "clientip": f"10.0.{rng.randint(0, 3)}.{rng.randint(1, 254)}",
+            "_raw": f'10.0.0.{i % 255} - - "GET /item/{i} HTTP/1.1" 200',
+        }
+        for i in range(count)
+    ]
+
+
+def format_results(query: str, events: list, output_format: str) -> str:
+    if output_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=list(events[0]) if events else ["_time"])
+        writer.writeheader()
+        writer.writerows(events)
+        return buffer.getvalue()
+    if output_format == "markdown":
+        header = list(events[0]) if events else ["_time"]
+        lines = ["| " + " | ".join(header) + " |", "|" + "---|" * len(header)]
+        lines += ["| " + " | ".join(str(event[field]) for field in header) + " |" for event in events]
+        return json.dumps({"query": query, "event_count": len(events), "content": "\n".join(lines)})
+    return json.dumps({"query": query, "event_count": len(events), "results": events})
+
+
+@server.tool()
+async def validate_spl(query: str) -> str:
+    await simulate_latency()
+    risky = [command for command in ("delete", "outputlookup", "sendemail") if re.search(rf"\|\s*{command}\b", query)]
+    return json.dumps({"valid": not risky, "risk_score": 80 if risky else 5, "risky_commands": risky, "query": query})
+
+
+@server.tool()
+async def search_oneshot(query: str, earliest_time: str = "-24h", latest_time: str = "now",
+                         max_count: int = 100, output_format: str = "json") -> str:
+    await simulate_latency()
+    return format_results(query, synthetic_events(query, min(max_count, int(os.getenv("MOCK_MCP_EVENTS", "100")))), output_format)
+
+
+@server.tool()
+async def search_export(query: str, earliest_time: str = "-24h", latest_time: str = "now", max_count: int = 100,
+                        output_format: str = "json", risk_tolerance: int = 75, sanitize_output: bool = False) -> str:
+    await simulate_latency()
+    return format_results(query, synthetic_events(query, min(max_count, int(os.getenv("MOCK_MCP_EVENTS", "100")))), output_format)
+
+
+@server.tool()
+async def get_indexes() -> str:
+    await simulate_latency()
+    return json.dumps({"indexes": [
+        {"name": name, "totalEventCount": 1000 * len(sourcetypes), "sourcetypes": sourcetypes}
+        for name, sourcetypes in INDEXES.items()
+    ]})
+
+
+@server.tool()
+async def get_saved_searches() -> str:
+    await simulate_latency()
+    return json.dumps({"saved_searches": SAVED_SEARCHES})
+
+
+@server.tool()
+async def run_saved_search(search_name: str, trigger_actions: bool = False) -> str:
+    await simulate_latency()
+    saved = next((entry for entry in SAVED_SEARCHES if entry["name"] == search_name), None)
+    if saved is None:
+        raise ValueError(f"Saved search '{search_name}' not found")
+    return format_results(saved["search"], synthetic_events(saved["search"], 20), "json")
+
+
+@server.tool()
+async def get_config() -> str:
+    await simulate_latency()
+    return json.dumps({"host": "mock-splunk", "port": 8089, "version": "9.2.0", "mock": True})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Synthetic stand-in for the Splunk MCP server")
+    parser.add_argument("--transport", choices=["stdio", "sse", "streamable-http"],
+                        default=os.getenv("TRANSPORT", "stdio"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8050)
+    args = parser.parse_args(argv)
+
+    if args.transport == "stdio":
+        server.run()
+        return
+    print(f"🧪 Mock Splunk MCP server on http://{args.host}:{args.port} ({args.transport})", file=sys.stderr)
+    try:
+        server.run(args.transport, host=args.host, port=args.port)
+    except TypeError:
+        # mcp 1.x takes host and port from the server settings instead
+        server.settings.host = args.host
+        server.settings.port = args.port
+        server.run(args.transport)
+
+
+if __name__ == "__main__":
+    main()
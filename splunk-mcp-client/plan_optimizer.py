@@ -0,0 +1,136 @@
+import os
+
+# Task names crewFlow.py has a tool for
+SUPPORTED_TASKS = (
+    'validate_spl', 'search_oneshot', 'get_indexes', 'run_saved_search',
+    'search_export', 'get_saved_searches', 'get_config', 'query_results',
+)
+# Parameterless lookups: two of them in one plan always return the same thing
+METADATA_TASKS = frozenset(['get_indexes', 'get_config', 'get_saved_searches'])
+# Rough per-step wall time, used for the plan's time estimate and the reported savings
+STEP_ESTIMATE_SECONDS = {
+    'search_oneshot': 30,
+    'search_export': 30,
+    'run_saved_search': 30,
+    'query_results': 10,
+    'validate_spl': 10,
+    'get_indexes': 5,
+    'get_config': 5,
+    'get_saved_searches': 5,
+}
+DEFAULT_STEP_SECONDS = 30
+
+
+def estimate_seconds(task_sequence: list) -> int:
+    return sum(STEP_ESTIMATE_SECONDS.get(task_info['task'], DEFAULT_STEP_SECONDS) for task_info in task_sequence)
+
+
+def _valid_dependency(task_info: dict, position: int):
+    depends_on = task_info.get('depends_on')
+    return depends_on if isinstance(depends_on, int) and 0 <= depends_on < position else None
+
+
+def optimize_plan(task_sequence: list):
+    """Rewrite a planned task list before execution and return (optimized plan, report).
+
+    - steps without a tool (e.g. the fallback planner's save_search) are dropped up front
+    - identical steps run once: metadata lookups by name, others by task, dependency and description
+    - a search_export of a search_oneshot's SPL is folded into that search, which then runs
+      once through the export tool (marked with "export": true)
+    - metadata lookups nothing depends on move behind the searches so they don't delay them
+
+    Steps that depended on a removed step depend on the step that now does its work.
+    """
+    steps = [dict(task_info) for task_info in task_sequence]
+    dependencies = [_valid_dependency(task_info, position) for position, task_info in enumerate(steps)]
+    replaced_by = {}  # removed step -> step doing its work, or None when nothing does
+    changes = []
+
+    def resolve(position):
+        while position is not None and position in replaced_by:
+            position = replaced_by[position]
+        return position
+
+    for position, task_info in enumerate(steps):
+        if task_info['task'] not in SUPPORTED_TASKS:
+            replaced_by[position] = dependencies[position]
+            changes.append(f"dropped step {position + 1} ({task_info['task']}): no tool supports it")
+
+    seen = {}
+    for position, task_info in enumerate(steps):
+        if position in replaced_by:
+            continue
+        if task_info['task'] in METADATA_TASKS:
+            key = (task_info['task'],)
+        else:
+            key = (task_info['task'], resolve(dependencies[position]), " ".join(task_info.get('description', "").lower().split()))
+        if key in seen:
+            replaced_by[position] = seen[key]
+            changes.append(f"merged step {position + 1} ({task_info['task']}) into identical step {seen[key] + 1}")
+        else:
+            seen[key] = position
+
+    for position, task_info in enumerate(steps):
+        if position in replaced_by or task_info['task'] != 'search_export':
+            continue
+        search = resolve(dependencies[position])
+        if search is None or steps[search]['task'] != 'search_oneshot' or steps[search].get('export'):
+            continue
+        # The export would re-run the search's SPL; one execution can return the exported rows
+        steps[search]['export'] = True
+        steps[search]['description'] = f"{steps[search]['description']} and export the results"
+        replaced_by[position] = search
+        changes.append(f"folded export step {position + 1} into search step {search + 1}")
+
+    kept = [position for position in range(len(steps)) if position not in replaced_by]
+    kept_dependencies = {position: resolve(dependencies[position]) for position in kept}
+    depended_on = set(kept_dependencies.values())
+    movable = [
+        position for position in kept
+        if steps[position]['task'] in METADATA_TASKS and position not in depended_on
+    ]
+    order = [position for position in kept if position not in movable] + movable
+    moved = [position for position in movable if any(later not in movable for later in kept if later > position)]
+    if moved:
+        changes.append(f"moved {', '.join(steps[position]['task'] for position in moved)} after the searches")
+
+    new_position = {position: index for index, position in enumerate(order)}
+    optimized = []
+    for position in order:
+        task_info = dict(steps[position])
+        dependency = kept_dependencies[position]
+        task_info['depends_on'] = new_position[dependency] if dependency is not None else None
+        optimized.append(task_info)
+
+    # How much sooner the first search starts once lookups stop running ahead of it
+    def wait_before_first_search(plan):
+        waited = 0
+        for task_info in plan:
+            if task_info['task'] not in METADATA_TASKS:
+                return waited
+            waited += STEP_ESTIMATE_SECONDS.get(task_info['task'], DEFAULT_STEP_SECONDS)
+        return 0
+
+    report = {
+        'steps_before': len(task_sequence),
+        'steps_after': len(optimized),
+        'seconds_before': estimate_seconds(task_sequence),
+        'seconds_after': estimate_seconds(optimized),
+        'first_search_seconds_earlier': wait_before_first_search(task_sequence) - wait_before_first_search(optimized),
+        'changes': changes,
+    }
+    report['seconds_saved'] = report['seconds_before'] - report['seconds_after']
+    return optimized, report
+
+
+def optimize_if_enabled(task_sequence: list):
+    """optimize_plan unless PLAN_OPTIMIZER=0; prints what changed"""
+    if os.getenv("PLAN_OPTIMIZER", "1") != "1":
+        return task_sequence, None
+    optimized, report = optimize_plan(task_sequence)
+    if report['changes']:
+        print(f"🧮 Plan optimized: {report['steps_before']} -> {report['steps_after']} steps, "
+              f"est. {report['seconds_before']}s -> {report['seconds_after']}s")
+        for change in report['changes']:
+            print(f"   - {change}")
+    return optimized, report
@@ -0,0 +1,215 @@
+import re
+import json
+
+from llm_gateway import get_gateway
+from intent_engine import match_intent, TASK_PATTERNS
+
+
+def call_llm(prompt, caller, validate):
+    """Planner and time-extraction prompts repeat often; a reply that validate accepts is reused for the same prompt"""
+    return get_gateway().call(prompt, caller, temperature=0.3, validate=validate)
+
+def parse_task_plan(result, has_previous_results=False):
+    """Valid tasks from the planner's reply; empty when it holds no usable JSON array"""
+    # Clean up the response - remove markdown formatting if present
+    if '```json' in result:
+        result = result.split('```json')[1].split('```')[0].strip()
+    elif '```' in result:
+        result = result.split('```')[1].strip()
+    
+    # Find JSON array in the response
+    json_match = re.search(r'\[.*\]', result, re.DOTALL)
+    if not json_match:
+        return []
+    try:
+        parsed_tasks = json.loads(json_match.group(0))
+    except json.JSONDecodeError:
+        return []
+    if not isinstance(parsed_tasks, list):
+        return []
+    
+    valid_tools = ['validate_spl', 'search_oneshot', 'get_indexes', 'run_saved_search', 
+                  'search_export', 'get_saved_searches', 'get_config']
+    if has_previous_results:
+        valid_tools.append('query_results')
+    
+    return [
+        {'task': task['task'], 'description': task['description'], 'depends_on': task.get('depends_on')}
+        for task in parsed_tasks
+        if isinstance(task, dict) and 'task' in task and 'description' in task and task['task'] in valid_tools
+    ]
+
+def parse_time_range(result):
+    """(earliest, latest) from an 'earliest,latest' reply, or None"""
+    parts = [part.strip().strip('"') for part in result.strip().split(',')]
+    if len(parts) != 2 or not all(parts):
+        return None
+    return parts[0], parts[1]
+
+def determine_task_sequence(user_input, has_previous_results=False):
+    """Determine if user wants multiple tasks and what they are"""
+    refinement_tool = (
+        "\n- query_results: Refine the previous workflow's results locally (filter, group by, top, timechart) without a new search"
+        if has_previous_results else ""
+    )
+    routing_prompt = f"""
+You are a strict task planner for a Splunk assistant. Break the user's request into **atomic Splunk tasks**.
+
+Available tools:
+- validate_spl: Validate an SPL query for safety
+- search_oneshot: Run an SPL query  
+- get_indexes: List available indexes
+- run_saved_search: Run existing saved search
+- search_export: Export search results
+- get_saved_searches: List all saved searches
+- get_config: Show Splunk configuration{refinement_tool}
+
+Return ONLY a valid JSON array. Each task must have:
+- "task": exact tool name from list above
+- "description": what this step does
+- "depends_on": task index it depends on (or null)
+
+Example for "Search failed logins and then show saved searches":
+[
+  {{"task": "search_oneshot", "description": "Search for failed logins", "depends_on": null}},
+  {{"task": "get_saved_searches", "description": "Show all saved searches", "depends_on": null}}
+]
+
+User request: "{user_input}"
+
+Return only the JSON array, no other text:"""
+
+    try:
+        result = call_llm(
+            routing_prompt, "determine_task_sequence", lambda reply: bool(parse_task_plan(reply, has_previous_results))
+        ).strip()
+        print("🧠 GEMINI RAW PLAN:")
+        print(result)
+        
+        validated_tasks = parse_task_plan(result, has_previous_results)
+        if validated_tasks:
+            print(f"✅ Parsed {len(validated_tasks)} valid tasks")
+            return validated_tasks
+        print("❌ No valid JSON task list found in response")
+            
+    except Exception as e:
+        print(f"❌ Error in task planning: {e}")
+    
+    # Fallback: Create a reasonable task sequence based on common patterns
+    print("🔄 Using fallback task planning...")
+    return create_fallback_task_sequence(user_input, has_previous_results)
+
+def create_fallback_task_sequence(user_input, has_previous_results=False):
+    """Create a reasonable task sequence when AI planning fails"""
+    user_lower = user_input.lower()
+    
+    # Follow-ups such as "now group that by host" refine the last results instead of searching again
+    if has_previous_results and TASK_PATTERNS['query_results'].search(user_lower):
+        print("🔧 Fallback planned a local refinement of the previous results")
+        return [{
+            "task": "query_results",
+            "description": "Refine the previous results locally",
+            "depends_on": None
+        }]
+    # Quoted text names saved searches, so keep it out of intent matching
+    intent = match_intent(re.sub(r"['\"][^'\"]*['\"]", "", user_input))
+    tasks = []
+    
+    # Check if it's a search request
+    if TASK_PATTERNS['search'].search(user_lower) or intent['components']:
+        if intent['components'] or ('index' in user_lower and 'saved search' not in user_lower):
+            # It's a data search request
+            search_index = len(tasks)
+            tasks.append({
+                "task": "search_oneshot",
+                "description": "Execute the search query",
+                "depends_on": None
+            })
+            
+            # Check if they want to export it
+            if TASK_PATTERNS['search_export'].search(user_lower):
+                tasks.append({
+                    "task": "search_export",
+                    "description": "Export the search results",
+                    "depends_on": search_index
+                })
+            
+            # Check if they want to save it
+            if TASK_PATTERNS['save_search'].search(user_lower):
+                tasks.append({
+                    "task": "save_search", 
+                    "description": "Save the search query",
+                    "depends_on": search_index
+                })
+        
+        # Check if they want to see saved searches
+        if TASK_PATTERNS['get_saved_searches'].search(user_lower):
+            tasks.append({
+                "task": "get_saved_searches",
+                "description": "Show all saved searches", 
+                "depends_on": None
+            })
+        
+        # Check if they want to see indexes
+        if TASK_PATTERNS['get_indexes'].search(user_lower):
+            tasks.append({
+                "task": "get_indexes",
+                "description": "Show available indexes",
+                "depends_on": None
+            })
+    
+    if TASK_PATTERNS['run_saved_search'].search(user_lower):
+        tasks.append({
+            "task": "run_saved_search",
+            "description": "Run the requested saved search",
+            "depends_on": None
+        })
+    
+    if TASK_PATTERNS['get_config'].search(user_lower):
+        tasks.append({
+            "task": "get_config",
+            "description": "Show Splunk configuration",
+            "depends_on": None
+        })
+    
+    # If no tasks were created, default to a search
+    if not tasks:
+        tasks = [{
+            "task": "search_oneshot",
+            "description": "Execute search based on user request",
+            "depends_on": None
+        }]
+    
+    print(f"🔧 Fallback created {len(tasks)} tasks: {[t['task'] for t in tasks]} (intent: {intent['intent']}, confidence {intent['confidence']:.2f})")
+    return tasks
+
+
+
+def extract_time_range(user_input):
+    """Extract time range from natural language"""
+    routing_prompt = f"""
+Extract the time range from this natural language request and convert it to Splunk time format.
+Return in format: earliest_time,latest_time
+
+Examples:
+- "last 24 hours" -> "-24h,now"
+- "past week" -> "-1w,now" 
+- "last hour" -> "-1h,now"
+- "today" -> "@d,now"
+- "yesterday" -> "-1d@d,-0d@d"
+- "last 30 minutes" -> "-30m,now"
+- "all time" -> "0,now"
+
+If no time range is specified, return "-24h,now"
+
+User request: {user_input}
+"""
+    result = call_llm(routing_prompt, "extract_time_range", lambda reply: parse_time_range(reply) is not None)
+    return parse_time_range(result) or ("-24h", "now")
+
+def resolve_time_range(user_request, manual_earliest, manual_latest, extracted=None):
+    """Manual overrides win; otherwise use the range extracted from the request (prefetched if given)"""
+    if manual_earliest and manual_latest:
+        return manual_earliest, manual_latest
+    extracted_earliest, extracted_latest = extracted or extract_time_range(user_request)
+    return manual_earliest or extracted_earliest, manual_latest or extracted_latest
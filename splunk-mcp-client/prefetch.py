@@ -0,0 +1,114 @@
+import os
+import time
+import shutil
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+from client import MCPClient
+
+# Metadata calls that are cheap, side-effect free and often needed by the plan
+PREFETCH_TOOLS = ("get_indexes", "get_config")
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="prefetch")
+
+
+def prefetch_dir(run_dir: str) -> str:
+    return os.path.join(run_dir, "prefetch")
+
+
+class Prefetcher:
+    """Speculative work started when a request is submitted, while the planner waits on the LLM.
+
+    Time-range extraction runs alongside planning, and an MCP session fetches get_indexes and
+    get_config into the run directory, where crewFlow.py's tools pick them up instead of
+    spawning a server and calling Splunk again. Results the plan doesn't need are discarded.
+    """
+
+    def __init__(self, run_dir: str):
+        self.run_dir = run_dir
+        self.directory = prefetch_dir(run_dir)
+        self._time_range = None
+        self._metadata = None
+        self._wanted = set(PREFETCH_TOOLS)
+
+    def start(self, user_request: str, extract_time_range=None):
+        if extract_time_range:
+            self._time_range = _executor.submit(extract_time_range, user_request)
+        if os.getenv("PREFETCH_METADATA", "1") == "1":
+            os.makedirs(self.directory, exist_ok=True)
+            for tool_name in PREFETCH_TOOLS:
+                # Tells crewFlow.py that a result is on its way and worth waiting for briefly
+                open(os.path.join(self.directory, f"{tool_name}.pending"), 'w').close()
+            self._metadata = _executor.submit(asyncio.run, self._fetch_metadata())
+        return self
+
+    async def _fetch_metadata(self):
+        started = time.time()
+        client = MCPClient()
+        try:
+            await client.connect()
+            responses = await asyncio.gather(
+                *(getattr(client, tool_name)() for tool_name in PREFETCH_TOOLS), return_exceptions=True
+            )
+        except Exception as e:
+            print(f"⚠️ Prefetch could not reach the MCP server: {e}")
+            responses = [e] * len(PREFETCH_TOOLS)
+        finally:
+            await client.close()
+
+        fetched = []
+        for tool_name, response in zip(PREFETCH_TOOLS, responses):
+            pending = os.path.join(self.directory, f"{tool_name}.pending")
+            if not isinstance(response, Exception) and not getattr(response, 'isError', False) and tool_name in self._wanted:
+                # Same text the tool would have returned; written atomically so readers never see half of it
+                path = os.path.join(self.directory, f"{tool_name}.txt")
+                with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+                    f.write(str(response))
+                os.replace(f"{path}.tmp", path)
+                fetched.append(tool_name)
+            if os.path.exists(pending):
+                os.remove(pending)
+        if fetched:
+            print(f"🔮 Prefetched {', '.join(fetched)} in {time.time() - started:.1f}s")
+
+    def time_range(self, timeout: Optional[float] = None):
+        """The concurrently extracted (earliest, latest), or None if it wasn't started or failed"""
+        if not isinstance(self._time_range, Future):
+            return None
+        try:
+            return self._time_range.result(timeout=timeout)
+        except Exception as e:
+            print(f"⚠️ Prefetched time range unavailable: {e}")
+            return None
+
+    def discard_unused(self, task_sequence: list):
+        """Drop prefetched results the plan has no step for"""
+        # A fetch still in flight checks this before writing its result
+        self._wanted = {task_info['task'] for task_info in task_sequence} & set(PREFETCH_TOOLS)
+        if not self._wanted:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            return
+        for tool_name in set(PREFETCH_TOOLS) - self._wanted:
+            path = os.path.join(self.directory, f"{tool_name}.txt")
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def load_prefetched(tool_name: str, run_dir: Optional[str] = None) -> Optional[str]:
+    """A tool result prefetched for this run, waiting briefly if the fetch is still in flight"""
+    run_dir = run_dir or os.getenv("RUN_DIR")
+    if not run_dir or os.getenv("PREFETCH", "1") != "1":
+        return None
+    directory = prefetch_dir(run_dir)
+    path = os.path.join(directory, f"{tool_name}.txt")
+    pending = os.path.join(directory, f"{tool_name}.pending")
+    deadline = time.time() + float(os.getenv("PREFETCH_WAIT_SECONDS", "5"))
+    while not os.path.exists(path) and os.path.exists(pending) and time.time() < deadline:
+        time.sleep(0.1)
+    if not os.path.exists(path):
+        return None
+    max_age = float(os.getenv("PREFETCH_MAX_AGE_SECONDS", "600"))
+    if time.time() - os.path.getmtime(path) > max_age:
+        return None
+    with open(path, encoding='utf-8') as f:
+        return f.read()
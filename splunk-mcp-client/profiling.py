@@ -0,0 +1,117 @@
+import os
+import json
+import pstats
+import cProfile
+import tracemalloc
+from contextlib import contextmanager
+from typing import Optional
+
+TOP_N = 25
+# Where time goes, by the package a function's file belongs to
+COMPONENTS = (
+    ('crewai', ('crewai', 'litellm', 'langchain', 'openai', 'google', 'httpx', 'httpcore', 'pydantic')),
+    ('mcp', ('mcp', 'anyio', 'asyncio', 'selectors')),
+    ('pandas/numpy', ('pandas', 'numpy')),
+)
+CLIENT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def classify_file(filename: str) -> str:
+    if filename.startswith(CLIENT_DIR):
+        return 'client code'
+    parts = filename.replace('\\', '/').split('/')
+    for component, packages in COMPONENTS:
+        if any(package in parts or f"{package}.py" in parts for package in packages):
+            return component
+    return 'other'
+
+
+def summarize_profile(stats: pstats.Stats, top_n: int = TOP_N) -> dict:
+    rows = []
+    components = {}
+    for (filename, line, function), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            'function': f"{os.path.basename(filename)}:{line}({function})",
+            'file': filename,
+            'calls': calls,
+            'tottime': round(tottime, 4),
+            'cumtime': round(cumtime, 4),
+        })
+        component = classify_file(filename)
+        components[component] = components.get(component, 0.0) + tottime
+    return {
+        'total_seconds': round(stats.total_tt, 3),
+        'by_self_time': sorted(rows, key=lambda row: -row['tottime'])[:top_n],
+        'by_cumulative_time': sorted(rows, key=lambda row: -row['cumtime'])[:top_n],
+        'self_time_by_component': {name: round(seconds, 3) for name, seconds in sorted(components.items(), key=lambda item: -item[1])},
+    }
+
+
+def summarize_allocations(start: tracemalloc.Snapshot, end: tracemalloc.Snapshot, top_n: int = TOP_N) -> list:
+    """Allocation sites that grew the most over the run"""
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")]
+    diffs = end.filter_traces(ignore).compare_to(start.filter_traces(ignore), 'traceback')
+    return [
+        {
+            'site': str(diff.traceback[-1]) if diff.traceback else "?",
+            'size_kb': round(diff.size / 1024, 1),
+            'growth_kb': round(diff.size_diff / 1024, 1),
+            'blocks': diff.count,
+            'traceback': [str(frame) for frame in diff.traceback],
+        }
+        for diff in sorted(diffs, key=lambda diff: -diff.size_diff)[:top_n]
+    ]
+
+
+@contextmanager
+def profile_run(output_dir: str, label: str = "workflow", enabled: Optional[bool] = None):
+    """Run the enclosed code under cProfile and tracemalloc and save the artifacts in output_dir.
+
+    Writes <label>_profile.pstats (for snakeviz/pstats) and <label>_profile.json with the hottest
+    functions, self time per component and the biggest allocation sites.
+    """
+    if enabled is None:
+        enabled = os.getenv("PROFILE_WORKFLOW", "0") == "1"
+    if not enabled:
+        yield None
+        return
+
+    tracemalloc.start(int(os.getenv("PROFILE_TRACE_FRAMES", "10")))
+    start_snapshot = tracemalloc.take_snapshot()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        end_snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        os.makedirs(output_dir, exist_ok=True)
+        stats_path = os.path.join(output_dir, f"{label}_profile.pstats")
+        profiler.dump_stats(stats_path)
+        summary = summarize_profile(pstats.Stats(profiler))
+        summary.update({
+            'label': label,
+            'pstats_path': os.path.abspath(stats_path),
+            'memory_current_kb': round(current / 1024, 1),
+            'memory_peak_kb': round(peak / 1024, 1),
+            'allocations': summarize_allocations(start_snapshot, end_snapshot),
+        })
+        summary_path = os.path.join(output_dir, f"{label}_profile.json")
+        with open(summary_path, 'w') as f:
+            json.dump(summary, f, indent=1)
+        print(f"PROFILE_ARTIFACT: {os.path.abspath(summary_path)}")
+
+
+def load_profiles(output_dir: str) -> list:
+    """Profile summaries saved in a run directory"""
+    if not output_dir or not os.path.isdir(output_dir):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(output_dir)):
+        if name.endswith("_profile.json"):
+            with open(os.path.join(output_dir, name)) as f:
+                profiles.append(json.load(f))
+    return profiles
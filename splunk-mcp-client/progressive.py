@@ -0,0 +1,70 @@
+import os
+import time
+import asyncio
+from typing import Optional
+
+from client import CompactResultSet, parse_result_records, tool_result_text
+from incremental_search import STREAMING_COMMANDS
+from result_channel import publish_result_frame
+from result_store import records_to_frame
+from spl_rewriter import join_pipeline, split_pipeline
+
+
+def preview_rows() -> int:
+    return int(os.getenv("PREVIEW_ROWS", "20"))
+
+
+def progressive_enabled() -> bool:
+    return os.getenv("PROGRESSIVE_RESULTS", "0") == "1"
+
+
+def preview_query(query: str, rows: int) -> Optional[str]:
+    """A bounded version of an event search for a quick first screenful, or None when not worth it.
+
+    Only purely streaming searches qualify: the first rows of `stats`, `sort` or `top` output
+    would be a wrong answer rather than a partial one. Searches already limited with head are
+    fast on their own.
+    """
+    segments = split_pipeline(query)
+    if not segments[0]:
+        return None  # generating commands such as | tstats
+    commands = [segment for segment in segments[1:] if segment]
+    if any(segment.split()[0].lower() not in STREAMING_COMMANDS for segment in commands):
+        return None
+    return join_pipeline(segments + [f"head {rows}"])
+
+
+async def publish_preview(tool_name: str, preview_call, rows: int):
+    """Run the bounded search and publish its rows as a preview frame for the UI"""
+    started = time.time()
+    try:
+        response = await preview_call()
+    except Exception as e:
+        print(f"⚠️ Preview search failed: {e}")
+        return
+    if getattr(response, 'isError', False):
+        return
+    records = parse_result_records(tool_result_text(response))
+    if not records:
+        return
+    frame = records_to_frame(CompactResultSet.from_records(records), typed=False)
+    publish_result_frame(tool_name, frame, {'preview_rows': rows}, preview=True)
+    print(f"👀 Preview of {len(frame)} rows ready in {time.time() - started:.1f}s, full search still running")
+
+
+async def with_preview(tool_name: str, query: str, full_call, preview_call) -> str:
+    """Await the full search while a bounded preview of it runs alongside on the same session.
+
+    The preview is abandoned if the full result arrives first. `preview_call(query, rows)`
+    returns a coroutine running the bounded query.
+    """
+    rows = preview_rows()
+    bounded = preview_query(query, rows) if progressive_enabled() else None
+    if not bounded:
+        return await full_call()
+    preview = asyncio.create_task(publish_preview(tool_name, lambda: preview_call(bounded, rows), rows))
+    try:
+        return await full_call()
+    finally:
+        if not preview.done():
+            preview.cancel()
@@ -0,0 +1,150 @@
+import os
+import re
+import json
+import itertools
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # optional: falls back to memory-mapped .npy column files
+    pa = None
+
+DEFAULT_RUN_DIR = os.path.join(".splunk_assistant", "runs", "adhoc")
+RESULT_ARTIFACT_PATTERN = re.compile(r'RESULT_ARTIFACT:\s*(\S+)')
+RESULT_FRAME_PATTERN = re.compile(r'RESULT_FRAME:\s*(\S+)')
+
+_artifact_counter = itertools.count(1)
+
+
+def get_run_dir() -> str:
+    """Directory holding this workflow run's side-channel artifacts"""
+    run_dir = os.getenv("RUN_DIR", DEFAULT_RUN_DIR)
+    os.makedirs(run_dir, exist_ok=True)
+    return run_dir
+
+
+def _artifact_path(tool_name: str, extension: str, prefix: str = "result") -> str:
+    file_name = f"{prefix}_{os.getpid()}_{next(_artifact_counter):03d}_{tool_name}.{extension}"
+    return os.path.abspath(os.path.join(get_run_dir(), file_name))
+
+
+def publish_full_result(tool_name: str, text: str) -> str:
+    """Write a full tool result for the UI and announce its path on stdout"""
+    path = _artifact_path(tool_name, "json")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    print(f"RESULT_ARTIFACT: {path}")
+    return path
+
+
+def find_result_artifacts(stdout: str) -> list:
+    """Paths of full results announced in a step's output, in order, skipping ones that are gone"""
+    paths = list(dict.fromkeys(RESULT_ARTIFACT_PATTERN.findall(stdout or "")))
+    return [path for path in paths if os.path.exists(path)]
+
+
+def load_full_result(path: str) -> str:
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def _write_arrow_frame(path: str, frame: pd.DataFrame, meta: dict):
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), b'splunk_meta': json.dumps(meta).encode('utf-8')})
+    with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def _write_npy_frame(path: str, frame: pd.DataFrame, meta: dict):
+    """One .npy file per column; text columns as a UTF-8 byte buffer plus row offsets, like Arrow"""
+    os.makedirs(path, exist_ok=True)
+    columns = []
+    for position, name in enumerate(frame.columns):
+        column = frame[name]
+        if pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column):
+            np.save(os.path.join(path, f"{position}.npy"), column.to_numpy())
+            columns.append({'name': str(name), 'kind': 'numeric'})
+            continue
+        encoded = [value.encode('utf-8') for value in column.astype(object).where(column.notna(), "").astype(str)]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        np.save(os.path.join(path, f"{position}.npy"), np.frombuffer(b"".join(encoded), dtype=np.uint8))
+        np.save(os.path.join(path, f"{position}.offsets.npy"), offsets)
+        columns.append({'name': str(name), 'kind': 'text'})
+    with open(os.path.join(path, "schema.json"), 'w') as f:
+        json.dump({'rows': len(frame), 'columns': columns, 'meta': meta}, f)
+
+
+def publish_result_frame(tool_name: str, frame: pd.DataFrame, meta=None, preview: bool = False) -> str:
+    """Write result rows once as columnar files under the run directory and announce only the handle.
+
+    Arrow IPC when pyarrow is installed, otherwise a directory of .npy column files. Either way
+    the UI memory-maps the columns instead of re-parsing the rows out of captured stdout.
+    Previews are picked up by the UI while the workflow is still running, so they are written
+    under a temporary name and renamed into place.
+    """
+    meta = meta or {}
+    prefix = "preview" if preview else "result"
+    if pa is not None:
+        path = _artifact_path(tool_name, "arrow", prefix)
+        _write_arrow_frame(f"{path}.tmp", frame, meta)
+    else:
+        path = _artifact_path(tool_name, "frame", prefix)
+        _write_npy_frame(f"{path}.tmp", frame, meta)
+    os.replace(f"{path}.tmp", path)
+    print(f"{'RESULT_PREVIEW' if preview else 'RESULT_FRAME'}: {path} ({len(frame)} rows)")
+    return path
+
+
+def find_previews(run_dir: str) -> list:
+    """Preview frames published so far in a run, oldest first"""
+    if not os.path.isdir(run_dir):
+        return []
+    paths = [
+        os.path.join(run_dir, name) for name in os.listdir(run_dir)
+        if name.startswith("preview_") and not name.endswith(".tmp")
+    ]
+    return sorted(paths, key=os.path.getmtime)
+
+
+def result_for_preview(preview_path: str, frame_paths: list):
+    """The full result frame the same search published after a preview, if any"""
+    _, pid, number, tool_name = os.path.splitext(os.path.basename(preview_path))[0].split("_", 3)
+    for path in frame_paths:
+        _, frame_pid, frame_number, frame_tool = os.path.splitext(os.path.basename(path))[0].split("_", 3)
+        if (frame_pid, frame_tool) == (pid, tool_name) and int(frame_number) > int(number):
+            return path
+    return None
+
+
+def find_result_frames(stdout: str) -> list:
+    """Paths of result frames announced in a step's output, in order, skipping ones that are gone"""
+    paths = list(dict.fromkeys(RESULT_FRAME_PATTERN.findall(stdout or "")))
+    return [path for path in paths if os.path.exists(path)]
+
+
+def load_result_frame(path: str):
+    """Map a published result frame and return (DataFrame, meta)"""
+    if os.path.isdir(path):
+        with open(os.path.join(path, "schema.json")) as f:
+            schema = json.load(f)
+        data = {}
+        for position, column in enumerate(schema['columns']):
+            values = np.load(os.path.join(path, f"{position}.npy"), mmap_mode='r')
+            if column['kind'] == 'numeric':
+                data[column['name']] = values
+                continue
+            offsets = np.load(os.path.join(path, f"{position}.offsets.npy"), mmap_mode='r')
+            buffer = memoryview(values)
+            data[column['name']] = [str(buffer[start:end], 'utf-8') for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+        return pd.DataFrame(data, columns=[column['name'] for column in schema['columns']]), schema['meta']
+
+    if pa is None:
+        raise RuntimeError(f"pyarrow is needed to read {path}")
+    with pa.memory_map(path, 'r') as source:
+        table = pa.ipc.open_file(source).read_all()
+    meta = json.loads((table.schema.metadata or {}).get(b'splunk_meta', b'{}'))
+    return table.to_pandas(), meta
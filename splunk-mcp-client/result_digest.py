@@ -0,0 +1,129 @@
+import os
+import json
+
+import pandas as pd
+
+from client import CompactResultSet, parse_result_records, tool_result_text
+from result_channel import get_run_dir, publish_full_result, publish_result_frame
+from result_store import ResultStore, coerce_numeric, records_to_frame
+
+TOP_VALUES = 3
+TIME_FIELD = "_time"
+MAX_META_CHARS = 1000
+
+
+def digest_records(records: list) -> dict:
+    """Summarise result rows (or their DataFrame) locally: shape, cardinality, top values, numeric ranges and time span"""
+    df = records if isinstance(records, pd.DataFrame) else pd.DataFrame.from_records(records)
+    digest = {
+        'rows': len(df),
+        'columns': len(df.columns),
+        'fields': {},
+        'time_span': None,
+    }
+    if df.empty:
+        return digest
+
+    # Stringify once so unhashable values (lists from multivalue fields) don't break nunique/value_counts
+    as_text = df.astype(str)
+    cardinality = as_text.nunique()
+    numeric = df.apply(pd.to_numeric, errors='coerce')
+    numeric_share = numeric.notna().mean()
+    numeric_cols = numeric_share[numeric_share >= 0.9].index
+    numeric_stats = numeric[numeric_cols].agg(['min', 'max', 'mean']) if len(numeric_cols) else None
+
+    for col in df.columns:
+        field = {
+            'cardinality': int(cardinality[col]),
+            'top_values': as_text[col].value_counts().head(TOP_VALUES).to_dict(),
+        }
+        if numeric_stats is not None and col in numeric_stats.columns and col != TIME_FIELD:
+            field['min'] = float(numeric_stats.at['min', col])
+            field['max'] = float(numeric_stats.at['max', col])
+            field['mean'] = round(float(numeric_stats.at['mean', col]), 3)
+        digest['fields'][col] = field
+
+    if TIME_FIELD in df.columns:
+        times = pd.to_datetime(df[TIME_FIELD], errors='coerce', utc=True)
+        if times.isna().all():
+            times = pd.to_datetime(numeric[TIME_FIELD], unit='s', errors='coerce', utc=True)
+        if times.notna().any():
+            digest['time_span'] = {
+                'earliest': times.min().isoformat(),
+                'latest': times.max().isoformat(),
+                'seconds': (times.max() - times.min()).total_seconds(),
+            }
+    return digest
+
+
+def format_digest(digest: dict, records: list, sample_rows: int, meta=None) -> str:
+    lines = ["RESULT DIGEST (computed locally from the full result)"]
+    if meta and meta.get('query'):
+        lines.append(f"Query: {meta['query']}")
+    lines.append(f"Rows: {digest['rows']}  Columns: {digest['columns']}")
+    if digest['time_span']:
+        span = digest['time_span']
+        lines.append(f"Time span: {span['earliest']} -> {span['latest']} ({span['seconds']:.0f}s)")
+    for name, field in digest['fields'].items():
+        top = ", ".join(f"{value} ({count})" for value, count in field['top_values'].items())
+        line = f"- {name}: {field['cardinality']} distinct; top: {top}"
+        if 'mean' in field:
+            line += f"; min={field['min']:g} max={field['max']:g} mean={field['mean']:g}"
+        lines.append(line)
+    sample = records[:sample_rows]
+    lines.append(f"Sample rows ({len(sample)} of {digest['rows']}):")
+    lines.extend(json.dumps(row, default=str) for row in sample)
+    return "\n".join(lines)
+
+
+def digest_tool_response(tool_name: str, response) -> str:
+    """Return a digest plus bounded sample for the agent and hand the full result to the UI"""
+    text = tool_result_text(response)
+    if getattr(response, 'isError', False):
+        return str(response)
+
+    records = parse_result_records(text)
+    if not records:
+        return str(response)
+
+    try:
+        meta = json.loads(text)
+    except json.JSONDecodeError:
+        meta = None
+    # Only the small scalar fields; the parsed payload would otherwise keep every row alive
+    meta = frame_meta(meta) if isinstance(meta, dict) else None
+    # Hold the rows column-wise from here on; the per-event dicts can then be freed
+    result_set = CompactResultSet.from_records(records)
+    del records
+    # The UI shows values as Splunk returned them; only the queryable copy gets numeric columns
+    frame = records_to_frame(result_set, typed=False)
+    if os.getenv("RESULT_STORE", "1") == "1":
+        store_result_table(tool_name, frame.apply(coerce_numeric), meta and meta.get('query'))
+    if os.getenv("RESULT_DIGEST", "1") != "1":
+        return str(response)
+    if os.getenv("RESULT_FRAMES", "1") == "1":
+        # Only the handle goes through stdout; the rows are written once as column files
+        publish_result_frame(tool_name, frame, meta)
+    else:
+        publish_full_result(tool_name, text)
+
+    sample_rows = int(os.getenv("DIGEST_SAMPLE_ROWS", "10"))
+    digest = digest_records(frame)
+    return format_digest(digest, result_set.to_records(sample_rows), sample_rows, meta)
+
+
+def frame_meta(meta) -> dict:
+    """Small scalar fields of a tool result (query, counts) to keep alongside its rows"""
+    return {
+        key: value for key, value in (meta or {}).items()
+        if not isinstance(value, (list, dict)) and len(str(value)) <= MAX_META_CHARS
+    }
+
+
+def store_result_table(tool_name: str, records, query=None):
+    """Keep a columnar copy of the rows so refinements can run locally instead of re-querying Splunk"""
+    try:
+        name = ResultStore(get_run_dir()).add(tool_name, records, query)
+        print(f"RESULT_TABLE: {name} ({len(records)} rows)")
+    except Exception as e:
+        print(f"⚠️ Could not store result table: {e}")
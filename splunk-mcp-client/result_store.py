@@ -0,0 +1,305 @@
+import os
+import re
+import json
+import time
+import sqlite3
+from typing import Optional
+
+import pandas as pd
+
+from client import CompactResultSet
+
+STORE_FILE = "results.db"
+TIME_FIELD = "_time"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS result_tables (
+    name TEXT PRIMARY KEY,
+    tool TEXT NOT NULL,
+    query TEXT,
+    rows INTEGER NOT NULL,
+    columns TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+# Query layer: the subset of SPL that follow-up refinements use, evaluated with pandas
+CONDITION_PATTERN = re.compile(r"(?P<field>[\w.]+)\s*(?P<op>!=|>=|<=|=|>|<)\s*(?P<value>\"[^\"]*\"|'[^']*'|\S+)")
+STATS_PATTERN = re.compile(r"^stats\s+(?P<aggs>.+?)(?:\s+by\s+(?P<by>[\w\s,.]+))?$", re.IGNORECASE)
+AGG_PATTERN = re.compile(r"(?P<fn>count|sum|avg|mean|min|max|dc|distinct_count)(?:\((?P<field>[^)]*)\))?(?:\s+as\s+(?P<alias>\w+))?", re.IGNORECASE)
+TOP_PATTERN = re.compile(r"^(?P<cmd>top|rare)(?:\s+limit=(?P<limit>\d+))?\s+(?P<fields>[\w.,\s]+)$", re.IGNORECASE)
+TIMECHART_PATTERN = re.compile(r"^timechart(?:\s+span=(?P<span>\d+[smhdw]))?\s+(?P<agg>\S+?)(?:\s+by\s+(?P<by>[\w.]+))?$", re.IGNORECASE)
+SORT_PATTERN = re.compile(r"^sort\s+(?:(?P<limit>\d+)\s+)?(?P<keys>.+)$", re.IGNORECASE)
+HEAD_PATTERN = re.compile(r"^(?P<cmd>head|tail)(?:\s+(?:limit=)?(?P<limit>\d+))?$", re.IGNORECASE)
+FIELDS_PATTERN = re.compile(r"^(?:fields|table)\s+(?P<sign>[-+]\s+)?(?P<fields>.+)$", re.IGNORECASE)
+QUOTED_PATTERN = re.compile(r"\"[^\"]*\"|'[^']*'")
+PANDAS_AGG = {'count': 'count', 'sum': 'sum', 'avg': 'mean', 'mean': 'mean', 'min': 'min', 'max': 'max', 'dc': 'nunique', 'distinct_count': 'nunique'}
+SPAN_UNITS = {'s': 's', 'm': 'min', 'h': 'h', 'd': 'D', 'w': 'W'}
+
+
+class LocalQueryError(ValueError):
+    """Raised when a refinement uses SPL the local query layer can't evaluate"""
+
+
+class ResultStore:
+    """Columnar copies of a workflow's search results, kept next to the run's other artifacts.
+
+    Each result becomes one SQLite table so follow-up refinements (filter, group-by, top,
+    timechart) can be evaluated locally with pandas instead of another Splunk search.
+    """
+
+    def __init__(self, run_dir: str):
+        self.run_dir = run_dir
+        self.db_path = os.path.join(run_dir, STORE_FILE)
+
+    def _connect(self):
+        os.makedirs(self.run_dir, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.executescript(SCHEMA)
+        return conn
+
+    def add(self, tool_name: str, records, query: Optional[str] = None) -> str:
+        """Store result rows (or a frame from records_to_frame) as a typed table and return its name"""
+        df = records if isinstance(records, pd.DataFrame) else records_to_frame(records)
+
+        with self._connect() as conn:
+            count = conn.execute("SELECT COUNT(*) FROM result_tables").fetchone()[0]
+            name = f"{tool_name}_{count + 1}"
+            df.to_sql(name, conn, index=False, if_exists='replace')
+            conn.execute(
+                "INSERT OR REPLACE INTO result_tables (name, tool, query, rows, columns, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (name, tool_name, query, len(df), json.dumps(list(df.columns)), time.time()),
+            )
+        return name
+
+    def tables(self) -> list:
+        """Stored result tables, newest first"""
+        if not os.path.exists(self.db_path):
+            return []
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT name, tool, query, rows, columns, created_at FROM result_tables ORDER BY created_at DESC"
+            ).fetchall()
+        return [
+            {'name': name, 'tool': tool, 'query': query, 'rows': n, 'columns': json.loads(columns), 'created_at': created_at}
+            for name, tool, query, n, columns, created_at in rows
+        ]
+
+    def load(self, name: Optional[str] = None) -> pd.DataFrame:
+        """A stored table as a DataFrame; the most recent one when no name is given"""
+        tables = self.tables()
+        if not tables:
+            raise LocalQueryError(f"No stored results in {self.run_dir}")
+        table = tables[0] if name in (None, "", "latest") else next((t for t in tables if t['name'] == name), None)
+        if table is None:
+            raise LocalQueryError(f"No stored result named '{name}'")
+        with self._connect() as conn:
+            return pd.read_sql_query(f'SELECT * FROM "{table["name"]}"', conn)
+
+    def query(self, pipeline: str, name: Optional[str] = None) -> pd.DataFrame:
+        return run_pipeline(self.load(name), pipeline)
+
+
+def records_to_frame(records: list, typed: bool = True) -> pd.DataFrame:
+    """DataFrame from result rows or a CompactResultSet, with multivalue fields flattened to JSON text.
+
+    typed=True converts all-numeric columns to numbers for querying; leave it off for display,
+    where values such as zip codes or "007" must show exactly as Splunk returned them.
+    """
+    df = records.to_dataframe() if isinstance(records, CompactResultSet) else pd.DataFrame.from_records(records)
+    # Multivalue fields arrive as lists, which neither SQLite nor flat column files can hold
+    for col in df.columns:
+        # Only plain object columns can hold them; categorical and numeric ones are already flat
+        if df[col].dtype == object and df[col].map(lambda value: isinstance(value, (list, dict))).any():
+            df[col] = df[col].map(lambda value: json.dumps(value) if isinstance(value, (list, dict)) else value)
+    return df.apply(coerce_numeric) if typed else df
+
+
+def coerce_numeric(column: pd.Series) -> pd.Series:
+    """Convert a column to numbers when every non-empty value is numeric"""
+    if not pd.api.types.is_string_dtype(column):
+        return column
+    numeric = pd.to_numeric(column, errors='coerce')
+    present = column.notna() & (column.astype(str).str.strip() != "")
+    return numeric if present.any() and numeric[present].notna().all() else column
+
+
+def _unquote(value: str) -> str:
+    return value[1:-1] if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'" else value
+
+
+def is_local_filter(expression: str) -> bool:
+    """True when a search expression is only field comparisons joined by AND.
+
+    Free text, OR, NOT and parentheses aren't evaluated locally and would otherwise be dropped.
+    """
+    leftover = CONDITION_PATTERN.sub(" ", QUOTED_PATTERN.sub('""', expression))
+    if any(token.upper() != 'AND' for token in leftover.split()):
+        return False
+    return not re.search(r"[()]", QUOTED_PATTERN.sub("", expression))
+
+
+def _filter(df: pd.DataFrame, expression: str) -> pd.DataFrame:
+    """Apply AND-ed field comparisons such as status=404 host!=web* bytes>1000"""
+    if not is_local_filter(expression):
+        raise LocalQueryError(
+            f"Only AND-ed field comparisons can be filtered locally, not '{expression}'; run a new search instead"
+        )
+    mask = pd.Series(True, index=df.index)
+    for condition in CONDITION_PATTERN.finditer(expression):
+        field, op, value = condition.group('field'), condition.group('op'), _unquote(condition.group('value'))
+        if field not in df.columns:
+            raise LocalQueryError(f"Field '{field}' is not in the stored result")
+        column = df[field]
+        if op in ('=', '!='):
+            if '*' in value:
+                regex = "^" + ".*".join(re.escape(part) for part in value.split('*')) + "$"
+                matched = column.astype(str).str.match(regex, case=False)
+            elif pd.api.types.is_numeric_dtype(column) and re.fullmatch(r"-?\d+(?:\.\d+)?", value):
+                matched = column == float(value)
+            else:
+                matched = column.astype(str).str.lower() == value.lower()
+            mask &= matched if op == '=' else ~matched
+        else:
+            try:
+                float(value)
+            except ValueError:
+                raise LocalQueryError(f"'{field}{op}{value}' needs a numeric value") from None
+            numeric = pd.to_numeric(column, errors='coerce')
+            mask &= {'>': numeric > float(value), '<': numeric < float(value),
+                     '>=': numeric >= float(value), '<=': numeric <= float(value)}[op]
+    return df[mask]
+
+
+def _aggregate(df: pd.DataFrame, aggs: str, by: list) -> pd.DataFrame:
+    specs = []
+    for agg in AGG_PATTERN.finditer(aggs):
+        fn, field = agg.group('fn').lower(), agg.group('field')
+        column = agg.group('alias') or (f"{fn}({field})" if field else fn)
+        if field and field not in df.columns:
+            raise LocalQueryError(f"Field '{field}' is not in the stored result")
+        specs.append((column, fn, field))
+    if not specs:
+        raise LocalQueryError(f"Unsupported stats aggregation: {aggs}")
+
+    missing = [field for field in by if field not in df.columns]
+    if missing:
+        raise LocalQueryError(f"Field(s) {', '.join(missing)} are not in the stored result")
+
+    grouped = df.groupby(by, sort=False, dropna=False) if by else None
+    columns = {}
+    for column, fn, field in specs:
+        if fn == 'count' and not field:
+            columns[column] = grouped.size() if by else pd.Series([len(df)])
+            continue
+        values = df[field] if fn in ('dc', 'distinct_count', 'count') else pd.to_numeric(df[field], errors='coerce')
+        if by:
+            columns[column] = values.groupby([df[key] for key in by], sort=False, dropna=False).agg(PANDAS_AGG[fn])
+        else:
+            columns[column] = pd.Series([values.agg(PANDAS_AGG[fn])])
+    result = pd.DataFrame(columns)
+    return result.reset_index() if by else result
+
+
+def _timechart(df: pd.DataFrame, span: Optional[str], agg: str, by: Optional[str]) -> pd.DataFrame:
+    if TIME_FIELD not in df.columns:
+        raise LocalQueryError("timechart needs _time in the stored result")
+    times = df[TIME_FIELD]
+    times = pd.to_datetime(times, unit='s', utc=True) if pd.api.types.is_numeric_dtype(times) else pd.to_datetime(times, errors='coerce', utc=True)
+    span = span or "1h"
+    freq = f"{span[:-1]}{SPAN_UNITS[span[-1]]}"
+    buckets = times.dt.floor(freq) if span[-1] != 'w' else times.dt.to_period('W').dt.start_time
+    frame = df.assign(**{TIME_FIELD: buckets})
+    match = AGG_PATTERN.fullmatch(agg)
+    if not match:
+        raise LocalQueryError(f"Unsupported timechart aggregation: {agg}")
+    result = _aggregate(frame, agg, [TIME_FIELD] + ([by] if by else []))
+    value = result.columns[-1]
+    if by:
+        result = result.pivot_table(index=TIME_FIELD, columns=by, values=value, aggfunc='sum', fill_value=0).reset_index()
+        result.columns.name = None
+    return result.sort_values(TIME_FIELD)
+
+
+def _sort(df: pd.DataFrame, keys: str) -> pd.DataFrame:
+    fields, ascending = [], []
+    for key in re.split(r"\s*,\s*|\s+(?=[-+])", keys.strip()):
+        key = key.strip()
+        if not key:
+            continue
+        descending = key.startswith('-')
+        field = key.lstrip('-+').strip()
+        if field not in df.columns:
+            raise LocalQueryError(f"Cannot sort by '{field}', it is not in the result")
+        fields.append(field)
+        ascending.append(not descending)
+    return df.sort_values(fields, ascending=ascending, kind='stable') if fields else df
+
+
+def run_pipeline(df: pd.DataFrame, pipeline: str) -> pd.DataFrame:
+    """Evaluate a refinement pipeline such as '| search status=404 | stats count by host | sort -count | head 5'"""
+    for command in (segment.strip() for segment in pipeline.split('|')):
+        if not command:
+            continue
+        name = command.split()[0].lower()
+        rest = command[len(name):].strip()
+
+        if name in ('search', 'where'):
+            df = _filter(df, rest)
+        elif CONDITION_PATTERN.match(command) and name not in ('stats', 'top', 'rare', 'timechart', 'sort', 'head', 'tail', 'fields', 'table'):
+            df = _filter(df, command)  # bare "status=404" as the first segment
+        elif name == 'stats':
+            match = STATS_PATTERN.match(command)
+            if not match:
+                raise LocalQueryError(f"Unsupported stats command: {command}")
+            by = [field for field in re.split(r"[\s,]+", match.group('by') or "") if field]
+            df = _aggregate(df, match.group('aggs'), by)
+        elif name in ('top', 'rare'):
+            match = TOP_PATTERN.match(command)
+            if not match:
+                raise LocalQueryError(f"Unsupported {name} command: {command}")
+            fields = [field for field in re.split(r"[\s,]+", match.group('fields')) if field]
+            counts = _aggregate(df, "count", fields)
+            counts['percent'] = (counts['count'] / max(len(df), 1) * 100).round(6)
+            df = counts.sort_values('count', ascending=name == 'rare', kind='stable').head(int(match.group('limit') or 10))
+        elif name == 'timechart':
+            match = TIMECHART_PATTERN.match(command)
+            if not match:
+                raise LocalQueryError(f"Unsupported timechart command: {command}")
+            df = _timechart(df, match.group('span'), match.group('agg'), match.group('by'))
+        elif name == 'sort':
+            match = SORT_PATTERN.match(command)
+            if not match:
+                raise LocalQueryError(f"sort needs at least one field: {command}")
+            df = _sort(df, match.group('keys'))
+            if match.group('limit'):
+                df = df.head(int(match.group('limit')))
+        elif name in ('head', 'tail'):
+            match = HEAD_PATTERN.match(command)
+            if not match:
+                raise LocalQueryError(f"Unsupported {name} command: {command}")
+            limit = int(match.group('limit') or 10)
+            df = df.head(limit) if name == 'head' else df.tail(limit)
+        elif name in ('fields', 'table'):
+            match = FIELDS_PATTERN.match(command)
+            if not match:
+                raise LocalQueryError(f"{name} needs at least one field: {command}")
+            fields = [field for field in re.split(r"[\s,]+", match.group('fields')) if field]
+            if match.group('sign') and match.group('sign').strip() == '-':
+                df = df.drop(columns=[field for field in fields if field in df.columns])
+            else:
+                df = df[[field for field in fields if field in df.columns]]
+        else:
+            raise LocalQueryError(f"'{name}' can't be evaluated locally; run a new search instead")
+    return df.reset_index(drop=True)
+
+
+def query_stored_results(pipeline: str, run_dirs: list, name: Optional[str] = None):
+    """Run a refinement against the first run directory holding stored results"""
+    for run_dir in run_dirs:
+        if not run_dir:
+            continue
+        store = ResultStore(run_dir)
+        if store.tables():
+            return store.query(pipeline, name)
+    raise LocalQueryError("No stored search results to refine; run a search first")
@@ -0,0 +1,143 @@
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import argparse
+from fnmatch import fnmatch
+from typing import Optional
+
+import pandas as pd
+from dotenv import load_dotenv
+
+from client import MCPClient, parse_result_records, tool_result_text
+from result_store import ResultStore
+
+load_dotenv()
+
+SUMMARY_COLUMNS = ['name', 'app', 'status', 'duration_seconds', 'rows', 'error']
+
+
+def _saved_search_entries(payload) -> list:
+    """(name, app) pairs from a get_saved_searches result, whatever shape the server returned"""
+    text = tool_result_text(payload)
+    records = parse_result_records(text)
+    if not records:
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError:
+            data = None
+        # e.g. {"saved_searches": [...]}: the first list of objects in the payload
+        if isinstance(data, dict):
+            records = next((value for value in data.values() if isinstance(value, list) and value and isinstance(value[0], dict)), [])
+    entries = []
+    for row in records:
+        name = row.get('name') or row.get('title')
+        if not name:
+            continue
+        acl = row.get('acl') if isinstance(row.get('acl'), dict) else {}
+        app = row.get('app') or row.get('eai:acl.app') or acl.get('app') or ""
+        entries.append((str(name), str(app)))
+    if not entries:
+        names = re.findall(r"['\"]?(?:name|title)['\"]?\s*[:=]\s*['\"]([^'\"]+)['\"]", text)
+        entries = [(name, "") for name in names]
+    return list(dict.fromkeys(entries))
+
+
+def select_saved_searches(entries: list, pattern: Optional[str] = None, app: Optional[str] = None) -> list:
+    """Filter (name, app) pairs by a case-insensitive glob on the name and an exact app"""
+    return [
+        (name, entry_app) for name, entry_app in entries
+        if (not pattern or fnmatch(name.lower(), pattern.lower()))
+        and (not app or entry_app.lower() == app.lower())
+    ]
+
+
+async def run_saved_searches(client, entries: list, concurrency: int, timeout: float, store: Optional[ResultStore] = None) -> list:
+    """Run saved searches over one MCP session, at most `concurrency` at a time"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(name, app):
+        row = {'name': name, 'app': app, 'status': 'ok', 'duration_seconds': 0.0, 'rows': 0, 'error': ""}
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await asyncio.wait_for(client.run_saved_search(name), timeout=timeout)
+                if getattr(response, 'isError', False):
+                    row.update(status='error', error=tool_result_text(response)[:300])
+                else:
+                    records = parse_result_records(tool_result_text(response))
+                    row['rows'] = len(records)
+                    if store is not None and records:
+                        store.add("saved_search", records, f"| savedsearch \"{name}\"")
+            except asyncio.TimeoutError:
+                row.update(status='timeout', error=f"no result after {timeout:.0f}s")
+            except Exception as e:
+                row.update(status='error', error=str(e)[:300])
+            row['duration_seconds'] = round(time.perf_counter() - started, 2)
+        icon = "✅" if row['status'] == 'ok' else "❌"
+        print(f"{icon} {name}: {row['status']} in {row['duration_seconds']:.1f}s ({row['rows']} rows)")
+        return row
+
+    return await asyncio.gather(*(run_one(name, app) for name, app in entries))
+
+
+def run_bulk(pattern: Optional[str] = None, app: Optional[str] = None, names: Optional[list] = None,
+             concurrency: Optional[int] = None, timeout: Optional[float] = None, run_dir: Optional[str] = None) -> pd.DataFrame:
+    """Select saved searches by name pattern, app or explicit names, run them and return the summary table.
+
+    Results are kept in run_dir's result store (when given) so they can be refined locally.
+    """
+    concurrency = concurrency or int(os.getenv("SAVED_SEARCH_CONCURRENCY", os.getenv("MAX_CONCURRENT_JOBS", "4")))
+    timeout = timeout or float(os.getenv("SAVED_SEARCH_TIMEOUT", "300"))
+    store = ResultStore(run_dir) if run_dir else None
+
+    async def run():
+        client = MCPClient()
+        try:
+            await client.connect()
+            if names:
+                entries = [(name, app or "") for name in names]
+            else:
+                entries = select_saved_searches(_saved_search_entries(await client.get_saved_searches()), pattern, app)
+            if not entries:
+                print("⚠️ No saved searches match")
+                return []
+            print(f"📑 Running {len(entries)} saved searches, {concurrency} at a time")
+            return await run_saved_searches(client, entries, concurrency, timeout, store)
+        finally:
+            await client.close()
+
+    started = time.time()
+    rows = asyncio.run(run())
+    summary = pd.DataFrame(rows, columns=SUMMARY_COLUMNS)
+    if len(summary):
+        ok = int((summary['status'] == 'ok').sum())
+        print(f"📊 {ok}/{len(summary)} saved searches succeeded in {time.time() - started:.1f}s "
+              f"(sum of durations {summary['duration_seconds'].sum():.1f}s)")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run many Splunk saved searches concurrently and summarize them")
+    parser.add_argument("--pattern", help="glob on the saved search name, e.g. 'Triage - *'")
+    parser.add_argument("--app", help="only saved searches owned by this app")
+    parser.add_argument("--name", action="append", dest="names", help="saved search to run (repeatable)")
+    parser.add_argument("--concurrency", type=int, help="searches running at once (default SAVED_SEARCH_CONCURRENCY)")
+    parser.add_argument("--timeout", type=float, help="per-search timeout in seconds")
+    parser.add_argument("--run-dir", help="keep result rows in this run directory's result store")
+    parser.add_argument("--output", help="write the summary table as CSV")
+    args = parser.parse_args(argv)
+
+    summary = run_bulk(args.pattern, args.app, args.names, args.concurrency, args.timeout, args.run_dir)
+    if len(summary):
+        print(summary.to_string(index=False))
+    if args.output:
+        summary.to_csv(args.output, index=False)
+        print(f"💾 Summary written to {args.output}")
+    return 0 if len(summary) and (summary['status'] == 'ok').all() else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
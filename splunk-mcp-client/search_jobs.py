@@ -0,0 +1,114 @@
+import os
+import asyncio
+import threading
+from typing import Optional
+
+from client import MCPClient, JOB_FINAL_STATES
+
+
+class SearchJobManager:
+    """Runs Splunk search jobs on one background event loop and polls all of them together"""
+
+    def __init__(self, poll_interval: Optional[float] = None, max_concurrent_jobs: Optional[int] = None):
+        self.poll_interval = poll_interval or float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+        self.client = MCPClient(max_concurrent_jobs=max_concurrent_jobs)
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="search-job-manager", daemon=True)
+        self._lock = threading.Lock()
+        self._statuses = {}
+        self._ready = threading.Event()
+        self._stop: Optional[asyncio.Event] = None
+        self._connect_error: Optional[Exception] = None
+
+    def start(self):
+        """Start the loop thread and wait until the MCP session is connected"""
+        self._thread.start()
+        self._ready.wait()
+        if self._connect_error:
+            raise self._connect_error
+        return self
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self._main())
+
+    async def _main(self):
+        # Connect and close inside a single task: the stdio transport's cancel scopes require it
+        self._stop = asyncio.Event()
+        try:
+            await self.client.connect()
+        except Exception as e:
+            self._connect_error = e
+            self._ready.set()
+            return
+        self._ready.set()
+
+        try:
+            while not self._stop.is_set():
+                self._poll()
+                try:
+                    await asyncio.wait_for(self._stop.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._poll()
+        finally:
+            await self.client.close()
+
+    def _poll(self):
+        """Refresh the status snapshot of every job in one pass"""
+        statuses = {sid: self.client.get_job_status(sid) for sid in list(self.client.jobs)}
+        with self._lock:
+            self._statuses = statuses
+
+    def _submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def submit(self, query: str, earliest_time: str = "-24h", latest_time: str = "now", max_count: int = 100, output_format: str = "json") -> str:
+        sid = self._submit(self.client.dispatch_search(query, earliest_time, latest_time, max_count, output_format))
+        self.loop.call_soon_threadsafe(self._poll)
+        print(f"⏳ Dispatched background search {sid}: {query}")
+        return sid
+
+    def snapshot(self) -> list:
+        """Latest known status of every job, newest first"""
+        with self._lock:
+            statuses = list(self._statuses.values())
+        return sorted(statuses, key=lambda status: status['dispatched_at'], reverse=True)
+
+    def status(self, sid: str) -> Optional[dict]:
+        with self._lock:
+            return self._statuses.get(sid)
+
+    def active_count(self) -> int:
+        return sum(1 for status in self.snapshot() if status['state'] not in JOB_FINAL_STATES)
+
+    def results(self, sid: str, offset: int = 0, count: int = 100) -> dict:
+        async def fetch():
+            return self.client.get_job_results(sid, offset, count)
+        return self._submit(fetch())
+
+    def response(self, sid: str):
+        """The raw tool response of a finished job, for callers that digest it themselves"""
+        async def fetch():
+            return self.client.jobs[sid]['response']
+        return self._submit(fetch())
+
+    def wait(self, sid: str, timeout: Optional[float] = None) -> dict:
+        return self._submit(self.client.wait_for_job(sid, timeout))
+
+    def cancel(self, sid: str) -> dict:
+        status = self._submit(self.client.cancel_job(sid))
+        self.loop.call_soon_threadsafe(self._poll)
+        print(f"🛑 Cancelled background search {sid}")
+        return status
+
+    def forget(self, sid: str):
+        async def drop():
+            self.client.forget_job(sid)
+            self._poll()
+        self._submit(drop())
+
+    def shutdown(self):
+        if self._stop is not None:
+            self.loop.call_soon_threadsafe(self._stop.set)
+        self._thread.join(timeout=10)
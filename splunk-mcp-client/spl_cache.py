@@ -0,0 +1,171 @@
+import os
+import re
+import json
+import time
+import zlib
+from typing import Optional
+
+import numpy as np
+
+from intent_engine import INDEX_PATTERN
+from metrics import CACHE_REQUESTS
+
+DEFAULT_CACHE_PATH = os.path.join(".splunk_assistant", "spl_cache.npz")
+TOKEN_PATTERN = re.compile(r"[a-z0-9_]+")
+NUMBER_PATTERN = re.compile(r"^\d+$")
+LIMIT_REQUEST_PATTERN = re.compile(r"\b(?:top|first|last|rare|bottom)\s+(\d+)\b")
+STOP_WORDS = frozenset(['the', 'a', 'an', 'me', 'show', 'find', 'get', 'give', 'please', 'of', 'for', 'and', 'then', 'to', 'all', 'from', 'in'])
+
+
+def tokenize(text: str) -> list:
+    """Unigrams and bigrams with numbers and index names folded, since adapt_spl carries those over"""
+    text = INDEX_PATTERN.sub(" index ", text.lower())
+    words = ['<num>' if NUMBER_PATTERN.match(word) else word
+             for word in TOKEN_PATTERN.findall(text) if word not in STOP_WORDS]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class SPLSimilarityIndex:
+    """Offline nearest-neighbour index from past natural-language requests to SPL that ran without error.
+
+    Requests are hashed into a fixed-size term-frequency space and weighted by TF-IDF at query
+    time, so entries can be added incrementally without refitting a vocabulary.
+    """
+
+    def __init__(self, path: Optional[str] = None, dim: Optional[int] = None, max_entries: Optional[int] = None, threshold: Optional[float] = None):
+        self.path = path or os.getenv("SPL_CACHE_PATH", DEFAULT_CACHE_PATH)
+        self.dim = dim or int(os.getenv("SPL_CACHE_DIM", "2048"))
+        self.max_entries = max_entries or int(os.getenv("SPL_CACHE_MAX_ENTRIES", "1000"))
+        self.threshold = threshold if threshold is not None else float(os.getenv("SPL_CACHE_THRESHOLD", "0.85"))
+        self._reset()
+        self._loaded_mtime = None
+        self.load()
+
+    def _reset(self):
+        self.tf = np.zeros((0, self.dim), dtype=np.float32)
+        self.df = np.zeros(self.dim, dtype=np.int32)
+        self.last_used = np.zeros(0, dtype=np.float64)
+        self.requests = []
+        self.spls = []
+
+    def __len__(self):
+        return len(self.requests)
+
+    def _vectorize(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in tokenize(text):
+            hashed = zlib.crc32(token.encode('utf-8'))
+            # Signed hashing keeps collisions from only ever adding up
+            vector[hashed % self.dim] += 1.0 if (hashed >> 31) & 1 else -1.0
+        nonzero = vector != 0
+        vector[nonzero] = np.sign(vector[nonzero]) * (1.0 + np.log(np.abs(vector[nonzero])))
+        return vector
+
+    def _idf(self) -> np.ndarray:
+        return (np.log((1.0 + len(self)) / (1.0 + self.df)) + 1.0).astype(np.float32)
+
+    def add(self, request: str, spl: str):
+        """Add or refresh a request -> SPL mapping, evicting the least recently used entry when full"""
+        normalized = " ".join(request.lower().split())
+        now = time.time()
+        if normalized in self.requests:
+            row = self.requests.index(normalized)
+            self.spls[row] = spl
+            self.last_used[row] = now
+            return
+
+        vector = self._vectorize(normalized)
+        self.tf = np.vstack([self.tf, vector])
+        self.df += (vector != 0)
+        self.last_used = np.append(self.last_used, now)
+        self.requests.append(normalized)
+        self.spls.append(spl)
+
+        while len(self) > self.max_entries:
+            self._remove(int(np.argmin(self.last_used)))
+
+    def _remove(self, row: int):
+        self.df -= (self.tf[row] != 0)
+        self.tf = np.delete(self.tf, row, axis=0)
+        self.last_used = np.delete(self.last_used, row)
+        del self.requests[row]
+        del self.spls[row]
+
+    def nearest(self, request: str, k: int = 1) -> list:
+        """Top-k stored requests by cosine similarity of their TF-IDF vectors"""
+        if not len(self):
+            return []
+        idf = self._idf()
+        query = self._vectorize(request) * idf
+        query_norm = np.linalg.norm(query)
+        if query_norm == 0:
+            return []
+        matrix = self.tf * idf
+        norms = np.linalg.norm(matrix, axis=1)
+        scores = (matrix @ query) / (np.maximum(norms, 1e-12) * query_norm)
+        best = np.argsort(-scores)[:k]
+        return [{'row': int(row), 'request': self.requests[row], 'spl': self.spls[row], 'score': float(scores[row])} for row in best]
+
+    def lookup(self, request: str) -> Optional[dict]:
+        """Best stored SPL for a request, lightly adapted to it, or None below the similarity threshold"""
+        matches = self.nearest(request)
+        if not matches or matches[0]['score'] < self.threshold:
+            CACHE_REQUESTS.inc(cache="spl", result="miss")
+            return None
+        CACHE_REQUESTS.inc(cache="spl", result="hit")
+        match = matches[0]
+        self.last_used[match['row']] = time.time()
+        match['spl'] = adapt_spl(match['spl'], match['request'], request)
+        return match
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        mtime = os.path.getmtime(self.path)
+        if mtime == self._loaded_mtime:
+            return
+        with np.load(self.path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            if meta['dim'] != self.dim:
+                print(f"⚠️ SPL cache at {self.path} uses dim={meta['dim']}, ignoring it")
+                return
+            self.tf = data['tf'].astype(np.float32)
+            self.df = data['df'].astype(np.int32)
+            self.last_used = data['last_used'].astype(np.float64)
+        self.requests = meta['requests']
+        self.spls = meta['spls']
+        self._loaded_mtime = mtime
+
+    def save(self):
+        cache_dir = os.path.dirname(self.path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        meta = json.dumps({'dim': self.dim, 'requests': self.requests, 'spls': self.spls})
+        tmp_path = f"{self.path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(tmp_path, tf=self.tf, df=self.df, last_used=self.last_used, meta=np.array(meta))
+        os.replace(tmp_path, self.path)
+        self._loaded_mtime = os.path.getmtime(self.path)
+
+    def record(self, request: str, spl: str):
+        """Merge the latest on-disk state, add one proven mapping and persist it"""
+        self.load()
+        self.add(request, spl)
+        self.save()
+
+
+def adapt_spl(spl: str, cached_request: str, request: str) -> str:
+    """Carry the new request's index and result limit over to SPL proven on a similar request"""
+    index_match = INDEX_PATTERN.search(request.lower())
+    if index_match:
+        new_index = index_match.group('a') or index_match.group('b') or index_match.group('c')
+        spl = re.sub(r"\bindex=\S+", f"index={new_index}", spl, count=1)
+
+    old_limit = LIMIT_REQUEST_PATTERN.search(cached_request.lower())
+    new_limit = LIMIT_REQUEST_PATTERN.search(request.lower())
+    if old_limit and new_limit and old_limit.group(1) != new_limit.group(1):
+        spl = re.sub(
+            rf"\b(top|rare|head)(\s+limit=|\s+){old_limit.group(1)}\b",
+            rf"\g<1>\g<2>{new_limit.group(1)}",
+            spl,
+        )
+    return spl
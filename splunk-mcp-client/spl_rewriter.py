@@ -0,0 +1,308 @@
+import os
+import re
+import time
+from typing import Optional
+
+from incremental_search import RELATIVE_TIME_PATTERN, UNIT_SECONDS
+
+DEFAULT_INDEX_EVENTS = 1_000_000
+ALL_TIME_SECONDS = 365 * 86400
+TERM_SELECTIVITY = 0.3
+MIN_SELECTIVITY = 0.01
+TSTATS_FACTOR = 0.01
+FULL_EXTRACTION_FACTOR = 1.25
+
+INDEXED_FIELDS = frozenset(['index', 'sourcetype', 'host', 'source'])
+REPORTING_COMMANDS = frozenset(['stats', 'top', 'rare', 'timechart', 'chart'])
+ALL_TIME_VALUES = frozenset(['', '0', 'all', 'alltime', 'all time'])
+
+TERM_PATTERN = re.compile(r'\(|\)|"[^"]*"|\S+')
+STATS_COUNT_PATTERN = re.compile(r"^stats\s+(?P<agg>count(?:\s+as\s+\w+)?)(?:\s+by\s+(?P<by>[\w\s,]+))?$", re.IGNORECASE)
+OVER_PATTERN = re.compile(r"\bover\s+(?P<field>[\w.]+)", re.IGNORECASE)
+BY_PATTERN = re.compile(r"\bby\s+(?P<fields>[\w.,\s]+?)(?:\s+\w+=|$)", re.IGNORECASE)
+AGG_FIELD_PATTERN = re.compile(
+    r"\b(?:count|sum|sumsq|avg|mean|median|mode|min|max|range|stdevp?|varp?|dc|distinct_count|estdc|values|list"
+    r"|first|last|earliest|latest|p\d+|perc\d+|exactperc\d+|upperperc\d+)\((?P<field>[\w.]+)\)",
+    re.IGNORECASE,
+)
+CALL_PATTERN = re.compile(r"\b\w+\s*\(")
+TOP_FIELDS_PATTERN = re.compile(r"^(?:top|rare)\s+(?:\w+=\S+\s+)*(?P<fields>[\w.,\s]+?)(?:\s+by\s+(?P<by>[\w.,\s]+))?$", re.IGNORECASE)
+
+
+def split_pipeline(query: str) -> list:
+    """Split SPL on pipes that are not inside quotes"""
+    segments, current, quote = [], [], None
+    for char in query:
+        if quote:
+            current.append(char)
+            if char == quote:
+                quote = None
+        elif char in "\"'":
+            quote = char
+            current.append(char)
+        elif char == '|':
+            segments.append("".join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    segments.append("".join(current).strip())
+    return segments
+
+
+def join_pipeline(segments: list) -> str:
+    base, commands = segments[0], [segment for segment in segments[1:] if segment]
+    return " | ".join(([base] if base else [""]) + commands).strip()
+
+
+def _command_name(segment: str) -> str:
+    return segment.split()[0].lower() if segment.split() else ""
+
+
+def _base_terms(base: str) -> list:
+    return TERM_PATTERN.findall(base)
+
+
+def _base_indexes(base: str) -> list:
+    return [term.split('=', 1)[1].strip('"') for term in _base_terms(base) if term.lower().startswith('index=')]
+
+
+def _window_seconds(earliest_time: str, latest_time: str) -> float:
+    match = RELATIVE_TIME_PATTERN.match((earliest_time or "").strip().lower())
+    if match:
+        return int(match.group(1)) * UNIT_SECONDS[match.group(2)[0]]
+    if (earliest_time or "").strip().lower() in ALL_TIME_VALUES:
+        return ALL_TIME_SECONDS
+    snapped = re.match(r"^-(\d+)([smhdw])@", (earliest_time or "").strip().lower())
+    if snapped:
+        return int(snapped.group(1)) * UNIT_SECONDS[snapped.group(2)]
+    return 86400
+
+
+def _referenced_fields(command: str) -> list:
+    """Fields a reporting command reads"""
+    fields = [match.group('field') for match in AGG_FIELD_PATTERN.finditer(command)]
+    top = TOP_FIELDS_PATTERN.match(command) if _command_name(command) in ('top', 'rare') else None
+    if top:
+        fields += re.split(r"[\s,]+", top.group('fields')) + re.split(r"[\s,]+", top.group('by') or "")
+    else:
+        by = BY_PATTERN.search(command)
+        if by:
+            fields += re.split(r"[\s,]+", by.group('fields'))
+        over = OVER_PATTERN.search(command)
+        if over:
+            fields.append(over.group('field'))
+    if _command_name(command) == 'timechart':
+        fields.append('_time')
+    return list(dict.fromkeys(field for field in fields if field))
+
+
+def estimate_cost(query: str, earliest_time: str = "-24h", latest_time: str = "now", catalog: Optional[dict] = None) -> float:
+    """Rough events-processed estimate: index volume over the window, times term selectivity and command overhead"""
+    catalog_indexes = (catalog or {}).get('indexes') or {}
+    catalog_window = _window_seconds((catalog or {}).get('time_range', "-24h"), "now")
+    segments = split_pipeline(query)
+    base, commands = segments[0], segments[1:]
+
+    if not base and commands and _command_name(commands[0]) == 'tstats':
+        where = commands[0].split(' where ', 1)[1] if ' where ' in commands[0] else ""
+        base, commands, tstats = where.split(' by ')[0], commands[1:], True
+    else:
+        tstats = False
+
+    def index_volume(name):
+        if name == '*':
+            visible = [entry['events'] for index, entry in catalog_indexes.items() if not index.startswith('_')]
+            return sum(visible) if visible else DEFAULT_INDEX_EVENTS * 10
+        entry = catalog_indexes.get(name)
+        return entry['events'] if entry else DEFAULT_INDEX_EVENTS
+
+    indexes = _base_indexes(base) or ['*']
+    volume = sum(index_volume(name) for name in indexes)
+    volume *= _window_seconds(earliest_time, latest_time) / catalog_window
+
+    selectivity = 1.0
+    for term in _base_terms(base):
+        lowered = term.lower()
+        if lowered.startswith('index=') or term in ('(', ')') or lowered in ('or', 'and', 'not'):
+            continue
+        if lowered.startswith('sourcetype='):
+            sourcetype = term.split('=', 1)[1].strip('"')
+            index_events = sum(index_volume(name) for name in indexes) or 1
+            sourcetype_events = sum(
+                entry['sourcetypes'].get(sourcetype, {}).get('events', 0) for entry in catalog_indexes.values()
+            )
+            selectivity *= min(sourcetype_events / index_events, 1.0) if sourcetype_events else TERM_SELECTIVITY
+        else:
+            selectivity *= TERM_SELECTIVITY
+    cost = volume * max(selectivity, MIN_SELECTIVITY)
+
+    if tstats:
+        return round(cost * TSTATS_FACTOR, 1)
+    names = [_command_name(command) for command in commands]
+    if any(name in REPORTING_COMMANDS for name in names) and 'fields' not in names:
+        cost *= FULL_EXTRACTION_FACTOR
+    return round(cost, 1)
+
+
+def _push_search_terms(segments: list) -> bool:
+    """'index=x | search error' -> 'index=x error'"""
+    changed = False
+    while len(segments) > 1 and segments[0] and _command_name(segments[1]) == 'search':
+        terms = segments[1][len('search'):].strip()
+        if re.search(r"\bOR\b", terms):
+            terms = f"({terms})"
+        segments[0] = f"{segments[0]} {terms}".strip()
+        del segments[1]
+        changed = True
+    return changed
+
+
+def _narrow_index(segments: list, catalog: Optional[dict]) -> bool:
+    """Replace index=* with the catalogued indexes that hold the query's sourcetypes.
+
+    Fields aren't used: the catalog only lists each sourcetype's top fields, and a field may
+    come from eval or rex rather than the events.
+    """
+    catalog_indexes = {name: entry for name, entry in ((catalog or {}).get('indexes') or {}).items() if not name.startswith('_')}
+    if not catalog_indexes or not segments[0]:
+        return False
+    terms = _base_terms(segments[0])
+    if 'index=*' not in [term.lower() for term in terms] and _base_indexes(segments[0]):
+        return False
+
+    sourcetypes = [term.split('=', 1)[1].strip('"') for term in terms if term.lower().startswith('sourcetype=')]
+    if sourcetypes:
+        candidates = [name for name, entry in catalog_indexes.items() if any(st in entry['sourcetypes'] for st in sourcetypes)]
+    else:
+        candidates = list(catalog_indexes) if len(catalog_indexes) == 1 else []
+
+    if not candidates or len(candidates) == len(catalog_indexes) > 1:
+        return False
+    clause = f"index={candidates[0]}" if len(candidates) == 1 else "(" + " OR ".join(f"index={name}" for name in sorted(candidates)) + ")"
+    kept = [term for term in terms if term.lower() != 'index=*']
+    segments[0] = " ".join([clause] + kept)
+    return True
+
+
+def _to_tstats(segments: list) -> bool:
+    """'index=x sourcetype=y | stats count by host' -> '| tstats count where index=x sourcetype=y by host'"""
+    if len(segments) < 2 or not segments[0]:
+        return False
+    terms = _base_terms(segments[0])
+    if any(term.split('=', 1)[0].lower() not in INDEXED_FIELDS or '=' not in term for term in terms):
+        return False  # free-text terms need the raw events
+    match = STATS_COUNT_PATTERN.match(segments[1])
+    if not match:
+        return False
+    by = [field for field in re.split(r"[\s,]+", match.group('by') or "") if field]
+    if any(field not in INDEXED_FIELDS | {'_time'} for field in by):
+        return False
+    by_clause = f" by {', '.join(by)}" if by else ""
+    segments[1] = f"tstats {match.group('agg')} where {segments[0]}{by_clause}"
+    segments[0] = ""
+    return True
+
+
+def _add_projection(segments: list) -> bool:
+    """Insert '| fields ...' right before the first reporting command so it only carries the fields it reads.
+
+    Earlier commands (dedup, sort, eval, ...) still see every field; the report reads nothing else.
+    """
+    if not segments[0]:
+        return False
+    for position, command in enumerate(segments[1:], start=1):
+        name = _command_name(command)
+        if name in ('fields', 'table'):
+            return False
+        if name in REPORTING_COMMANDS:
+            # Any function we can't read a single field from (eval(), unknown ones) or a wildcard may need other fields
+            if '*' in command or any(not AGG_FIELD_PATTERN.match(command, call.start()) for call in CALL_PATTERN.finditer(command)):
+                return False
+            fields = _referenced_fields(command)
+            if not fields:
+                return False
+            segments.insert(position, "fields " + " ".join(fields))
+            return True
+    return False
+
+
+def rewrite_spl(query: str, earliest_time: str = "-24h", latest_time: str = "now", catalog: Optional[dict] = None) -> dict:
+    """Apply cost-reducing rewrites and report the estimated saving.
+
+    The query rewrites keep results the same as long as the catalog is current (index narrowing
+    trusts it). A missing earliest time is bounded to SPL_REWRITE_DEFAULT_EARLIEST; an explicit
+    all-time range is kept and only reported in 'warnings'.
+    """
+    segments = split_pipeline(query.strip())
+    original_earliest = earliest_time
+    rules = []
+    warnings = []
+    if segments[0]:
+        if _push_search_terms(segments):
+            rules.append('push_search')
+        if _narrow_index(segments, catalog):
+            rules.append('narrow_index')
+        if _to_tstats(segments):
+            rules.append('tstats')
+        elif _add_projection(segments):
+            rules.append('fields_projection')
+
+    if not (earliest_time or "").strip():
+        earliest_time = os.getenv("SPL_REWRITE_DEFAULT_EARLIEST", "-24h")
+        rules.append('time_bound')
+    elif earliest_time.strip().lower() in ALL_TIME_VALUES:
+        warnings.append(f"searching all time (earliest={earliest_time}), which scans every event in the index")
+    if not (latest_time or "").strip():
+        latest_time = "now"
+
+    rewritten = join_pipeline(segments) if rules else query
+    return {
+        'query': rewritten,
+        'earliest_time': earliest_time,
+        'latest_time': latest_time,
+        'rules': rules,
+        'warnings': warnings,
+        'cost_before': estimate_cost(query, original_earliest, latest_time, catalog),
+        'cost_after': estimate_cost(rewritten, earliest_time, latest_time, catalog),
+    }
+
+
+BENCHMARK_QUERIES = [
+    ("index=* | head 10", "-24h"),
+    ("index=main | search error OR fail | stats count by host", "-24h"),
+    ("index=botsv3 sourcetype=stream:http | stats count by host", "-7d"),
+    ("index=* sourcetype=stream:http | top limit=10 http_user_agent", "-24h"),
+    ("index=* src_ip=10.0.0.1 | stats sum(bytes) as bytes by dest_ip", "0"),
+    ("index=main error | eval x=1 | stats count by x", "-24h"),
+    ("index=web | timechart span=1h count by status", "-24h"),
+]
+BENCHMARK_CATALOG = {
+    'time_range': "-24h",
+    'indexes': {
+        'main': {'events': 2_000_000, 'sourcetypes': {'syslog': {'events': 2_000_000, 'fields': ['process', 'pid']}}},
+        'botsv3': {'events': 5_000_000, 'sourcetypes': {
+            'stream:http': {'events': 3_000_000, 'fields': ['src_ip', 'dest_ip', 'http_user_agent', 'status', 'bytes']},
+            'stream:dns': {'events': 2_000_000, 'fields': ['query', 'src_ip']},
+        }},
+        'web': {'events': 1_000_000, 'sourcetypes': {'access_combined': {'events': 1_000_000, 'fields': ['status', 'uri', 'clientip']}}},
+    },
+}
+
+
+if __name__ == "__main__":
+    # Offline benchmark: rewrite throughput and estimated cost reduction against a sample catalog
+    import sys
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    for query, earliest in BENCHMARK_QUERIES:
+        result = rewrite_spl(query, earliest, "now", BENCHMARK_CATALOG)
+        ratio = result['cost_before'] / result['cost_after'] if result['cost_after'] else float('inf')
+        print(f"{result['cost_before']:>14,.0f} -> {result['cost_after']:>12,.0f} ({ratio:6.1f}x) {','.join(result['rules']) or '-'}")
+        print(f"    {query}\n    {result['query']}  [{result['earliest_time']}]")
+
+    start = time.perf_counter()
+    for i in range(iterations):
+        query, earliest = BENCHMARK_QUERIES[i % len(BENCHMARK_QUERIES)]
+        rewrite_spl(query, earliest, "now", BENCHMARK_CATALOG)
+    elapsed = time.perf_counter() - start
+    print(f"\n{iterations} rewrites in {elapsed:.3f}s ({iterations / elapsed:,.0f}/s, {elapsed / iterations * 1e6:.1f}µs each)")
@@ -0,0 +1,201 @@
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import threading
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from client import MCPClient, parse_result_records, tool_result_text
+from intent_engine import FIELD_ALIASES, INDEX_PATTERN
+
+load_dotenv()
+
+DEFAULT_CATALOG_PATH = os.path.join(".splunk_assistant", "catalog.json")
+VOLUME_QUERY = "| tstats count where index=* by index, sourcetype"
+FIELDS_QUERY = "index={index} sourcetype={sourcetype} | head {sample} | fieldsummary | sort - count | head {top} | fields field count distinct_count"
+INTERNAL_INDEX_PATTERN = re.compile(r"^_")
+WORD_PATTERN = re.compile(r"[a-z0-9_]+")
+# Fields every event has; listing them in prompts tells the agent nothing
+DEFAULT_FIELDS = frozenset(['_time', '_raw', 'host', 'source', 'sourcetype', 'index', 'linecount', 'punct', 'splunk_server', 'timestamp'])
+
+
+def _index_names(payload) -> list:
+    """Index names from a get_indexes result, whatever shape the server returned"""
+    records = parse_result_records(payload)
+    names = [str(row.get('name') or row.get('title') or row.get('index') or "") for row in records]
+    if not any(names):
+        names = re.findall(r"['\"]?(?:name|title)['\"]?\s*[:=]\s*['\"]?([\w-]+)", tool_result_text(payload))
+    return sorted({name for name in names if name})
+
+
+class SplunkCatalog:
+    """Indexes, sourcetypes, event volume and top fields per sourcetype, built in the background.
+
+    The catalog is persisted as JSON so the short-lived crewFlow.py processes can read it
+    without touching Splunk; the long-running UI process keeps it fresh.
+    """
+
+    def __init__(self, path: Optional[str] = None, refresh_seconds: Optional[float] = None, max_sourcetypes: Optional[int] = None):
+        self.path = path or os.getenv("CATALOG_PATH", DEFAULT_CATALOG_PATH)
+        self.refresh_seconds = refresh_seconds or float(os.getenv("CATALOG_REFRESH_SECONDS", "3600"))
+        self.max_sourcetypes = max_sourcetypes or int(os.getenv("CATALOG_MAX_SOURCETYPES", "25"))
+        self.time_range = os.getenv("CATALOG_TIME_RANGE", "-24h")
+        self.data = {}
+        self._lock = threading.Lock()
+        self._refresher = None
+        self._stop = threading.Event()
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        with self._lock:
+            self.data = data
+
+    def save(self):
+        catalog_dir = os.path.dirname(self.path)
+        if catalog_dir:
+            os.makedirs(catalog_dir, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with self._lock:
+            with open(tmp_path, 'w') as f:
+                json.dump(self.data, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def is_stale(self) -> bool:
+        return time.time() - self.data.get('built_at', 0) > self.refresh_seconds
+
+    async def _build(self, client) -> dict:
+        indexes = _index_names(await client.get_indexes())
+
+        volume_rows = parse_result_records(tool_result_text(
+            await client.search_export(VOLUME_QUERY, self.time_range, "now", 10000, "json")
+        ))
+        catalog_indexes = {name: {'events': 0, 'sourcetypes': {}} for name in indexes}
+        for row in volume_rows:
+            index, sourcetype = row.get('index'), row.get('sourcetype')
+            if not index or not sourcetype:
+                continue
+            count = int(float(row.get('count') or 0))
+            entry = catalog_indexes.setdefault(index, {'events': 0, 'sourcetypes': {}})
+            entry['events'] += count
+            entry['sourcetypes'][sourcetype] = {'events': count, 'fields': []}
+
+        # Field summaries cost one small search each, so only sample the busiest sourcetypes
+        pairs = sorted(
+            ((index, sourcetype, info['events'])
+             for index, entry in catalog_indexes.items() if not INTERNAL_INDEX_PATTERN.match(index)
+             for sourcetype, info in entry['sourcetypes'].items()),
+            key=lambda pair: -pair[2],
+        )[:self.max_sourcetypes]
+        semaphore = asyncio.Semaphore(int(os.getenv("CATALOG_CONCURRENCY", "4")))
+
+        async def summarize(index, sourcetype):
+            query = FIELDS_QUERY.format(index=index, sourcetype=sourcetype, sample=500, top=15)
+            async with semaphore:
+                try:
+                    response = await client.search_export(query, self.time_range, "now", 15, "json")
+                except Exception as e:
+                    print(f"⚠️ Catalog field summary failed for {index}/{sourcetype}: {e}")
+                    return
+            fields = [row['field'] for row in parse_result_records(tool_result_text(response))
+                      if row.get('field') and row['field'] not in DEFAULT_FIELDS]
+            catalog_indexes[index]['sourcetypes'][sourcetype]['fields'] = fields
+
+        await asyncio.gather(*(summarize(index, sourcetype) for index, sourcetype, _ in pairs))
+        return {'built_at': time.time(), 'time_range': self.time_range, 'indexes': catalog_indexes}
+
+    def refresh(self):
+        """Rebuild the catalog from Splunk over one MCP session and persist it"""
+        async def run():
+            client = MCPClient()
+            try:
+                await client.connect()
+                return await self._build(client)
+            finally:
+                await client.close()
+
+        started = time.time()
+        data = asyncio.run(run())
+        with self._lock:
+            self.data = data
+        self.save()
+        sourcetypes = sum(len(entry['sourcetypes']) for entry in data['indexes'].values())
+        print(f"📚 Catalog refreshed: {len(data['indexes'])} indexes, {sourcetypes} sourcetypes in {time.time() - started:.1f}s")
+        return data
+
+    def start_refresher(self):
+        """Refresh in a daemon thread now if stale and then every refresh_seconds"""
+        if self._refresher and self._refresher.is_alive():
+            return self
+
+        def loop():
+            while not self._stop.is_set():
+                if self.is_stale():
+                    try:
+                        self.refresh()
+                    except Exception as e:
+                        print(f"⚠️ Catalog refresh failed: {e}")
+                self._stop.wait(min(self.refresh_seconds, 300))
+
+        self._refresher = threading.Thread(target=loop, name="splunk-catalog", daemon=True)
+        self._refresher.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def slice_for(self, request: str, max_indexes: int = 3, max_sourcetypes: int = 4) -> str:
+        """Prompt text describing only the catalog entries relevant to a request"""
+        indexes = self.data.get('indexes') or {}
+        if not indexes:
+            return ""
+        request_lower = request.lower()
+        words = set(WORD_PATTERN.findall(request_lower))
+        # Spoken field names count as matches for the Splunk fields they map to
+        words |= {field for alias, field in FIELD_ALIASES.items() if alias in request_lower}
+
+        def relevance(name, entry):
+            score = 3 * (name.lower() in words)
+            for sourcetype, info in entry['sourcetypes'].items():
+                score += 2 * bool(words & set(WORD_PATTERN.findall(sourcetype.lower())))
+                score += len(words & {field.lower() for field in info['fields']})
+            return score
+
+        named = INDEX_PATTERN.search(request_lower)
+        named_index = named and (named.group('a') or named.group('b') or named.group('c'))
+        if named_index in indexes:
+            chosen = [named_index]
+        else:
+            ranked = sorted(
+                ((relevance(name, entry), entry['events'], name) for name, entry in indexes.items()
+                 if not INTERNAL_INDEX_PATTERN.match(name)),
+                reverse=True,
+            )
+            chosen = [name for _, _, name in ranked[:max_indexes]]
+
+        lines = [f"SPLUNK DATA CATALOG (event counts over {self.data.get('time_range', '-24h')}):"]
+        for name in chosen:
+            entry = indexes[name]
+            lines.append(f"- index={name} ({entry['events']} events)")
+            sourcetypes = sorted(entry['sourcetypes'].items(), key=lambda item: -item[1]['events'])[:max_sourcetypes]
+            for sourcetype, info in sourcetypes:
+                fields = ", ".join(info['fields'][:10]) or "not sampled"
+                lines.append(f"    sourcetype={sourcetype} ({info['events']} events) fields: {fields}")
+        lines.append("Use these index, sourcetype and field names instead of index=* or exploratory searches.")
+        return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # Build the catalog once, e.g. from cron: python splunk_catalog.py
+    catalog = SplunkCatalog()
+    catalog.refresh()
+    if len(sys.argv) > 1:
+        print(catalog.slice_for(" ".join(sys.argv[1:])))
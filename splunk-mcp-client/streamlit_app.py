@@ -1,339 +1,99 @@
 import streamlit as st 
-import subprocess
 import os
 from dotenv import load_dotenv
-from crewai import LLM
 import json
 import re
 import time
 import html  # For escaping HTML characters in stdout
+import uuid
+from workflow_store import WorkflowStore, extract_generated_spl
+from workflow_runner import WORKFLOW_TIMEOUT, execute_workflow, new_run_dir
+from cancellation import request_cancel
+from workflow_queue import FINAL_STATES, AdmissionError, open_workflow_queue
+from client import CompactResultSet
+from result_channel import find_result_artifacts, load_full_result, find_result_frames, load_result_frame, find_previews, result_for_preview
+from search_jobs import SearchJobManager
+from result_store import ResultStore, LocalQueryError
+from splunk_catalog import SplunkCatalog
+from metrics import QUEUE_DEPTH, start_metrics_exporter
+from prefetch import Prefetcher
+from profiling import profile_run, load_profiles
+from planner import determine_task_sequence, extract_time_range, resolve_time_range
+from plan_optimizer import estimate_seconds, optimize_if_enabled
+from saved_search_runner import run_bulk
 load_dotenv()
 
-gemini_llm = LLM(
-    model="gemini/gemini-2.0-flash",
-    provider="google",
-    api_key=os.getenv("GOOGLE_API_KEY"),
-    temperature=0.3
-)
-
-def determine_task_sequence(user_input):
-    """Determine if user wants multiple tasks and what they are"""
-    routing_prompt = f"""
-You are a strict task planner for a Splunk assistant. Break the user's request into **atomic Splunk tasks**.
-
-Available tools:
-- validate_spl: Validate an SPL query for safety
-- search_oneshot: Run an SPL query  
-- get_indexes: List available indexes
-- run_saved_search: Run existing saved search
-- search_export: Export search results
-- get_saved_searches: List all saved searches
-- get_config: Show Splunk configuration
-
-Return ONLY a valid JSON array. Each task must have:
-- "task": exact tool name from list above
-- "description": what this step does
-- "depends_on": task index it depends on (or null)
+# Updated execute_task_sequence function with better success detection
+def execute_task_sequence(task_sequence, user_request, manual_earliest, manual_latest, manual_index, max_count, output_format, run_dir=None, on_poll=None, previous_run_dir=None, profile=False, extracted_time_range=None, progressive=False):
+    """Resolve the time range and run the workflow in a crewFlow.py subprocess"""
+    earliest, latest = resolve_time_range(user_request, manual_earliest, manual_latest, extracted_time_range)
+    return execute_workflow(
+        task_sequence, user_request, earliest, latest, manual_index, max_count, output_format,
+        run_dir=run_dir, on_poll=on_poll, previous_run_dir=previous_run_dir, profile=profile, progressive=progressive
+    )
 
-Example for "Search failed logins and then show saved searches":
-[
-  {{"task": "search_oneshot", "description": "Search for failed logins", "depends_on": null}},
-  {{"task": "get_saved_searches", "description": "Show all saved searches", "depends_on": null}}
-]
+def cancel_active_workflow():
+    """Stop the running workflow: its crewFlow.py process tree, or its job on the shared queue"""
+    active = st.session_state.get('active_run')
+    if not active:
+        return
+    request_cancel(active['run_dir'])
+    if active.get('queue_job'):
+        get_workflow_queue().cancel(active['queue_job'])
+    st.session_state.workflow_cancelled = True
 
-User request: "{user_input}"
+QUEUE_PRIORITIES = {"Low": -1, "Normal": 0, "High": 1}
 
-Return only the JSON array, no other text:"""
+@st.cache_resource
+def get_workflow_queue():
+    return open_workflow_queue()
 
+def queue_task_sequence(task_sequence, user_request, manual_earliest, manual_latest, manual_index, max_count, output_format, priority, run_dir=None, previous_run_dir=None, profile=False, extracted_time_range=None, progressive=False, on_poll=None):
+    """Submit the workflow to the shared queue and wait for a worker to finish it"""
+    earliest, latest = resolve_time_range(user_request, manual_earliest, manual_latest, extracted_time_range)
+    payload = {
+        'task_sequence': task_sequence,
+        'user_request': user_request,
+        'earliest': earliest,
+        'latest': latest,
+        'index': manual_index,
+        'max_count': max_count,
+        'output_format': output_format,
+        'run_dir': run_dir,
+        'previous_run_dir': previous_run_dir,
+        'profile': profile,
+        'progressive': progressive
+    }
+    queue = get_workflow_queue()
     try:
-        result = gemini_llm.call(routing_prompt).strip()
-        print("🧠 GEMINI RAW PLAN:")
-        print(result)
-        
-        # Clean up the response - remove markdown formatting if present
-        if '```json' in result:
-            result = result.split('```json')[1].split('```')[0].strip()
-        elif '```' in result:
-            result = result.split('```')[1].strip()
-        
-        # Find JSON array in the response
-        import re
-        json_match = re.search(r'\[.*\]', result, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(0)
-            parsed_tasks = json.loads(json_str)
-            
-            # Validate the parsed tasks
-            valid_tools = ['validate_spl', 'search_oneshot', 'get_indexes', 'run_saved_search', 
-                          'search_export', 'get_saved_searches', 'get_config']
-            
-            validated_tasks = []
-            for task in parsed_tasks:
-                if isinstance(task, dict) and 'task' in task and 'description' in task:
-                    if task['task'] in valid_tools:
-                        validated_tasks.append({
-                            'task': task['task'],
-                            'description': task['description'],
-                            'depends_on': task.get('depends_on')
-                        })
-            
-            if validated_tasks:
-                print(f"✅ Parsed {len(validated_tasks)} valid tasks")
-                return validated_tasks
-            else:
-                print("❌ No valid tasks found in response")
-        else:
-            print("❌ No JSON array found in response")
-            
-    except json.JSONDecodeError as e:
-        print(f"❌ JSON parsing error: {e}")
-        print(f"Raw response: {result}")
-    except Exception as e:
-        print(f"❌ Error in task planning: {e}")
+        job_id = queue.submit(st.session_state.user_id, payload, QUEUE_PRIORITIES[priority])
+    except AdmissionError as e:
+        st.error(f"🚦 {e}")
+        return [{'success': False, 'stdout': '', 'stderr': str(e), 'task': 'rejected'}]
+    if st.session_state.get('active_run'):
+        st.session_state.active_run['queue_job'] = job_id
     
-    # Fallback: Create a reasonable task sequence based on common patterns
-    print("🔄 Using fallback task planning...")
-    return create_fallback_task_sequence(user_input)
-
-def create_fallback_task_sequence(user_input):
-    """Create a reasonable task sequence when AI planning fails"""
-    user_lower = user_input.lower()
-    tasks = []
+    status = st.empty()
+    def show_progress(job):
+        if job['state'] == 'queued':
+            status.info(f"⏳ Workflow {job_id} queued, {queue.position(job_id)} ahead of it")
+        elif job['state'] == 'running':
+            status.info(f"🏃 Workflow {job_id} running on worker {job['worker_id']}")
+            if on_poll:
+                on_poll(time.time() - job['started_at'] if job.get('started_at') else 0.0)
     
-    # Check if it's a search request
-    if any(keyword in user_lower for keyword in ['find', 'search', 'show', 'get', 'top', 'list']):
-        if 'index' in user_lower and not 'saved search' in user_lower:
-            # It's a data search request
-            tasks.append({
-                "task": "search_oneshot",
-                "description": "Execute the search query",
-                "depends_on": None
-            })
-            
-            # Check if they want to save it
-            if any(save_word in user_lower for save_word in ['save', 'store', 'keep']):
-                tasks.append({
-                    "task": "save_search", 
-                    "description": "Save the search query",
-                    "depends_on": 0
-                })
-        
-        # Check if they want to see saved searches
-        if 'saved search' in user_lower and ('show' in user_lower or 'list' in user_lower or 'display' in user_lower):
-            tasks.append({
-                "task": "get_saved_searches",
-                "description": "Show all saved searches", 
-                "depends_on": None
-            })
-        
-        # Check if they want to see indexes
-        if 'index' in user_lower and ('show' in user_lower or 'list' in user_lower):
-            tasks.append({
-                "task": "get_indexes",
-                "description": "Show available indexes",
-                "depends_on": None
-            })
-    
-    # If no tasks were created, default to a search
-    if not tasks:
-        tasks = [{
-            "task": "search_oneshot",
-            "description": "Execute search based on user request",
-            "depends_on": None
-        }]
-    
-    print(f"🔧 Fallback created {len(tasks)} tasks: {[t['task'] for t in tasks]}")
-    return tasks
-
-
-
-def extract_time_range(user_input):
-    """Extract time range from natural language"""
-    routing_prompt = f"""
-Extract the time range from this natural language request and convert it to Splunk time format.
-Return in format: earliest_time,latest_time
-
-Examples:
-- "last 24 hours" -> "-24h,now"
-- "past week" -> "-1w,now" 
-- "last hour" -> "-1h,now"
-- "today" -> "@d,now"
-- "yesterday" -> "-1d@d,-0d@d"
-- "last 30 minutes" -> "-30m,now"
-- "all time" -> "0,now"
-
-If no time range is specified, return "-24h,now"
-
-User request: {user_input}
-"""
-    result = gemini_llm.call(routing_prompt).strip()
-    try:
-        earliest, latest = result.split(',')
-        return earliest.strip(), latest.strip()
-    except:
-        return "-24h", "now"
-
-def detect_task_success(step_content, return_code):
-    """Improved success detection logic for Splunk tasks"""
-    
-    # If the process failed, it's definitely a failure
-    if return_code != 0:
-        return False
-    
-    step_lower = step_content.lower()
-    
-    # Clear failure indicators
-    failure_indicators = [
-        'error occurred',
-        'exception',
-        'failed to',
-        'could not',
-        'unable to',
-        'connection failed',
-        'authentication failed',
-        'query failed',
-        'search failed',
-        'timeout',
-        'permission denied'
-    ]
-    
-    # Check for actual failure patterns (not just the word "failed")
-    for indicator in failure_indicators:
-        if indicator in step_lower:
-            return False
-    
-    # Success indicators
-    success_indicators = [
-        'generated_spl:',
-        'found:',
-        'query:',
-        'search results',
-        'event_count',
-        'content":',
-        '"format":'
-    ]
-    
-    # Check for success patterns
-    for indicator in success_indicators:
-        if indicator in step_lower:
-            return True
-    
-    # If we have JSON-like structure, it's probably successful
-    if ('{' in step_content and '}' in step_content and 
-        ('query' in step_lower or 'results' in step_lower or 'content' in step_lower)):
-        return True
-    
-    # If we have a table-like structure (markdown table), it's successful
-    if '|' in step_content and '---' in step_content:
-        return True
-    
-    # Default: if no clear failure indicators and we have substantial content, consider it success
-    return len(step_content.strip()) > 50
-
-
-# Updated execute_task_sequence function with better success detection
-def execute_task_sequence(task_sequence, user_request, manual_earliest, manual_latest, manual_index, max_count, output_format):
-    """Execute entire sequence with better error handling and logging"""
-    
-    print(f"🚀 Starting execution of {len(task_sequence)} tasks")
-    print(f"📋 Task sequence: {[task['task'] for task in task_sequence]}")
-    
-    # Set up environment for the entire sequence
-    env = os.environ.copy()
-    env["USER_REQUEST"] = user_request
-    env["TASK_SEQUENCE"] = json.dumps(task_sequence)
-    env["EARLIEST"] = manual_earliest if manual_earliest else extract_time_range(user_request)[0]
-    env["LATEST"] = manual_latest if manual_latest else extract_time_range(user_request)[1]
-    env["MAX_COUNT"] = str(max_count)
-    env["OUTPUT_FORMAT"] = output_format
-    
-    if manual_index:
-        env["FORCE_INDEX"] = manual_index
-    
-    print(f"🔧 Environment setup:")
-    print(f"   - Time range: {env['EARLIEST']} to {env['LATEST']}")
-    print(f"   - Max count: {env['MAX_COUNT']}")
-    print(f"   - Output format: {env['OUTPUT_FORMAT']}")
-    if manual_index:
-        print(f"   - Forced index: {manual_index}")
-    
-    try:
-        # Execute the entire workflow
-        print("🏃 Running crewFlow.py...")
-        result = subprocess.run(
-            ["python", "crewFlow.py"],
-            capture_output=True,
-            text=True,
-            env=env,
-            timeout=600
-        )
-        
-        print(f"📊 Process completed with return code: {result.returncode}")
-        
-        if result.stdout:
-            print("📤 STDOUT:")
-            print(result.stdout[:500] + "..." if len(result.stdout) > 500 else result.stdout)
-        
-        if result.stderr:
-            print("📢 STDERR:")
-            print(result.stderr[:500] + "..." if len(result.stderr) > 500 else result.stderr)
-        
-        # Split output per step using delimiter
-        steps_output = result.stdout.split('-----END TASK-----')
-        
-        # Filter out empty steps and create results with improved success detection
-        results = []
-        for i, step in enumerate(steps_output):
-            step_content = step.strip()
-            # Only process non-empty steps and ensure we don't exceed task_sequence length
-            if step_content and i < len(task_sequence):
-                task_info = task_sequence[i]
-                
-                # Use improved success detection
-                is_successful = detect_task_success(step_content, result.returncode)
-                
-                results.append({
-                    'success': is_successful,
-                    'stdout': step_content,
-                    'stderr': result.stderr if result.stderr else '',
-                    'task': task_info['task']
-                })
-                
-                # Debug logging
-                print(f"🔍 Task {i+1} ({task_info['task']}): {'✅ SUCCESS' if is_successful else '❌ FAILED'}")
-        
-        # If no results were parsed but we have output, create a single result
-        if not results and result.stdout:
-            # Use the first task info as fallback
-            first_task = task_sequence[0] if task_sequence else {'task': 'unknown_task'}
-            is_successful = detect_task_success(result.stdout, result.returncode)
-            
-            results = [{
-                'success': is_successful,
-                'stdout': result.stdout,
-                'stderr': result.stderr,
-                'task': first_task['task']
-            }]
-        
-        print(f"📋 Parsed {len(results)} task results")
-        return results
-        
-    except subprocess.TimeoutExpired:
-        print("⏰ Process timed out after 600 seconds")
-        return [{
-            'success': False,
-            'stdout': '',
-            'stderr': 'Process timed out after 600 seconds',
-            'task': 'timeout'
-        }]
-    except Exception as e:
-        print(f"❌ Error executing workflow: {e}")
-        return [{
-            'success': False,
-            'stdout': '',
-            'stderr': f'Execution error: {str(e)}',
-            'task': 'error'
-        }]
+    # Time in the queue counts too, so allow some slack on top of the workflow's own timeout
+    wait_timeout = WORKFLOW_TIMEOUT + float(os.getenv("WORKFLOW_QUEUE_WAIT_SLACK", "300"))
+    job = queue.wait(job_id, timeout=wait_timeout, on_update=show_progress)
+    status.empty()
+    if job['state'] not in FINAL_STATES:
+        queue.cancel(job_id)
+        message = f"Workflow {job_id} did not finish within {wait_timeout:.0f}s and was cancelled"
+        st.error(f"⏰ {message}")
+        return [{'success': False, 'stdout': '', 'stderr': message, 'task': 'timeout'}]
+    if job['state'] == 'done' and job['results']:
+        return job['results']
+    return [{'success': False, 'stdout': '', 'stderr': job['error'] or f"Workflow {job['state']}", 'task': job['state']}]
         
 
 def parse_and_display_splunk_output(result_stdout):
@@ -424,9 +184,69 @@ def parse_and_display_splunk_output(result_stdout):
     return False  # Couldn't parse as Splunk JSON
 
 # Replace your current output display section in streamlit_app.py with this:
+def display_records(text):
+    """Display a full tool result as a table when it has rows, otherwise as text"""
+    results = CompactResultSet.from_payload(text)
+    if len(results):
+        st.write(f"**Events Found:** {len(results)}")
+        st.dataframe(results.to_dataframe(), use_container_width=True)
+    else:
+        st.code(text, language='text')
+
+def display_result_frame(path):
+    """Display a memory-mapped result frame published by the tool layer"""
+    frame, meta = load_result_frame(path)
+    if meta.get('query'):
+        st.write(f"**Query:** `{meta['query']}`")
+    st.write(f"**Events Found:** {len(frame)}")
+    st.dataframe(frame, use_container_width=True)
+
+def render_preview(slot, run_dir, shown):
+    """Show the newest search preview of a running workflow; `shown` remembers what is on screen"""
+    previews = find_previews(run_dir)
+    if not previews or previews[-1] == shown.get('path'):
+        return
+    frame, _ = load_result_frame(previews[-1])
+    shown['path'] = previews[-1]
+    with slot.container():
+        st.info(f"👀 **Preview:** first {len(frame)} rows. The full search is still running and will replace it.")
+        st.dataframe(frame, use_container_width=True)
+
+def replace_preview(slot, shown, results):
+    """Swap the preview for the full result of the same search once the workflow is done"""
+    if not shown.get('path'):
+        return
+    frames = [path for result in results for path in find_result_frames(result.get('stdout', ''))]
+    full_path = result_for_preview(shown['path'], frames)
+    with slot.container():
+        if full_path:
+            frame, _ = load_result_frame(full_path)
+            st.success(f"✅ **Full result:** {len(frame)} rows (replaced the preview)")
+        else:
+            frame, _ = load_result_frame(shown['path'])
+            st.warning(f"⚠️ **Preview only:** first {len(frame)} rows. The full search did not complete.")
+        st.dataframe(frame, use_container_width=True)
+
 def display_task_output(result):
     """Display task output with proper formatting"""
     
+    # Full results arrive through the side channel; the agent itself only saw a digest
+    frames = find_result_frames(result.get('stdout', ''))
+    artifacts = find_result_artifacts(result.get('stdout', ''))
+    if frames or artifacts:
+        generated_spl = extract_generated_spl(result['stdout'])
+        if generated_spl:
+            st.code(generated_spl, language='sql')
+        for path in frames:
+            display_result_frame(path)
+        for path in artifacts:
+            full_result = load_full_result(path)
+            if not parse_and_display_splunk_output(full_result):
+                display_records(full_result)
+        with st.expander("Agent output"):
+            st.code(result['stdout'], language='text')
+        return
+    
     if result.get('stdout'):
         # Try to parse as structured Splunk output
         if not parse_and_display_splunk_output(result['stdout']):
@@ -436,14 +256,136 @@ def display_task_output(result):
             # Use st.code for better formatting - show full output with scrolling
             st.code(clean_output, language='text')
 
+def display_detailed_results(results):
+    """Display per-step status, timing and output"""
+    for i, result in enumerate(results):
+        st.write(f"**Step {i+1}: {result['task']}**")
+        status = "✅ Success" if result.get('success') else "❌ Failed"
+        st.write(f"Status: {status}")
+        if result.get('duration') is not None:
+            st.write(f"Duration: {result['duration']:.1f}s")
+        if result.get('evicted'):
+            st.info("Output was evicted from the history store to stay under its size budget")
+        elif result.get('stdout'):
+            display_task_output(result)
+        st.markdown("---")
+
+def display_profiles(run_dir):
+    """Hot functions and biggest allocation sites from a profiled run"""
+    import pandas as pd
+    for profile in load_profiles(run_dir):
+        where = "crewFlow.py" if profile['label'] == "workflow" else "result rendering in this app"
+        st.write(f"**{where}**: {profile['total_seconds']:.1f}s CPU profiled, peak traced memory {profile['memory_peak_kb'] / 1024:.1f} MB")
+        st.write("Self time by component:")
+        st.dataframe(pd.DataFrame(
+            [{'component': name, 'seconds': seconds} for name, seconds in profile['self_time_by_component'].items()]
+        ), use_container_width=True)
+        st.write("Hot functions (self time):")
+        st.dataframe(pd.DataFrame(profile['by_self_time'][:15])[['function', 'calls', 'tottime', 'cumtime']], use_container_width=True)
+        st.write("Biggest allocation sites (growth over the run):")
+        allocations = [{key: value for key, value in site.items() if key != 'traceback'} for site in profile['allocations'][:15]]
+        st.dataframe(pd.DataFrame(allocations), use_container_width=True)
+        st.caption(f"Full profile: `{profile['pstats_path']}` (open with `python -m pstats` or snakeviz)")
+        st.markdown("---")
+
+@st.cache_resource
+def get_workflow_store():
+    return WorkflowStore()
+
+def resolve_user_id():
+    """A user id that survives page refreshes: the signed-in user, a header set by an
+    authenticating proxy (USER_ID_HEADER), or an id kept in the page URL"""
+    user = getattr(st, 'user', None)
+    if user is not None and getattr(user, 'is_logged_in', False) and user.get('email'):
+        return user['email']
+    header = os.getenv("USER_ID_HEADER")
+    headers = getattr(getattr(st, 'context', None), 'headers', None)
+    if header and headers and headers.get(header):
+        return headers.get(header)
+    if not hasattr(st, 'query_params'):
+        return f"session-{uuid.uuid4().hex[:8]}"  # Streamlit < 1.30 has no writable query params
+    user_id = st.query_params.get('uid')
+    if not user_id:
+        user_id = f"user-{uuid.uuid4().hex[:12]}"
+        st.query_params['uid'] = user_id
+    return user_id
+
+def open_stored_workflow(workflow_id):
+    st.session_state.open_workflow_id = workflow_id
+
+@st.cache_resource
+def get_metrics_exporter():
+    # Workflow queue depth is read from the shared queue at scrape time
+    queue = get_workflow_queue()
+    QUEUE_DEPTH.collect = lambda: [({'state': state}, count) for state, count in queue.depth().items()]
+    return start_metrics_exporter()
+
+@st.cache_resource
+def get_splunk_catalog():
+    # One refresher per server process keeps the catalog file fresh for every workflow
+    return SplunkCatalog().start_refresher()
+
+@st.cache_resource
+def get_search_job_manager():
+    return SearchJobManager().start()
+
+def render_search_jobs(manager):
+    """Progress bars, cancel buttons and paged results for background searches"""
+    jobs = manager.snapshot()
+    if not jobs:
+        st.caption("No background searches yet")
+        return
+
+    for job in jobs:
+        label = f"`{job['sid']}` {job['state']} · {job['elapsed']:.0f}s · {job['query'][:80]}"
+        if job['progress_estimated']:
+            label += " (estimated)"
+        st.progress(job['progress'], text=label)
+
+        job_col1, job_col2, job_col3 = st.columns([1, 1, 4])
+        with job_col1:
+            if not job['is_done'] and st.button("Cancel", key=f"cancel_job_{job['sid']}"):
+                manager.cancel(job['sid'])
+        with job_col2:
+            if job['is_done'] and st.button("Dismiss", key=f"dismiss_job_{job['sid']}"):
+                manager.forget(job['sid'])
+        with job_col3:
+            if job['error']:
+                st.error(job['error'][:500])
+
+        if job['state'] == 'DONE':
+            with st.expander(f"Results ({job['result_count']} rows)"):
+                page_size = 100
+                pages = max(1, -(-job['result_count'] // page_size))
+                page = st.number_input("Page", min_value=1, max_value=pages, value=1, key=f"job_page_{job['sid']}")
+                page_data = manager.results(job['sid'], offset=(page - 1) * page_size, count=page_size)
+                if page_data['results']:
+                    import pandas as pd
+                    st.dataframe(pd.DataFrame(page_data['results']), use_container_width=True)
+                else:
+                    st.write("No results")
+
+# Refresh the job panel on its own so progress moves while the rest of the page stays interactive
+if hasattr(st, "fragment"):
+    render_search_jobs = st.fragment(run_every=2)(render_search_jobs)
+
 # Streamlit App
 st.set_page_config(page_title="Splunk Multi-Task Assistant", layout="wide")
 st.title("🔍 Splunk Multi-Task Assistant")
 st.markdown("Chain multiple Splunk operations together in natural language!")
 
-# Initialize session state for workflow history
-if 'workflow_history' not in st.session_state:
-    st.session_state.workflow_history = []
+workflow_store = get_workflow_store()
+get_metrics_exporter()
+if os.getenv("CATALOG", "1") == "1":
+    get_splunk_catalog()
+
+if st.session_state.pop('workflow_cancelled', False):
+    st.session_state.pop('active_run', None)
+    st.warning("⛔ Workflow cancelled. Its crew, pending MCP calls and MCP servers were stopped.")
+
+# Identifies the user to the shared workflow queue (per-user fairness) and the workflow history
+if 'user_id' not in st.session_state:
+    st.session_state.user_id = resolve_user_id()
 
 # Main natural language input
 user_request = st.text_area(
@@ -468,13 +410,46 @@ with st.expander("🔧 Manual Overrides (Optional)"):
     with col5:
         output_format = st.selectbox("Export format", ["json", "csv", "xml"], index=0)
 
+    col6, col7 = st.columns(2)
+    with col6:
+        use_workflow_queue = st.checkbox(
+            "Run on shared workflow queue", value=os.getenv("WORKFLOW_QUEUE", "0") == "1",
+            help="Hand the workflow to workflow_worker.py processes instead of running it in this session"
+        )
+    with col7:
+        queue_priority = st.selectbox("Queue priority", list(QUEUE_PRIORITIES), index=1, disabled=not use_workflow_queue)
+
+    progressive_results = st.checkbox(
+        "Progressive results (quick preview first)", value=os.getenv("PROGRESSIVE_RESULTS", "1") == "1",
+        help=f"Event searches first return their first {os.getenv('PREVIEW_ROWS', '20')} rows while the full search keeps running"
+    )
+
+    profile_workflow = st.checkbox(
+        "Profile workflow (CPU + memory)", value=os.getenv("PROFILE_WORKFLOW", "0") == "1",
+        help="Run crewFlow.py and the result rendering under cProfile and tracemalloc and show where time and memory go"
+    )
+
 if st.button("🚀 Execute Workflow", type="primary"):
     if not user_request.strip():
         st.warning("Please enter a request.")
     else:
+        # Speculative setup (time range, MCP metadata) runs while the planner waits on the LLM
+        run_dir = new_run_dir()
+        prefetcher = None
+        if os.getenv("PREFETCH", "1") == "1":
+            prefetcher = Prefetcher(run_dir).start(
+                user_request, None if manual_earliest and manual_latest else extract_time_range
+            )
+        
         # Analyze the request for task sequence
         with st.spinner("Planning workflow..."):
-            task_sequence = determine_task_sequence(user_request)
+            previous_run_dir = st.session_state.get('last_run_dir')
+            task_sequence = determine_task_sequence(user_request, has_previous_results=bool(previous_run_dir))
+            task_sequence, plan_report = optimize_if_enabled(task_sequence)
+        extracted_time_range = None
+        if prefetcher:
+            prefetcher.discard_unused(task_sequence)
+            extracted_time_range = prefetcher.time_range()
         
         # Display planned workflow
         st.subheader("📋 Planned Workflow")
@@ -489,19 +464,58 @@ if st.button("🚀 Execute Workflow", type="primary"):
         
         with workflow_col2:
             st.info(f"**Total Steps:** {len(task_sequence)}")
-            estimated_time = len(task_sequence) * 30  # Rough estimate
-            st.info(f"**Est. Time:** ~{estimated_time}s")
+            st.info(f"**Est. Time:** ~{estimate_seconds(task_sequence)}s")
+        
+        if plan_report and plan_report['changes']:
+            with st.expander(
+                f"🧮 Plan optimized: {plan_report['steps_before']} → {plan_report['steps_after']} steps, "
+                f"~{plan_report['seconds_saved']}s saved"
+            ):
+                for change in plan_report['changes']:
+                    st.write(f"- {change}")
+                if plan_report['first_search_seconds_earlier'] > 0:
+                    st.caption(f"The first search starts ~{plan_report['first_search_seconds_earlier']}s earlier")
         
         # Execute the workflow
         st.markdown("---")
         st.subheader("⚡ Execution")
         
+        # Clicking cancel reruns the script, which interrupts this run and kills the workflow's process tree
+        st.session_state.active_run = {'run_dir': run_dir, 'queue_job': None}
+        cancel_col, status_col = st.columns([1, 4])
+        with cancel_col:
+            st.button("⛔ Cancel Workflow", on_click=cancel_active_workflow)
+        run_status = status_col.empty()
+        preview_slot = st.empty()
+        shown_preview = {}
+        
+        def poll_run(elapsed):
+            run_status.caption(f"⏱️ Running for {elapsed:.0f}s")
+            if progressive_results:
+                render_preview(preview_slot, run_dir, shown_preview)
+        
         start_time = time.time()
-        results = execute_task_sequence(
-            task_sequence, user_request, manual_earliest, manual_latest, 
-            manual_index, max_count, output_format
-        )
+        if use_workflow_queue:
+            results = queue_task_sequence(
+                task_sequence, user_request, manual_earliest, manual_latest,
+                manual_index, max_count, output_format, queue_priority, run_dir=run_dir,
+                previous_run_dir=previous_run_dir, profile=profile_workflow,
+                extracted_time_range=extracted_time_range, progressive=progressive_results,
+                on_poll=poll_run
+            )
+        else:
+            results = execute_task_sequence(
+                task_sequence, user_request, manual_earliest, manual_latest, 
+                manual_index, max_count, output_format, run_dir=run_dir,
+                on_poll=poll_run, previous_run_dir=previous_run_dir, profile=profile_workflow,
+                extracted_time_range=extracted_time_range, progressive=progressive_results
+            )
         end_time = time.time()
+        st.session_state.pop('active_run', None)
+        run_status.empty()
+        replace_preview(preview_slot, shown_preview, results)
+        if ResultStore(run_dir).tables():
+            st.session_state.last_run_dir = run_dir
         
         # Summary
         st.markdown("---")
@@ -518,40 +532,144 @@ if st.button("🚀 Execute Workflow", type="primary"):
             st.metric("Success Rate", f"{success_rate:.0f}%")
         
         # Store in history
-        workflow_record = {
-            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
-            'request': user_request,
-            'tasks': len(task_sequence),
-            'successful': successful_tasks,
-            'total_time': end_time - start_time
-        }
-        st.session_state.workflow_history.append(workflow_record)
+        workflow_store.save_workflow(
+            user_request, task_sequence, results, end_time - start_time,
+            settings={
+                'earliest': manual_earliest, 'latest': manual_latest, 'index': manual_index,
+                'max_count': max_count, 'output_format': output_format
+            },
+            user_id=st.session_state.user_id
+        )
+        st.session_state.pop('open_workflow_id', None)
         
         # Detailed results
         with st.expander("📋 Detailed Results"):
-            for i, result in enumerate(results):
-                st.write(f"**Step {i+1}: {result['task']}**")
-                status = "✅ Success" if result.get('success') else "❌ Failed"
-                st.write(f"Status: {status}")
-                if result.get('stdout'):
-                    display_task_output(result)
-                st.markdown("---")
+            # Output parsing runs here rather than in crewFlow.py, so it gets its own profile
+            with profile_run(run_dir, label="ui", enabled=profile_workflow):
+                display_detailed_results(results)
+
+        if profile_workflow:
+            with st.expander("🔬 Profile", expanded=True):
+                display_profiles(run_dir)
+
+# Reopen a stored workflow straight from the history store (no LLM or Splunk calls)
+elif st.session_state.get('open_workflow_id'):
+    stored = workflow_store.load_workflow(st.session_state.open_workflow_id)
+    if stored:
+        st.subheader(f"📂 Stored Workflow {stored['id']}")
+        st.caption(f"Ran at {stored['timestamp']} in {stored['total_time']:.1f}s")
+        st.write(f"**Request:** {stored['request']}")
+        if stored['spl']:
+            st.code(stored['spl'], language='sql')
+        with st.expander("📋 Detailed Results", expanded=True):
+            display_detailed_results(stored['results'])
+    else:
+        st.session_state.pop('open_workflow_id', None)
+
+# Follow-up slicing of the last workflow's results, evaluated locally without a Splunk round trip
+with st.expander("🔎 Refine Recent Results"):
+    result_tables = ResultStore(st.session_state['last_run_dir']).tables() if st.session_state.get('last_run_dir') else []
+    if result_tables:
+        table_labels = {f"{table['name']} ({table['rows']} rows) {table['query'] or ''}"[:120]: table['name'] for table in result_tables}
+        refine_table = st.selectbox("Result", list(table_labels))
+        refine_pipeline = st.text_input(
+            "Refinement", placeholder="e.g., | search status=404 | stats count by host | sort -count | head 5",
+            key="refine_pipeline"
+        )
+        if refine_pipeline.strip():
+            try:
+                refined = ResultStore(st.session_state.last_run_dir).query(refine_pipeline, table_labels[refine_table])
+                st.caption(f"{len(refined)} rows, computed locally")
+                st.dataframe(refined, use_container_width=True)
+            except LocalQueryError as e:
+                st.warning(str(e))
+    else:
+        st.caption("Run a search first; its results can then be filtered, grouped and charted here")
+
+# Long searches run as background jobs so other steps and workflows can proceed meanwhile
+with st.expander("⏳ Background Searches"):
+    job_query = st.text_input("SPL to run in the background", placeholder="e.g., index=main error | stats count by host")
+    try:
+        if st.button("Dispatch search"):
+            if job_query.strip():
+                get_search_job_manager().submit(
+                    job_query.strip(), manual_earliest or "-24h", manual_latest or "now", max_count, "json"
+                )
+                st.session_state.search_jobs_used = True
+            else:
+                st.warning("Please enter an SPL query.")
+        # Only spawn the job manager's MCP session once this session has used it
+        if st.session_state.get('search_jobs_used'):
+            render_search_jobs(get_search_job_manager())
+            if not hasattr(st, "fragment"):
+                st.button("🔄 Refresh progress")
+        else:
+            st.caption("No background searches yet")
+    except Exception as e:
+        st.error(f"Background search manager unavailable: {e}")
+
+# Many saved searches at once (e.g. morning triage) over one MCP session, summarized in one table
+with st.expander("📑 Bulk Saved Searches"):
+    bulk_col1, bulk_col2, bulk_col3 = st.columns([2, 1, 1])
+    with bulk_col1:
+        bulk_pattern = st.text_input("Name pattern", placeholder="e.g., Triage - *")
+    with bulk_col2:
+        bulk_app = st.text_input("App", placeholder="e.g., search")
+    with bulk_col3:
+        bulk_concurrency = st.number_input(
+            "Concurrency", min_value=1, max_value=32,
+            value=int(os.getenv("SAVED_SEARCH_CONCURRENCY", os.getenv("MAX_CONCURRENT_JOBS", "4")))
+        )
+    if st.button("Run saved searches"):
+        if not bulk_pattern.strip() and not bulk_app.strip():
+            st.warning("Enter a name pattern or an app.")
+        else:
+            bulk_run_dir = new_run_dir()
+            with st.spinner("Running saved searches..."):
+                try:
+                    st.session_state.bulk_summary = run_bulk(
+                        bulk_pattern.strip() or None, bulk_app.strip() or None,
+                        concurrency=int(bulk_concurrency), run_dir=bulk_run_dir
+                    )
+                except Exception as e:
+                    st.error(f"Bulk run failed: {e}")
+            # Their rows can then be sliced in Refine Recent Results
+            if ResultStore(bulk_run_dir).tables():
+                st.session_state.last_run_dir = bulk_run_dir
+    bulk_summary = st.session_state.get('bulk_summary')
+    if bulk_summary is not None and len(bulk_summary):
+        ok_count = int((bulk_summary['status'] == 'ok').sum())
+        st.caption(f"{ok_count}/{len(bulk_summary)} succeeded, {int(bulk_summary['rows'].sum())} rows in total")
+        st.dataframe(bulk_summary, use_container_width=True)
+    elif bulk_summary is not None:
+        st.caption("No saved searches matched")
 
 # Sidebar with workflow history and examples
 with st.sidebar:
     st.header("📈 Workflow History")
-    if st.session_state.workflow_history:
-        for i, record in enumerate(reversed(st.session_state.workflow_history[-10:])):  # Show last 10
-            with st.expander(f"Workflow {len(st.session_state.workflow_history) - i}"):
+    history_filter = st.text_input("Filter by request or SPL", key="history_filter")
+    history = workflow_store.list_workflows(limit=10, search=history_filter.strip() or None)  # Show last 10
+    if history:
+        for record in history:
+            with st.expander(f"Workflow {record['id']}"):
                 st.write(f"**Time:** {record['timestamp']}")
                 st.write(f"**Request:** {record['request'][:100]}...")
+                if record['spl']:
+                    st.code(record['spl'], language='sql')
                 st.write(f"**Tasks:** {record['successful']}/{record['tasks']} successful")
                 st.write(f"**Duration:** {record['total_time']:.1f}s")
+                st.button(
+                    "📂 Open results", key=f"open_workflow_{record['id']}",
+                    on_click=open_stored_workflow, args=(record['id'],),
+                    disabled=record['stored_artifacts'] == 0
+                )
     else:
         st.info("No workflows executed yet")
     
-    if st.button("Clear History"):
-        st.session_state.workflow_history = []
+    # The history is shared; a user may only clear the workflows they ran
+    if st.button("Clear My History", help="Delete the workflows you ran (kept across refreshes via your sign-in, proxy header or the uid in the URL)"):
+        workflow_store.clear(st.session_state.user_id)
+        st.session_state.pop('open_workflow_id', None)
         st.rerun()
     
 
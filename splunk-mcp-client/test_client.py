@@ -0,0 +1,34 @@
+from client import CompactResultSet
+
+
+def test_values_equal_across_types_stay_distinct():
+    records = [{'flag': value} for value in (True, 1, 1.0, True, 1, 1.0, True, 1)]
+    assert [row['flag'] for row in CompactResultSet.from_records(records).to_records()] == [
+        'True', '1', '1.0', 'True', '1', '1.0', 'True', '1',
+    ]
+
+
+def test_repetitive_text_is_interned_and_numbers_typed():
+    records = [{'host': 'web1', 'bytes': '10'}, {'host': 'web1', 'bytes': '20'}, {'host': 'web2', 'bytes': '30'}, {'host': 'web1', 'bytes': ''}]
+    result = CompactResultSet.from_records(records)
+    assert result.to_records() == [
+        {'host': 'web1', 'bytes': 10.0}, {'host': 'web1', 'bytes': 20.0}, {'host': 'web2', 'bytes': 30.0}, {'host': 'web1'},
+    ]
+
+
+def test_leading_zeros_stay_text():
+    records = [{'zip': '02134'}, {'zip': '10001'}]
+    assert [row['zip'] for row in CompactResultSet.from_records(records)] == ['02134', '10001']
+
+
+def test_numbers_that_do_not_convert_exactly_stay_text():
+    for values in (['123456789012345678901234', '1'], ['1', '1.0'], ['1.50', '2.5'], ['100000', '1e5']):
+        records = [{'n': value} for value in values]
+        assert [row['n'] for row in CompactResultSet.from_records(records)] == values
+
+
+def test_int64_and_round_tripping_floats_are_typed():
+    records = [{'id': str(2 ** 63 - 1), 'ratio': '0.1'}, {'id': '-5', 'ratio': '2.5'}]
+    assert CompactResultSet.from_records(records).to_records() == [
+        {'id': 2 ** 63 - 1, 'ratio': 0.1}, {'id': -5, 'ratio': 2.5},
+    ]
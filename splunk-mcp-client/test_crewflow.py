@@ -0,0 +1,17 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("crewai")
+
+CREW_FLOW = os.path.join(os.path.dirname(os.path.abspath(__file__)), "crewFlow.py")
+
+
+def test_task_sequence_entry_point_runs(tmp_path):
+    env = dict(os.environ, TASK_SEQUENCE=json.dumps([]), RUN_DIR=str(tmp_path), PROFILE_WORKFLOW="1")
+    result = subprocess.run([sys.executable, CREW_FLOW], env=env, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    assert "CONTEXT_TOKENS_SAVED" in result.stdout
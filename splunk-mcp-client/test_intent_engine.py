@@ -0,0 +1,56 @@
+from intent_engine import is_high_confidence, match_intent, _singular
+
+
+def test_known_index_and_field_is_high_confidence():
+    result = match_intent("count errors by host in index=main")
+    assert result['spl'] == "index=main (error OR exception OR fail*) | stats count by host | sort - count"
+    assert is_high_confidence(result)
+
+
+def test_unknown_index_stays_below_threshold():
+    result = match_intent("Find top 10 MAC addresses from botsv3")
+    assert result['spl'].startswith("index=*")
+    assert not is_high_confidence(result)
+
+
+def test_index_star_stays_below_threshold_even_with_many_components():
+    result = match_intent("top 5 source ips with failed logins and 404 status network traffic")
+    assert result['spl'].startswith("index=*")
+    assert not is_high_confidence(result)
+
+
+def test_unconsumed_words_lower_confidence():
+    plain = match_intent("top 10 hosts in index=main")
+    extra = match_intent("top 10 hosts in index=main excluding windows domain controllers")
+    assert extra['confidence'] < plain['confidence']
+    assert not is_high_confidence(extra)
+
+
+def test_time_phrases_and_filler_cost_nothing():
+    plain = match_intent("top 10 hosts in index=main")
+    timed = match_intent("show me the top 10 hosts in index=main over the last 24 hours")
+    assert timed['confidence'] == plain['confidence']
+
+
+def test_by_sourcetype_is_a_field_not_a_filter():
+    result = match_intent("count events by sourcetype in index=main")
+    assert result['spl'] == "index=main | stats count by sourcetype | sort - count"
+
+
+def test_sourcetype_needs_equals_or_quotes():
+    assert "sourcetype=syslog" in match_intent("errors sourcetype=syslog index=main")['spl']
+    assert "sourcetype=access_combined" in match_intent("errors in sourcetype 'access_combined' index=web")['spl']
+    assert "sourcetype=" not in match_intent("errors by sourcetype in index=main")['spl'].split('|')[0]
+
+
+def test_singular_forms():
+    assert [_singular(word) for word in ('countries', 'addresses', 'hosts', 'processes', 'status', 'class')] == [
+        'country', 'address', 'host', 'process', 'status', 'class',
+    ]
+    assert match_intent("top countries in index=web")['spl'] == "index=web | top limit=10 country"
+
+
+def test_index_override_wins():
+    result = match_intent("top 10 hosts", index_override="forced")
+    assert result['spl'] == "index=forced | top limit=10 host"
+    assert is_high_confidence(result)
@@ -0,0 +1,49 @@
+from plan_optimizer import estimate_seconds, optimize_plan
+
+
+def step(task, description="", depends_on=None):
+    return {'task': task, 'description': description, 'depends_on': depends_on}
+
+
+def test_export_of_a_search_is_folded_into_it():
+    plan = [step('search_oneshot', "Search failed logins"), step('search_export', "Export them", 0)]
+    optimized, report = optimize_plan(plan)
+    assert [task_info['task'] for task_info in optimized] == ['search_oneshot']
+    assert optimized[0]['export'] is True
+    assert report['seconds_saved'] == 30
+
+
+def test_duplicate_metadata_lookups_run_once_after_the_searches():
+    plan = [step('get_indexes', "List indexes"), step('search_oneshot', "Search errors"), step('get_indexes', "Show indexes again")]
+    optimized, report = optimize_plan(plan)
+    assert [task_info['task'] for task_info in optimized] == ['search_oneshot', 'get_indexes']
+    assert report['first_search_seconds_earlier'] == 5
+
+
+def test_dependencies_follow_the_step_doing_the_work():
+    plan = [
+        step('search_oneshot', "Search errors"),
+        step('search_oneshot', "search  Errors"),
+        step('validate_spl', "Validate it", 1),
+    ]
+    optimized, _ = optimize_plan(plan)
+    assert [task_info['task'] for task_info in optimized] == ['search_oneshot', 'validate_spl']
+    assert optimized[1]['depends_on'] == 0
+
+
+def test_lookups_something_depends_on_stay_in_place():
+    plan = [step('get_saved_searches', "List saved searches"), step('run_saved_search', "Run one", 0)]
+    optimized, report = optimize_plan(plan)
+    assert optimized == plan
+    assert report['changes'] == []
+
+
+def test_unsupported_steps_are_dropped():
+    plan = [step('search_oneshot', "Search"), step('save_search', "Save it", 0)]
+    optimized, report = optimize_plan(plan)
+    assert [task_info['task'] for task_info in optimized] == ['search_oneshot']
+    assert report['steps_before'] == 2 and report['steps_after'] == 1
+
+
+def test_estimate_uses_default_for_unknown_tasks():
+    assert estimate_seconds([step('get_config'), step('something_new')]) == 35
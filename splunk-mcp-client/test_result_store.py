@@ -0,0 +1,69 @@
+import pandas as pd
+import pytest
+
+from result_store import LocalQueryError, is_local_filter, records_to_frame, run_pipeline
+
+
+@pytest.fixture
+def events():
+    return records_to_frame([
+        {'host': 'web1', 'status': '404', 'bytes': '120', 'user': 'alice'},
+        {'host': 'web1', 'status': '200', 'bytes': '3000', 'user': 'bob'},
+        {'host': 'web2', 'status': '404', 'bytes': '80', 'user': 'alice'},
+        {'host': 'db1', 'status': '500', 'bytes': '10', 'user': 'carol'},
+    ])
+
+
+def test_filter_then_stats_sort_head(events):
+    result = run_pipeline(events, "| search status=404 | stats count by host | sort - count | head 1")
+    assert result.to_dict('records') == [{'host': 'web1', 'count': 1}]
+
+
+def test_bare_conditions_and_wildcards(events):
+    result = run_pipeline(events, "host=web* bytes>100")
+    assert list(result['user']) == ['alice', 'bob']
+
+
+def test_top_and_fields(events):
+    result = run_pipeline(events, "| top limit=1 user | fields user count")
+    assert result.to_dict('records') == [{'user': 'alice', 'count': 2}]
+
+
+@pytest.mark.parametrize("expression", [
+    "status=404 timeout",
+    "status=404 OR status=500",
+    "NOT status=404",
+    "(status=404)",
+    '"connection refused"',
+])
+def test_unsupported_filters_raise(events, expression):
+    assert not is_local_filter(expression)
+    with pytest.raises(LocalQueryError):
+        run_pipeline(events, f"| search {expression}")
+
+
+def test_and_and_quoted_values_are_local_filters():
+    assert is_local_filter('status=404 AND host="web (primary)"')
+
+
+@pytest.mark.parametrize("pipeline", ["| sort", "| fields", "| table", "| where status>abc", "| eval x=1"])
+def test_malformed_commands_raise_local_query_error(events, pipeline):
+    with pytest.raises(LocalQueryError):
+        run_pipeline(events, pipeline)
+
+
+def test_missing_field_raises(events):
+    with pytest.raises(LocalQueryError):
+        run_pipeline(events, "| stats count by country")
+
+
+def test_multivalue_fields_are_flattened():
+    frame = records_to_frame([{'tags': ['a', 'b'], 'n': '1'}])
+    assert frame.loc[0, 'tags'] == '["a", "b"]'
+    assert pd.api.types.is_numeric_dtype(frame['n'])
+
+
+def test_untyped_frame_keeps_values_as_returned():
+    frame = records_to_frame([{'zip': '02134', 'n': '1'}], typed=False)
+    assert frame.loc[0, 'zip'] == '02134'
+    assert frame.loc[0, 'n'] == '1'
@@ -0,0 +1,75 @@
+from spl_rewriter import rewrite_spl
+
+
+def test_projection_goes_right_before_the_report():
+    result = rewrite_spl("index=main error | dedup session_id | sort - _time | stats count by host")
+    assert result['query'] == "index=main error | dedup session_id | sort - _time | fields host | stats count by host"
+
+
+def test_projection_keeps_fields_created_earlier():
+    result = rewrite_spl("index=main | eval kb=bytes/1024 | stats sum(kb) by host")
+    assert result['query'] == "index=main | eval kb=bytes/1024 | fields kb host | stats sum(kb) by host"
+
+
+def test_projection_includes_chart_over_field():
+    result = rewrite_spl("index=web | chart count over uri by status")
+    assert "| fields status uri | chart" in result['query']
+
+
+def test_no_projection_for_eval_aggregations_or_existing_fields():
+    assert 'fields_projection' not in rewrite_spl("index=web | stats count(eval(status>=500)) as errors by host")['rules']
+    assert 'fields_projection' not in rewrite_spl("index=web | fields host status | stats count by host")['rules']
+
+
+def test_search_terms_are_pushed_into_the_base_search():
+    result = rewrite_spl("index=main | search error OR fail | head 5")
+    assert result['query'] == "index=main (error OR fail) | head 5"
+
+
+def test_count_over_indexed_fields_becomes_tstats():
+    result = rewrite_spl("index=botsv3 sourcetype=stream:http | stats count by host")
+    assert result['query'] == "| tstats count where index=botsv3 sourcetype=stream:http by host"
+
+
+def test_explicit_all_time_is_kept_with_a_warning():
+    result = rewrite_spl("index=main | head 10", "0", "now")
+    assert result['earliest_time'] == "0"
+    assert 'time_bound' not in result['rules']
+    assert result['warnings']
+
+
+def test_missing_earliest_gets_the_default_bound(monkeypatch):
+    monkeypatch.setenv("SPL_REWRITE_DEFAULT_EARLIEST", "-4h")
+    result = rewrite_spl("index=main | head 10", "", "")
+    assert (result['earliest_time'], result['latest_time']) == ("-4h", "now")
+    assert 'time_bound' in result['rules']
+
+
+def test_projection_keeps_fields_of_other_aggregations():
+    result = rewrite_spl("index=web | stats median(bytes) first(status) stdev(bytes) p95(duration) by host")
+    assert "| fields bytes status duration host | stats" in result['query']
+
+
+def test_no_projection_for_unknown_functions_or_wildcards():
+    assert 'fields_projection' not in rewrite_spl("index=web | stats per_second(bytes) by host")['rules']
+    assert 'fields_projection' not in rewrite_spl("index=web | stats values(*) as * by host")['rules']
+    assert 'fields_projection' not in rewrite_spl("index=web | stats count by host*")['rules']
+
+
+CATALOG = {
+    'time_range': "-24h",
+    'indexes': {
+        'main': {'events': 100, 'sourcetypes': {'syslog': {'events': 100, 'fields': ['process']}}},
+        'web': {'events': 100, 'sourcetypes': {'access_combined': {'events': 100, 'fields': ['status']}}},
+    },
+}
+
+
+def test_index_is_narrowed_by_sourcetype():
+    result = rewrite_spl("index=* sourcetype=access_combined | head 5", catalog=CATALOG)
+    assert result['query'] == "index=web sourcetype=access_combined | head 5"
+
+
+def test_index_is_not_narrowed_by_fields():
+    for query in ("index=* | eval status=\"x\" | stats count by status", "index=* status=404 | head 5"):
+        assert 'narrow_index' not in rewrite_spl(query, catalog=CATALOG)['rules']
@@ -0,0 +1,36 @@
+import threading
+
+import pytest
+
+from workflow_queue import AdmissionError, RemoteWorkflowQueue, WorkflowQueue, serve_queue
+
+
+@pytest.fixture
+def remote(tmp_path, monkeypatch):
+    monkeypatch.setenv("WORKFLOW_QUEUE_MAX_PER_USER", "1")
+    server = serve_queue(WorkflowQueue(str(tmp_path / "queue.db")), "127.0.0.1", 0, token="secret")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield RemoteWorkflowQueue(f"http://127.0.0.1:{server.server_address[1]}", token="secret")
+    server.shutdown()
+
+
+def test_remote_worker_claims_and_completes(remote):
+    job_id = remote.submit("alice", {'user_request': "errors"}, priority=1)
+    job = remote.claim("node-2:1")
+    assert job['id'] == job_id and job['payload'] == {'user_request': "errors"}
+    assert remote.heartbeat(job_id, "node-2:1")
+    remote.complete(job_id, "node-2:1", results=[{'success': True}])
+    finished = remote.wait(job_id, timeout=5, poll_interval=0.1)
+    assert finished['state'] == "done" and finished['results'] == [{'success': True}]
+
+
+def test_admission_errors_cross_the_wire(remote):
+    remote.submit("alice", {})
+    with pytest.raises(AdmissionError):
+        remote.submit("alice", {})
+
+
+def test_wrong_token_is_refused(remote):
+    remote.token = "wrong"
+    with pytest.raises(RuntimeError):
+        remote.depth()
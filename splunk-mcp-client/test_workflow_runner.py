@@ -0,0 +1,23 @@
+from workflow_runner import parse_workflow_output
+
+
+def test_background_step_output_is_grouped_by_step_index():
+    stdout = "\n".join([
+        "🚀 Executing task 1/2: search_oneshot",
+        "STEP_INDEX: 0",
+        "⏳ Search running as background job abc while later steps proceed",
+        "-----END TASK-----",
+        "🚀 Executing task 2/2: get_indexes",
+        "STEP_INDEX: 1",
+        "⏱️ TASK_DURATION: 0.50s",
+        "-----END TASK-----",
+        "📬 Collecting background job for task 1",
+        "STEP_INDEX: 0",
+        "GENERATED_SPL: index=main",
+        "⏱️ TASK_DURATION: 9.00s",
+        "-----END TASK-----",
+    ])
+    results = parse_workflow_output([{'task': 'search_oneshot'}, {'task': 'get_indexes'}], 0, stdout, "")
+    assert [result['duration'] for result in results] == [9.0, 0.5]
+    assert "GENERATED_SPL: index=main" in results[0]['stdout']
+    assert "STEP_INDEX" not in results[0]['stdout']
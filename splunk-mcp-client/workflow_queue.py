@@ -0,0 +1,335 @@
+import os
+import json
+import time
+import sqlite3
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from dotenv import load_dotenv
+
+DEFAULT_QUEUE_PATH = os.path.join(".splunk_assistant", "workflow_queue.db")
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINAL_STATES = (DONE, FAILED, CANCELLED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    submitted_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    worker_id TEXT,
+    lease_expires_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    results TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_dispatch ON jobs (state, priority, submitted_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_user ON jobs (user_id, state);
+"""
+
+
+class AdmissionError(Exception):
+    """Raised when the queue refuses a submission to protect workers and other users"""
+
+
+class WorkflowQueue:
+    """SQLite-backed workflow queue shared by the Streamlit sessions and the workers.
+
+    The database runs in WAL mode, so every process opening it must be on the same host;
+    workers on other nodes reach it through serve_queue and RemoteWorkflowQueue. Claims are
+    leases, so a job held by a worker that stops heartbeating is handed to another worker.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.getenv("WORKFLOW_QUEUE_PATH", DEFAULT_QUEUE_PATH)
+        self.max_queued = int(os.getenv("WORKFLOW_QUEUE_MAX_QUEUED", "100"))
+        self.max_per_user = int(os.getenv("WORKFLOW_QUEUE_MAX_PER_USER", "5"))
+        self.max_running_per_user = int(os.getenv("WORKFLOW_QUEUE_MAX_RUNNING_PER_USER", "2"))
+        self.max_attempts = int(os.getenv("WORKFLOW_QUEUE_MAX_ATTEMPTS", "2"))
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.executescript(SCHEMA)
+
+    @property
+    def location(self) -> str:
+        return self.db_path
+
+    def _transaction(self, fn):
+        # BEGIN IMMEDIATE takes the write lock up front so concurrent claimers can't pick the same job
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._conn)
+                self._conn.execute("COMMIT")
+                return result
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def submit(self, user_id: str, payload: dict, priority: int = 0) -> int:
+        """Queue a workflow, refusing it when the queue or the user's share is full"""
+        def insert(conn):
+            queued = conn.execute("SELECT COUNT(*) FROM jobs WHERE state = ?", (QUEUED,)).fetchone()[0]
+            if queued >= self.max_queued:
+                raise AdmissionError(f"Workflow queue is full ({queued} waiting), try again shortly")
+            pending = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE user_id = ? AND state IN (?, ?)", (user_id, QUEUED, RUNNING)
+            ).fetchone()[0]
+            if pending >= self.max_per_user:
+                raise AdmissionError(f"You already have {pending} workflows pending (limit {self.max_per_user})")
+            cursor = conn.execute(
+                "INSERT INTO jobs (user_id, priority, state, payload, submitted_at) VALUES (?, ?, ?, ?, ?)",
+                (user_id, priority, QUEUED, json.dumps(payload), time.time()),
+            )
+            return cursor.lastrowid
+
+        job_id = self._transaction(insert)
+        print(f"📨 Queued workflow {job_id} for {user_id} (priority {priority})")
+        return job_id
+
+    def claim(self, worker_id: str, lease_seconds: float = 60) -> Optional[dict]:
+        """Lease the next job: highest priority first, then the user with the fewest running jobs, then oldest"""
+        def take(conn):
+            now = time.time()
+            self._requeue_expired(conn, now)
+            row = conn.execute(
+                """SELECT j.* FROM jobs j
+                   LEFT JOIN (SELECT user_id, COUNT(*) AS running FROM jobs WHERE state = ? GROUP BY user_id) r
+                     ON r.user_id = j.user_id
+                   WHERE j.state = ? AND COALESCE(r.running, 0) < ?
+                   ORDER BY j.priority DESC, COALESCE(r.running, 0) ASC, j.submitted_at ASC
+                   LIMIT 1""",
+                (RUNNING, QUEUED, self.max_running_per_user),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                """UPDATE jobs SET state = ?, worker_id = ?, started_at = ?, lease_expires_at = ?, attempts = attempts + 1
+                   WHERE id = ?""",
+                (RUNNING, worker_id, now, now + lease_seconds, row['id']),
+            )
+            return row['id']
+
+        job_id = self._transaction(take)
+        return self.get(job_id) if job_id is not None else None
+
+    def _requeue_expired(self, conn, now):
+        expired = conn.execute(
+            "SELECT id, attempts FROM jobs WHERE state = ? AND lease_expires_at < ?", (RUNNING, now)
+        ).fetchall()
+        for row in expired:
+            if row['attempts'] >= self.max_attempts:
+                conn.execute(
+                    "UPDATE jobs SET state = ?, finished_at = ?, error = ? WHERE id = ?",
+                    (FAILED, now, "Worker lease expired too many times", row['id']),
+                )
+            else:
+                conn.execute("UPDATE jobs SET state = ?, worker_id = NULL WHERE id = ?", (QUEUED, row['id']))
+                print(f"♻️ Requeued workflow {row['id']} after its worker stopped heartbeating")
+
+    def heartbeat(self, job_id: int, worker_id: str, lease_seconds: float = 60) -> bool:
+        """Extend a lease; returns False when the job was cancelled or reassigned"""
+        def extend(conn):
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires_at = ? WHERE id = ? AND worker_id = ? AND state = ? AND cancel_requested = 0",
+                (time.time() + lease_seconds, job_id, worker_id, RUNNING),
+            )
+            return cursor.rowcount == 1
+        return self._transaction(extend)
+
+    def complete(self, job_id: int, worker_id: str, results=None, error: Optional[str] = None):
+        def finish(conn):
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            state = CANCELLED if row and row['cancel_requested'] else (FAILED if error else DONE)
+            conn.execute(
+                "UPDATE jobs SET state = ?, finished_at = ?, results = ?, error = ? WHERE id = ? AND worker_id = ?",
+                (state, time.time(), json.dumps(results) if results is not None else None, error, job_id, worker_id),
+            )
+        self._transaction(finish)
+
+    def cancel(self, job_id: int):
+        """Cancel a queued job now, or flag a running one for its worker"""
+        def flag(conn):
+            conn.execute(
+                "UPDATE jobs SET state = ?, finished_at = ?, cancel_requested = 1 WHERE id = ? AND state = ?",
+                (CANCELLED, time.time(), job_id, QUEUED),
+            )
+            conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND state = ?", (job_id, RUNNING))
+        self._transaction(flag)
+
+    def get(self, job_id: int) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        job['results'] = json.loads(job['results']) if job['results'] else None
+        return job
+
+    def position(self, job_id: int) -> int:
+        """Number of queued jobs that would be dispatched before this one"""
+        with self._lock:
+            row = self._conn.execute("SELECT priority, submitted_at, state FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None or row['state'] != QUEUED:
+                return 0
+            return self._conn.execute(
+                """SELECT COUNT(*) FROM jobs WHERE state = ?
+                   AND (priority > ? OR (priority = ? AND submitted_at < ?))""",
+                (QUEUED, row['priority'], row['priority'], row['submitted_at']),
+            ).fetchone()[0]
+
+    def depth(self) -> dict:
+        """Job counts by state"""
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) AS n FROM jobs GROUP BY state").fetchall()
+        counts = {state: 0 for state in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)}
+        counts.update({row['state']: row['n'] for row in rows})
+        return counts
+
+    def wait(self, job_id: int, timeout: Optional[float] = None, poll_interval: float = 1.0, on_update=None) -> dict:
+        """Block until a job reaches a final state, calling on_update with each poll"""
+        deadline = time.time() + timeout if timeout else None
+        while True:
+            job = self.get(job_id)
+            if on_update:
+                on_update(job)
+            if job['state'] in FINAL_STATES or (deadline and time.time() >= deadline):
+                return job
+            time.sleep(poll_interval)
+
+
+# Queue methods a remote client may call
+REMOTE_METHODS = ("submit", "claim", "heartbeat", "complete", "cancel", "get", "position", "depth")
+
+
+class RemoteWorkflowQueue:
+    """WorkflowQueue API over HTTP, for Streamlit apps and workers on other nodes than the queue database"""
+
+    def __init__(self, url: str, token: Optional[str] = None, timeout: float = 30):
+        self.url = url.rstrip('/')
+        self.token = token if token is not None else os.getenv("WORKFLOW_QUEUE_TOKEN", "")
+        self.timeout = timeout
+
+    @property
+    def location(self) -> str:
+        return self.url
+
+    def _call(self, method: str, *args, **kwargs):
+        request = urllib.request.Request(
+            f"{self.url}/{method}", data=json.dumps({'args': args, 'kwargs': kwargs}).encode('utf-8'),
+            headers={"Content-Type": "application/json", "Authorization": f"Bearer {self.token}"},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())['result']
+        except urllib.error.HTTPError as e:
+            message = json.loads(e.read() or b'{}').get('error', str(e))
+            if e.code == 429:
+                raise AdmissionError(message) from None
+            raise RuntimeError(f"Workflow queue {method} failed: {message}") from None
+
+    def submit(self, user_id: str, payload: dict, priority: int = 0) -> int:
+        return self._call("submit", user_id, payload, priority)
+
+    def claim(self, worker_id: str, lease_seconds: float = 60) -> Optional[dict]:
+        return self._call("claim", worker_id, lease_seconds)
+
+    def heartbeat(self, job_id: int, worker_id: str, lease_seconds: float = 60) -> bool:
+        return self._call("heartbeat", job_id, worker_id, lease_seconds)
+
+    def complete(self, job_id: int, worker_id: str, results=None, error: Optional[str] = None):
+        self._call("complete", job_id, worker_id, results=results, error=error)
+
+    def cancel(self, job_id: int):
+        self._call("cancel", job_id)
+
+    def get(self, job_id: int) -> Optional[dict]:
+        return self._call("get", job_id)
+
+    def position(self, job_id: int) -> int:
+        return self._call("position", job_id)
+
+    def depth(self) -> dict:
+        return self._call("depth")
+
+    wait = WorkflowQueue.wait
+
+
+def open_workflow_queue():
+    """The queue server at WORKFLOW_QUEUE_URL when set, else the local queue database"""
+    url = os.getenv("WORKFLOW_QUEUE_URL")
+    return RemoteWorkflowQueue(url) if url else WorkflowQueue()
+
+
+def serve_queue(queue: WorkflowQueue, host: str, port: int, token: str = "") -> ThreadingHTTPServer:
+    """HTTP front end to a queue database: POST /<method> with {"args": [...], "kwargs": {...}}"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            method = self.path.strip('/')
+            if token and self.headers.get("Authorization") != f"Bearer {token}":
+                self._reply(401, {'error': "Invalid workflow queue token"})
+                return
+            if method not in REMOTE_METHODS:
+                self._reply(404, {'error': f"Unknown queue method {method}"})
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b'{}')
+                result = getattr(queue, method)(*body.get('args', []), **body.get('kwargs', {}))
+                self._reply(200, {'result': result})
+            except AdmissionError as e:
+                self._reply(429, {'error': str(e)})
+            except Exception as e:
+                self._reply(500, {'error': str(e)})
+
+        def _reply(self, status, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass  # workers poll every second
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Serve the workflow queue database to workers and apps on other nodes")
+    parser.add_argument("--host", default=os.getenv("WORKFLOW_QUEUE_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("WORKFLOW_QUEUE_PORT", "8765")))
+    args = parser.parse_args()
+
+    queue = WorkflowQueue()
+    server = serve_queue(queue, args.host, args.port, os.getenv("WORKFLOW_QUEUE_TOKEN", ""))
+    print(f"📡 Serving workflow queue {queue.db_path} on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("🛑 Stopping queue server")
+
+
+if __name__ == "__main__":
+    main()
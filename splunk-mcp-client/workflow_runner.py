@@ -0,0 +1,333 @@
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import shutil
+import subprocess
+
+from cancellation import WorkflowCancelled, cancel_requested, terminate_process_tree
+from metrics import TASK_SECONDS, WORKFLOW_TASKS
+
+CLIENT_DIR = os.path.dirname(os.path.abspath(__file__))
+CREW_FLOW_SCRIPT = os.path.join(CLIENT_DIR, "crewFlow.py")
+WORKFLOW_TIMEOUT = 600
+# Time crewFlow.py keeps back from the timeout to unwind and report after its last step deadline
+BUDGET_MARGIN_SECONDS = 15
+POLL_INTERVAL = 0.5
+RUNS_DIR = os.path.join(CLIENT_DIR, ".splunk_assistant", "runs")
+# Marks which step a block of crewFlow.py output belongs to
+STEP_INDEX_PATTERN = re.compile(r"^STEP_INDEX: (\d+)\n?", re.MULTILINE)
+
+
+def detect_task_success(step_content, return_code):
+    """Improved success detection logic for Splunk tasks"""
+    
+    # If the process failed, it's definitely a failure
+    if return_code != 0:
+        return False
+    
+    step_lower = step_content.lower()
+    
+    # Clear failure indicators
+    failure_indicators = [
+        'error occurred',
+        'exception',
+        'failed to',
+        'could not',
+        'unable to',
+        'connection failed',
+        'authentication failed',
+        'query failed',
+        'search failed',
+        'timeout',
+        'permission denied',
+        'iserror=true'  # raw MCP tool error returned by the direct execution path
+    ]
+    
+    # Check for actual failure patterns (not just the word "failed")
+    for indicator in failure_indicators:
+        if indicator in step_lower:
+            return False
+    
+    # Success indicators
+    success_indicators = [
+        'generated_spl:',
+        'found:',
+        'query:',
+        'search results',
+        'event_count',
+        'content":',
+        '"format":'
+    ]
+    
+    # Check for success patterns
+    for indicator in success_indicators:
+        if indicator in step_lower:
+            return True
+    
+    # If we have JSON-like structure, it's probably successful
+    if ('{' in step_content and '}' in step_content and 
+        ('query' in step_lower or 'results' in step_lower or 'content' in step_lower)):
+        return True
+    
+    # If we have a table-like structure (markdown table), it's successful
+    if '|' in step_content and '---' in step_content:
+        return True
+    
+    # Default: if no clear failure indicators and we have substantial content, consider it success
+    return len(step_content.strip()) > 50
+
+
+def runs_root():
+    """Where run directories live; WORKFLOW_RUNS_DIR points it at a mount shared with remote workers"""
+    return os.getenv("WORKFLOW_RUNS_DIR") or RUNS_DIR
+
+
+def prune_run_dirs(max_age_seconds=None, max_count=None):
+    """Delete old run directories (logs, result frames, previews, profiles, result tables).
+
+    Runs are dropped oldest first once they are older than RUN_DIR_MAX_AGE_SECONDS or beyond
+    the newest RUN_DIR_MAX_COUNT. A run touched within the workflow timeout may still be in
+    progress and is always kept.
+    """
+    max_age_seconds = max_age_seconds or float(os.getenv("RUN_DIR_MAX_AGE_SECONDS", str(7 * 86400)))
+    max_count = max_count or int(os.getenv("RUN_DIR_MAX_COUNT", "200"))
+    root = runs_root()
+    if not os.path.isdir(root):
+        return 0
+    runs = []
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        try:
+            runs.append((os.path.getmtime(path), path))
+        except OSError:
+            continue
+    runs.sort(reverse=True)
+    now = time.time()
+    removed = 0
+    for position, (modified, path) in enumerate(runs):
+        if now - modified < 2 * WORKFLOW_TIMEOUT:
+            continue
+        if position >= max_count or now - modified > max_age_seconds:
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+    if removed:
+        print(f"🧹 Removed {removed} old run directories")
+    return removed
+
+
+def new_run_dir():
+    """Fresh directory for one workflow run's logs and side-channel artifacts"""
+    prune_run_dirs()
+    return os.path.join(runs_root(), f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}")
+
+
+def build_workflow_env(task_sequence, user_request, earliest, latest, index=None, max_count=100, output_format="json", run_dir=None, previous_run_dir=None, profile=False, progressive=False):
+    """Environment variables crewFlow.py reads for one workflow run"""
+    env = os.environ.copy()
+    env["USER_REQUEST"] = user_request
+    env["TASK_SEQUENCE"] = json.dumps(task_sequence)
+    env["EARLIEST"] = earliest
+    env["LATEST"] = latest
+    env["MAX_COUNT"] = str(max_count)
+    env["OUTPUT_FORMAT"] = output_format
+    # Full tool results are written here by the tool layer and read back by the UI
+    env["RUN_DIR"] = run_dir or new_run_dir()
+    # Follow-up refinements read the previous workflow's stored results
+    if previous_run_dir:
+        env["PREVIOUS_RUN_DIR"] = previous_run_dir
+    if profile:
+        env["PROFILE_WORKFLOW"] = "1"
+    # Searches publish a bounded preview first; only useful when someone is watching the run
+    env["PROGRESSIVE_RESULTS"] = "1" if progressive else "0"
+    
+    if index:
+        env["FORCE_INDEX"] = index
+    
+    return env
+
+
+def run_workflow_process(env, timeout=WORKFLOW_TIMEOUT, should_cancel=None, on_poll=None):
+    """Run crewFlow.py for one workflow and return (returncode, stdout, stderr).
+
+    crewFlow.py runs in its own process group with output logged under RUN_DIR. A timeout,
+    a cancel request or an interruption of the caller kills the whole group, including the
+    MCP servers it spawned.
+    """
+    run_dir = env["RUN_DIR"]
+    os.makedirs(run_dir, exist_ok=True)
+    env = dict(env)
+    env.setdefault("WORKFLOW_BUDGET_SECONDS", str(max(timeout - BUDGET_MARGIN_SECONDS, 1)))
+    stdout_path = os.path.join(run_dir, "stdout.log")
+    stderr_path = os.path.join(run_dir, "stderr.log")
+    
+    start = time.time()
+    with open(stdout_path, 'w', encoding='utf-8') as stdout_file, open(stderr_path, 'w', encoding='utf-8') as stderr_file:
+        process = subprocess.Popen(
+            [sys.executable, CREW_FLOW_SCRIPT],
+            stdout=stdout_file,
+            stderr=stderr_file,
+            text=True,
+            env=env,
+            cwd=CLIENT_DIR,
+            start_new_session=True
+        )
+        try:
+            while process.poll() is None:
+                elapsed = time.time() - start
+                if elapsed > timeout:
+                    terminate_process_tree(process)
+                    raise subprocess.TimeoutExpired(CREW_FLOW_SCRIPT, timeout)
+                if cancel_requested(run_dir) or (should_cancel and should_cancel()):
+                    print("⛔ Cancelling workflow and its MCP servers")
+                    terminate_process_tree(process)
+                    raise WorkflowCancelled("Workflow cancelled by user")
+                if on_poll:
+                    on_poll(elapsed)
+                time.sleep(POLL_INTERVAL)
+        except BaseException:
+            # Covers Streamlit stopping the script run too: nothing may outlive the caller
+            terminate_process_tree(process)
+            raise
+    
+    with open(stdout_path, encoding='utf-8', errors='replace') as f:
+        stdout = f.read()
+    with open(stderr_path, encoding='utf-8', errors='replace') as f:
+        stderr = f.read()
+    return process.returncode, stdout, stderr
+
+
+def read_partial_output(run_dir):
+    stdout_path = os.path.join(run_dir, "stdout.log")
+    if not os.path.exists(stdout_path):
+        return ""
+    with open(stdout_path, encoding='utf-8', errors='replace') as f:
+        return f.read()
+
+
+def parse_workflow_output(task_sequence, returncode, stdout, stderr):
+    """Split crewFlow.py output into per-step results"""
+    # Split output per step using delimiter
+    steps_output = stdout.split('-----END TASK-----')
+    
+    # A step whose search ran as a background job reports in two blocks (dispatch, then
+    # collection), possibly after later steps; STEP_INDEX ties each block to its step
+    blocks = {}
+    for position, step in enumerate(steps_output):
+        step_content = step.strip()
+        if not step_content:
+            continue
+        indexes = STEP_INDEX_PATTERN.findall(step_content)
+        key = int(indexes[-1]) if indexes else position
+        step_content = STEP_INDEX_PATTERN.sub("", step_content).strip()
+        blocks[key] = f"{blocks[key]}\n{step_content}" if key in blocks else step_content
+    
+    # Filter out empty steps and create results with improved success detection
+    results = []
+    for i, step_content in sorted(blocks.items()):
+        # Only process steps within the task_sequence length
+        if i < len(task_sequence):
+            task_info = task_sequence[i]
+            
+            # Use improved success detection
+            is_successful = detect_task_success(step_content, returncode)
+            duration_match = re.search(r'TASK_DURATION:\s*([\d.]+)s', step_content)
+            
+            results.append({
+                'success': is_successful,
+                'stdout': step_content,
+                'stderr': stderr if stderr else '',
+                'task': task_info['task'],
+                'duration': float(duration_match.group(1)) if duration_match else None
+            })
+            
+            WORKFLOW_TASKS.inc(task=task_info['task'], outcome="success" if is_successful else "failure")
+            if duration_match:
+                TASK_SECONDS.observe(float(duration_match.group(1)), task=task_info['task'])
+            
+            # Debug logging
+            print(f"🔍 Task {i+1} ({task_info['task']}): {'✅ SUCCESS' if is_successful else '❌ FAILED'}")
+    
+    # If no results were parsed but we have output, create a single result
+    if not results and stdout:
+        # Use the first task info as fallback
+        first_task = task_sequence[0] if task_sequence else {'task': 'unknown_task'}
+        is_successful = detect_task_success(stdout, returncode)
+        
+        results = [{
+            'success': is_successful,
+            'stdout': stdout,
+            'stderr': stderr,
+            'task': first_task['task']
+        }]
+    
+    print(f"📋 Parsed {len(results)} task results")
+    return results
+
+
+def execute_workflow(task_sequence, user_request, earliest, latest, index=None, max_count=100, output_format="json", timeout=WORKFLOW_TIMEOUT, run_dir=None, should_cancel=None, on_poll=None, previous_run_dir=None, profile=False, progressive=False):
+    """Execute entire sequence with better error handling and logging"""
+    
+    print(f"🚀 Starting execution of {len(task_sequence)} tasks")
+    print(f"📋 Task sequence: {[task['task'] for task in task_sequence]}")
+    
+    # Set up environment for the entire sequence
+    env = build_workflow_env(task_sequence, user_request, earliest, latest, index, max_count, output_format, run_dir, previous_run_dir, profile, progressive)
+    
+    print("🔧 Environment setup:")
+    print(f"   - Time range: {env['EARLIEST']} to {env['LATEST']}")
+    print(f"   - Max count: {env['MAX_COUNT']}")
+    print(f"   - Output format: {env['OUTPUT_FORMAT']}")
+    if index:
+        print(f"   - Forced index: {index}")
+    if profile:
+        print("   - Profiling: cProfile + tracemalloc")
+    
+    try:
+        # Execute the entire workflow
+        print("🏃 Running crewFlow.py...")
+        returncode, stdout, stderr = run_workflow_process(env, timeout, should_cancel, on_poll)
+        
+        print(f"📊 Process completed with return code: {returncode}")
+        
+        if stdout:
+            print("📤 STDOUT:")
+            print(stdout[:500] + "..." if len(stdout) > 500 else stdout)
+        
+        if stderr:
+            print("📢 STDERR:")
+            print(stderr[:500] + "..." if len(stderr) > 500 else stderr)
+        
+        return parse_workflow_output(task_sequence, returncode, stdout, stderr)
+        
+    except WorkflowCancelled:
+        print("⛔ Workflow cancelled")
+        # Keep the steps that finished before the cancel
+        partial_stdout = read_partial_output(env["RUN_DIR"])
+        results = []
+        if '-----END TASK-----' in partial_stdout:
+            results = parse_workflow_output(task_sequence, 0, partial_stdout.rsplit('-----END TASK-----', 1)[0], '')
+        return results + [{
+            'success': False,
+            'stdout': '',
+            'stderr': 'Workflow cancelled by user',
+            'task': 'cancelled'
+        }]
+    except subprocess.TimeoutExpired:
+        print(f"⏰ Process timed out after {timeout} seconds")
+        return [{
+            'success': False,
+            'stdout': '',
+            'stderr': f'Process timed out after {timeout} seconds',
+            'task': 'timeout'
+        }]
+    except Exception as e:
+        print(f"❌ Error executing workflow: {e}")
+        return [{
+            'success': False,
+            'stdout': '',
+            'stderr': f'Execution error: {str(e)}',
+            'task': 'error'
+        }]
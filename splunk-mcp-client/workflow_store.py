@@ -0,0 +1,235 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+from typing import Optional
+
+DEFAULT_STORE_PATH = os.path.join(".splunk_assistant", "workflows.db")
+DEFAULT_MAX_ARTIFACT_BYTES = 50 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS workflows (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    timestamp TEXT NOT NULL,
+    request TEXT NOT NULL,
+    spl TEXT,
+    task_plan TEXT NOT NULL,
+    settings TEXT,
+    tasks INTEGER NOT NULL,
+    successful INTEGER NOT NULL,
+    total_time REAL NOT NULL,
+    user_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_workflows_created_at ON workflows (created_at);
+CREATE INDEX IF NOT EXISTS idx_workflows_request ON workflows (request COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_workflows_spl ON workflows (spl);
+
+CREATE TABLE IF NOT EXISTS steps (
+    workflow_id INTEGER NOT NULL REFERENCES workflows (id) ON DELETE CASCADE,
+    step_index INTEGER NOT NULL,
+    task TEXT NOT NULL,
+    success INTEGER NOT NULL,
+    duration REAL,
+    spl TEXT,
+    PRIMARY KEY (workflow_id, step_index)
+);
+CREATE INDEX IF NOT EXISTS idx_steps_spl ON steps (spl);
+
+CREATE TABLE IF NOT EXISTS artifacts (
+    workflow_id INTEGER NOT NULL REFERENCES workflows (id) ON DELETE CASCADE,
+    step_index INTEGER NOT NULL,
+    stdout TEXT,
+    stderr TEXT,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_accessed REAL NOT NULL,
+    PRIMARY KEY (workflow_id, step_index)
+);
+CREATE INDEX IF NOT EXISTS idx_artifacts_last_accessed ON artifacts (last_accessed);
+"""
+
+GENERATED_SPL_PATTERN = re.compile(r'GENERATED_SPL:\s*(.+)')
+
+
+def extract_generated_spl(text):
+    """Return the first GENERATED_SPL query found in a step output, if any"""
+    match = GENERATED_SPL_PATTERN.search(text or "")
+    if match:
+        return match.group(1).strip().strip('[]').strip()
+    return None
+
+
+class WorkflowStore:
+    """SQLite-backed history of workflows, their task plans, step timings and result artifacts"""
+
+    def __init__(self, db_path: Optional[str] = None, max_artifact_bytes: Optional[int] = None):
+        self.db_path = db_path or os.getenv("WORKFLOW_STORE_PATH", DEFAULT_STORE_PATH)
+        self.max_artifact_bytes = max_artifact_bytes or int(
+            os.getenv("WORKFLOW_STORE_MAX_BYTES", str(DEFAULT_MAX_ARTIFACT_BYTES))
+        )
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        # Streamlit reruns the script on different threads, so share one connection behind a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.executescript(SCHEMA)
+        # Stores created before workflows were tagged with the session that ran them
+        columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(workflows)")}
+        if 'user_id' not in columns:
+            self._conn.execute("ALTER TABLE workflows ADD COLUMN user_id TEXT")
+        self._conn.commit()
+
+    def save_workflow(self, request, task_sequence, results, total_time, settings=None, user_id=None):
+        """Persist a finished workflow with one step row and one artifact per result"""
+        now = time.time()
+        step_spls = [extract_generated_spl(r.get('stdout', '')) for r in results]
+        workflow_spl = next((spl for spl in step_spls if spl), None)
+        successful = sum(1 for r in results if r.get('success', False))
+
+        with self._lock:
+            cursor = self._conn.execute(
+                """INSERT INTO workflows
+                   (created_at, timestamp, request, spl, task_plan, settings, tasks, successful, total_time, user_id)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (
+                    now,
+                    time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now)),
+                    request,
+                    workflow_spl,
+                    json.dumps(task_sequence),
+                    json.dumps(settings or {}),
+                    len(task_sequence),
+                    successful,
+                    total_time,
+                    user_id,
+                ),
+            )
+            workflow_id = cursor.lastrowid
+
+            for i, result in enumerate(results):
+                stdout = result.get('stdout', '') or ''
+                stderr = result.get('stderr', '') or ''
+                self._conn.execute(
+                    "INSERT INTO steps (workflow_id, step_index, task, success, duration, spl) VALUES (?, ?, ?, ?, ?, ?)",
+                    (workflow_id, i, result.get('task', 'unknown_task'), int(bool(result.get('success'))),
+                     result.get('duration'), step_spls[i]),
+                )
+                self._conn.execute(
+                    """INSERT INTO artifacts
+                       (workflow_id, step_index, stdout, stderr, size, created_at, last_accessed)
+                       VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                    (workflow_id, i, stdout, stderr,
+                     len(stdout.encode('utf-8')) + len(stderr.encode('utf-8')), now, now),
+                )
+            self._conn.commit()
+
+        self.evict()
+        return workflow_id
+
+    def list_workflows(self, limit=10, search=None):
+        """Return recent workflow summaries, optionally filtered by request text or SPL"""
+        query = """SELECT w.id, w.timestamp, w.request, w.spl, w.tasks, w.successful, w.total_time,
+                          COUNT(a.step_index) AS stored_artifacts
+                   FROM workflows w LEFT JOIN artifacts a ON a.workflow_id = w.id"""
+        params = []
+        if search:
+            query += """ WHERE w.request LIKE ? OR w.spl LIKE ?
+                         OR w.id IN (SELECT workflow_id FROM steps WHERE spl LIKE ?)"""
+            pattern = f"%{search}%"
+            params.extend([pattern, pattern, pattern])
+        query += " GROUP BY w.id ORDER BY w.created_at DESC LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def count_workflows(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM workflows").fetchone()[0]
+
+    def load_workflow(self, workflow_id):
+        """Rebuild a stored workflow and its step results without re-running anything"""
+        with self._lock:
+            workflow = self._conn.execute("SELECT * FROM workflows WHERE id = ?", (workflow_id,)).fetchone()
+            if workflow is None:
+                return None
+            steps = self._conn.execute(
+                """SELECT s.step_index, s.task, s.success, s.duration, s.spl, a.stdout, a.stderr,
+                          a.step_index IS NOT NULL AS has_artifact
+                   FROM steps s LEFT JOIN artifacts a
+                     ON a.workflow_id = s.workflow_id AND a.step_index = s.step_index
+                   WHERE s.workflow_id = ? ORDER BY s.step_index""",
+                (workflow_id,),
+            ).fetchall()
+            self._conn.execute(
+                "UPDATE artifacts SET last_accessed = ? WHERE workflow_id = ?", (time.time(), workflow_id)
+            )
+            self._conn.commit()
+
+        record = dict(workflow)
+        record['task_plan'] = json.loads(record['task_plan'])
+        record['settings'] = json.loads(record['settings'] or '{}')
+        record['results'] = [
+            {
+                'success': bool(step['success']),
+                'stdout': step['stdout'] or '',
+                'stderr': step['stderr'] or '',
+                'task': step['task'],
+                'duration': step['duration'],
+                'spl': step['spl'],
+                'evicted': not step['has_artifact'],
+            }
+            for step in steps
+        ]
+        return record
+
+    def total_artifact_bytes(self):
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0]
+
+    def evict(self):
+        """Drop least recently opened artifacts until the store fits its size budget"""
+        evicted = 0
+        with self._lock:
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0]
+            if total <= self.max_artifact_bytes:
+                return 0
+
+            rows = self._conn.execute(
+                "SELECT workflow_id, step_index, size FROM artifacts ORDER BY last_accessed ASC, workflow_id ASC"
+            ).fetchall()
+            for row in rows:
+                if total <= self.max_artifact_bytes:
+                    break
+                self._conn.execute(
+                    "DELETE FROM artifacts WHERE workflow_id = ? AND step_index = ?",
+                    (row['workflow_id'], row['step_index']),
+                )
+                total -= row['size']
+                evicted += 1
+            self._conn.commit()
+
+        if evicted:
+            print(f"🧹 Evicted {evicted} stored artifacts to stay under {self.max_artifact_bytes} bytes")
+        return evicted
+
+    def clear(self, user_id):
+        """Delete one user's workflows; the store is shared by every session"""
+        with self._lock:
+            # Steps and artifacts go with their workflow (ON DELETE CASCADE)
+            deleted = self._conn.execute("DELETE FROM workflows WHERE user_id = ?", (user_id,)).rowcount
+            self._conn.commit()
+        return deleted
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
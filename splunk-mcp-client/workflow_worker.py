@@ -0,0 +1,103 @@
+import os
+import time
+import socket
+import argparse
+import threading
+import multiprocessing
+from dotenv import load_dotenv
+
+from workflow_queue import open_workflow_queue
+from workflow_runner import execute_workflow
+from metrics import flush_metrics
+
+load_dotenv()
+
+
+def process_job(queue, job, worker_id, lease_seconds):
+    """Run one claimed workflow while keeping its lease alive"""
+    payload = job['payload']
+    stop = threading.Event()
+    cancelled = threading.Event()
+
+    def keep_lease():
+        while not stop.wait(lease_seconds / 3):
+            try:
+                alive = queue.heartbeat(job['id'], worker_id, lease_seconds)
+            except (OSError, RuntimeError) as e:
+                # A queue server blip; the lease outlives a few missed heartbeats
+                print(f"⚠️ Heartbeat for workflow {job['id']} failed: {e}")
+                continue
+            if not alive:
+                current = queue.get(job['id'])
+                if current and current['cancel_requested']:
+                    print(f"⛔ Workflow {job['id']} cancelled by its user")
+                else:
+                    print(f"⚠️ Lost lease on workflow {job['id']}")
+                # Either way this worker must stop running it
+                cancelled.set()
+                return
+
+    heartbeat = threading.Thread(target=keep_lease, daemon=True)
+    heartbeat.start()
+    print(f"🏃 Worker {worker_id} running workflow {job['id']} for {job['user_id']}")
+    try:
+        results = execute_workflow(
+            payload['task_sequence'], payload['user_request'], payload['earliest'], payload['latest'],
+            payload.get('index'), payload.get('max_count', 100), payload.get('output_format', 'json'),
+            run_dir=payload.get('run_dir'), should_cancel=cancelled.is_set,
+            previous_run_dir=payload.get('previous_run_dir'), profile=payload.get('profile', False),
+            progressive=payload.get('progressive', False)
+        )
+        queue.complete(job['id'], worker_id, results=results)
+        print(f"✅ Workflow {job['id']} finished")
+    except Exception as e:
+        queue.complete(job['id'], worker_id, error=str(e))
+        print(f"❌ Workflow {job['id']} failed: {e}")
+    finally:
+        stop.set()
+        # The UI process exports metrics; workers add theirs to the shared store after each job
+        flush_metrics()
+
+
+def run_worker(poll_interval=1.0, lease_seconds=60):
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    queue = open_workflow_queue()
+    print(f"👷 Worker {worker_id} waiting for workflows on {queue.location}")
+    while True:
+        try:
+            job = queue.claim(worker_id, lease_seconds)
+        except (OSError, RuntimeError) as e:
+            print(f"⚠️ Could not reach the workflow queue: {e}")
+            time.sleep(poll_interval)
+            continue
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        process_job(queue, job, worker_id, lease_seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run workflow workers against the shared workflow queue")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WORKFLOW_WORKERS", "2")),
+                        help="worker processes to start on this node")
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--lease-seconds", type=float, default=60)
+    args = parser.parse_args()
+
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(args.poll_interval, args.lease_seconds), daemon=True)
+        for _ in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        print("🛑 Stopping workers")
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()